@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""Episode catalog."""
+import hashlib
+import sqlite3
+import threading
+
+from Podcast import Item
+from Sampler import EpisodeSampler, episode_weights
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (
+    podcast TEXT NOT NULL,
+    guid TEXT NOT NULL,
+    position INTEGER,
+    title TEXT,
+    title_key TEXT,
+    description TEXT,
+    enclosure_url TEXT,
+    enclosure_length INTEGER,
+    enclosure_type TEXT,
+    duration INTEGER,
+    published_date TEXT,
+    published INTEGER,
+    PRIMARY KEY (podcast, guid)
+);
+CREATE INDEX IF NOT EXISTS episodes_position ON episodes (podcast, position);
+CREATE INDEX IF NOT EXISTS episodes_published ON episodes (podcast, published);
+CREATE INDEX IF NOT EXISTS episodes_duration ON episodes (podcast, duration);
+CREATE INDEX IF NOT EXISTS episodes_title_key ON episodes (podcast, title_key);
+CREATE TABLE IF NOT EXISTS feeds (
+    podcast TEXT PRIMARY KEY,
+    url TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    last_build_date TEXT,
+    new_feed_url TEXT,
+    ttl INTEGER,
+    newest_first INTEGER,
+    checked REAL
+);
+"""
+
+UPSERT = """
+INSERT INTO episodes (
+    podcast, guid, position, title, title_key, description, enclosure_url,
+    enclosure_length, enclosure_type, duration, published_date, published
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (podcast, guid) DO UPDATE SET
+    position = excluded.position,
+    title = excluded.title,
+    title_key = excluded.title_key,
+    description = excluded.description,
+    enclosure_url = excluded.enclosure_url,
+    enclosure_length = excluded.enclosure_length,
+    enclosure_type = excluded.enclosure_type,
+    duration = excluded.duration,
+    published_date = excluded.published_date,
+    published = excluded.published
+"""
+
+
+def parse_duration(duration):
+    """Seconds of an itunes:duration given as HH:MM:SS, MM:SS or seconds."""
+    if not duration:
+        return None
+    seconds = 0
+    try:
+        for part in duration.strip().split(":"):
+            seconds = seconds * 60 + float(part)
+    except ValueError:
+        return None
+    return int(seconds)
+
+
+def item_key(item):
+    """The guid of an Item, or what stands in for it.
+
+    An item with no guid, enclosure or title is known by a hash of its
+    date and description, which stays the same wherever it moves in the
+    feed.
+    """
+    key = item.guid or item.enclosure_url or item.title
+    if key:
+        return key
+    text = f"{item.published_date or ''}\n{item.description or ''}"
+    return "sha1:" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def parse_length(length):
+    """Bytes of an enclosure length attribute."""
+    try:
+        return int(length)
+    except (TypeError, ValueError):
+        return None
+
+
+class Catalog(object):
+    """Every episode of every subscription in one sqlite database.
+
+    Episodes are keyed by podcast title and guid. ``position`` is the
+    index of the episode in the feed when it was last synced, so the
+    firstcount:lastcount window of a podfile section is a range query.
+    Episodes that left the feed keep their row with a NULL position.
+
+    Args:
+        path (str): The sqlite database, created when needed
+        title_key (callable): Turns an item title into the form it takes
+            in the play history, so played episodes can be excluded
+
+    Attributes:
+        connection (sqlite3.Connection): Connection shared by all threads
+        samplers (dict): Guids and EpisodeSampler of every window drawn
+            from, by podcast, dropped when the episodes of the podcast change
+    """
+
+    def __init__(self, path, title_key=None):
+        self.title_key = title_key or (lambda title: title)
+        self.samplers = {}
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.lock, self.connection:
+            self.connection.executescript(SCHEMA)
+
+    def row(self, podcast, position, item):
+        """Values of the episodes row for an Item."""
+        return (
+            podcast,
+            item_key(item),
+            position,
+            item.title,
+            self.title_key(item.title or ""),
+            item.description,
+            item.enclosure_url,
+            parse_length(item.enclosure_length),
+            item.enclosure_type,
+            parse_duration(item.itunes_duration),
+            item.published_date,
+            getattr(item, "time_published", None),
+        )
+
+    def sync(self, podcast, feed):
+        """Store every item of the Podcast feed under the title podcast."""
+        rows = [
+            self.row(podcast, position, item)
+            for position, item in enumerate(feed.items)
+        ]
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE episodes SET position = NULL WHERE podcast = ?", (podcast,)
+            )
+            self.connection.executemany(UPSERT, rows)
+            self.samplers.pop(podcast, None)
+        return len(rows)
+
+    def prepend(self, podcast, items, count=None):
+        """Store the Items new at the top of the feed of podcast.
+
+        The episodes already stored move down by as many positions. Those
+        that end up at count, the number of items in the feed now, or
+        after it dropped off its end and leave the feed, like in sync.
+        """
+        rows = [
+            self.row(podcast, position, item) for position, item in enumerate(items)
+        ]
+        with self.lock, self.connection:
+            if rows:
+                self.connection.execute(
+                    "UPDATE episodes SET position = position + ?"
+                    " WHERE podcast = ? AND position IS NOT NULL",
+                    (len(rows), podcast),
+                )
+            dropped = 0
+            if count is not None:
+                dropped = self.connection.execute(
+                    "UPDATE episodes SET position = NULL"
+                    " WHERE podcast = ? AND position >= ?",
+                    (podcast, count),
+                ).rowcount
+            if rows or dropped:
+                self.connection.executemany(UPSERT, rows)
+                self.samplers.pop(podcast, None)
+        return len(rows)
+
+    def guids(self, podcast):
+        """Keys of the episodes in the feed of podcast when last synced."""
+        with self.lock:
+            cursor = self.connection.execute(
+                "SELECT guid FROM episodes WHERE podcast = ? AND position IS NOT NULL",
+                (podcast,),
+            )
+            return {row[0] for row in cursor}
+
+    def feed(self, podcast):
+        """What was recorded of the feed of podcast, or None."""
+        with self.lock:
+            return self.connection.execute(
+                "SELECT * FROM feeds WHERE podcast = ?", (podcast,)
+            ).fetchone()
+
+    def set_feed(self, podcast, **fields):
+        """Record fields of the feed of podcast."""
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO feeds (podcast) VALUES (?)", (podcast,)
+            )
+            for name, value in fields.items():
+                self.connection.execute(
+                    f"UPDATE feeds SET {name} = ? WHERE podcast = ?", (value, podcast)
+                )
+
+    def count(self, podcast):
+        """Number of items in the feed of podcast when it was last synced."""
+        with self.lock:
+            cursor = self.connection.execute(
+                "SELECT max(position) + 1 FROM episodes WHERE podcast = ?",
+                (podcast,),
+            )
+            return cursor.fetchone()[0] or 0
+
+    def random_episode(
+        self,
+        podcast,
+        firstcount=None,
+        lastcount=None,
+        exclude=(),
+        weighting="uniform",
+        half_life=90,
+    ):
+        """A random episode of ``items[firstcount:lastcount]`` of podcast.
+
+        Episodes whose title key is in exclude are never drawn. The others
+        are weighted by weighting and half_life, like episode_weights. The
+        sampler of the window is kept until the podcast is synced again,
+        so only the first draw reads the whole window.
+
+        Returns:
+            sqlite3.Row or None if no episode is left to draw.
+        """
+        window = range(self.count(podcast))[firstcount:lastcount]
+        if not window:
+            return None
+        key = (window.start, window.stop, weighting, half_life)
+        with self.lock:
+            samplers = self.samplers.setdefault(podcast, {})
+            if key not in samplers:
+                rows = self.connection.execute(
+                    "SELECT guid, title_key, published FROM episodes"
+                    " WHERE podcast = ? AND position >= ? AND position < ?"
+                    " ORDER BY position",
+                    (podcast, window.start, window.stop),
+                ).fetchall()
+                weights = episode_weights(
+                    [row[2] for row in rows], weighting, half_life
+                )
+                title_keys = [row[1] for row in rows]
+                samplers[key] = (
+                    [row[0] for row in rows],
+                    EpisodeSampler(len(rows), title_keys.__getitem__, weights),
+                )
+            guids, sampler = samplers[key]
+            index = sampler.draw(exclude)
+            if index is None:
+                return None
+            return self.connection.execute(
+                "SELECT * FROM episodes WHERE podcast = ? AND guid = ?",
+                (podcast, guids[index]),
+            ).fetchone()
+
+    def item(self, row):
+        """Build the Item of an episodes row."""
+        return Item(
+            fields={
+                "guid": row["guid"],
+                "title": row["title"],
+                "description": row["description"],
+                "pubdate": row["published_date"],
+                "itunes:duration": None
+                if row["duration"] is None
+                else str(row["duration"]),
+                "@enclosure": {
+                    "url": row["enclosure_url"],
+                    "type": row["enclosure_type"],
+                    # a string, like the feed parsers give it
+                    "length": None
+                    if row["enclosure_length"] is None
+                    else str(row["enclosure_length"]),
+                },
+            }
+        )
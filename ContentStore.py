@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""Content addressed episode storage."""
+import hashlib
+import json
+import os
+
+HASH_BLOCK = 2 ** 20
+
+
+def file_digest(path):
+    """sha256 of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as data_file:
+        for block in iter(lambda: data_file.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def link(source, path):
+    """Make path a hardlink of source, or a symlink where that fails."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        os.link(source, path)
+    except OSError:
+        os.symlink(source, path)
+
+
+class ContentStore(object):
+    """Every downloaded enclosure stored once, by the sha256 of its bytes.
+
+    The per podcast files in the download directory are links into the
+    store. Enclosure urls and guids are keys of what they downloaded, so
+    the same enclosure met again in another feed is linked instead of
+    downloaded. An enclosure downloaded again under a new url is found by
+    its hash once downloaded and linked to the copy already stored.
+
+    Args:
+        directory (str): The store, on the file system of the downloads
+        index_path (str): The json index, created when needed
+
+    Attributes:
+        saved_downloads (int): Downloads avoided by a key
+        saved_bytes (int): Bytes not downloaded or not stored twice
+    """
+
+    def __init__(self, directory, index_path):
+        self.directory = directory
+        self.index_path = index_path
+        self.index = None
+
+    def load(self):
+        if self.index is None:
+            try:
+                with open(self.index_path) as index_file:
+                    self.index = json.load(index_file)
+            except (OSError, ValueError):
+                self.index = {
+                    "keys": {},
+                    "objects": {},
+                    "saved_downloads": 0,
+                    "saved_bytes": 0,
+                }
+        return self.index
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        with open(self.index_path + ".tmp", "w") as index_file:
+            json.dump(self.index, index_file, separators=(",", ":"))
+        os.replace(self.index_path + ".tmp", self.index_path)
+
+    @property
+    def saved_downloads(self):
+        return self.load()["saved_downloads"]
+
+    @property
+    def saved_bytes(self):
+        return self.load()["saved_bytes"]
+
+    def object_path(self, digest):
+        entry = self.load()["objects"][digest]
+        return os.path.join(self.directory, digest[:2], digest + entry["ext"])
+
+    def find(self, keys):
+        """Digest of the stored object of any of keys, or None."""
+        index = self.load()
+        for key in keys:
+            digest = index["keys"].get(key)
+            if digest in index["objects"] and os.path.isfile(
+                self.object_path(digest)
+            ):
+                return digest
+        return None
+
+    def link(self, path, keys):
+        """Link path to what one of keys downloaded, True if there was one."""
+        digest = self.find(keys)
+        if digest is None or os.path.lexists(path):
+            return False
+        link(self.object_path(digest), path)
+        entry = self.index["objects"][digest]
+        entry["links"] = sorted(set(entry["links"]) | {path})
+        for key in keys:
+            self.index["keys"][key] = digest
+        self.index["saved_downloads"] += 1
+        self.index["saved_bytes"] += entry["size"]
+        self.save()
+        return True
+
+    def ingest(self, path, keys):
+        """Move the download at path into the store and link it back.
+
+        Returns:
+            True if the same bytes were stored already, in which case the
+            download is replaced by a link to them.
+        """
+        index = self.load()
+        digest = self.find(keys)
+        if digest is not None and os.path.samefile(self.object_path(digest), path):
+            return False
+        digest = file_digest(path)
+        duplicate = digest in index["objects"] and os.path.isfile(
+            self.object_path(digest)
+        )
+        if duplicate:
+            os.remove(path)
+            entry = index["objects"][digest]
+            index["saved_bytes"] += entry["size"]
+        else:
+            entry = index["objects"][digest] = {
+                "ext": os.path.splitext(path)[1],
+                "size": os.path.getsize(path),
+                "links": [],
+            }
+            os.makedirs(os.path.dirname(self.object_path(digest)), exist_ok=True)
+            os.replace(path, self.object_path(digest))
+        link(self.object_path(digest), path)
+        entry["links"] = sorted(set(entry["links"]) | {path})
+        for key in keys:
+            index["keys"][key] = digest
+        self.save()
+        return duplicate
+
+    def collect(self):
+        """Remove the objects no download links to any more.
+
+        Returns:
+            Bytes freed.
+        """
+        index = self.load()
+        freed = 0
+        for digest, entry in list(index["objects"].items()):
+            entry["links"] = [path for path in entry["links"] if os.path.lexists(path)]
+            if entry["links"]:
+                continue
+            try:
+                os.remove(self.object_path(digest))
+                os.rmdir(os.path.dirname(self.object_path(digest)))
+            except OSError:
+                pass
+            freed += entry["size"]
+            del index["objects"][digest]
+        index["keys"] = {
+            key: digest
+            for key, digest in index["keys"].items()
+            if digest in index["objects"]
+        }
+        self.save()
+        return freed
+
+    def stats(self):
+        """Objects stored, their bytes, links to them and what was saved."""
+        objects = self.load()["objects"].values()
+        return {
+            "objects": len(objects),
+            "bytes": sum(entry["size"] for entry in objects),
+            "links": sum(len(entry["links"]) for entry in objects),
+            "saved_downloads": self.saved_downloads,
+            "saved_bytes": self.saved_bytes,
+        }
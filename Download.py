@@ -0,0 +1,530 @@
+# -*- coding: utf-8 -*-
+"""Resumable and segmented downloads."""
+import json
+import os
+import re
+import threading
+import time
+import concurrent.futures
+
+BLOCK_SIZE = 64 * 1024
+SAVE_EVERY = 2 ** 20  # bytes written between journal saves
+
+
+class DownloadError(IOError):
+    """The download failed, the .part file and its journal are kept."""
+
+    pass
+
+
+class Restart(Exception):
+    """The enclosure changed since the .part file was started."""
+
+    pass
+
+
+class RateLimit(object):
+    """Bandwidth budget shared by every download that takes from it.
+
+    A token bucket holding up to one second of bytes. Taking more than
+    is there goes into debt, which the taker sleeps off, so however many
+    downloads share it their total stays within rate.
+
+    Args:
+        rate (float): Bytes per second
+    """
+
+    def __init__(self, rate):
+        self.rate = float(rate)
+        self.available = 0.0
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, count):
+        """Wait until count more bytes fit within the rate."""
+        with self.lock:
+            now = time.monotonic()
+            self.available = min(
+                self.available + (now - self.last) * self.rate, self.rate
+            )
+            self.last = now
+            self.available -= count
+            wait = -self.available / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+
+class Journal(object):
+    """Sidecar of a .part file recording what has been downloaded.
+
+    Stored as json next to the .part file: the url, the validator the
+    server gave (ETag or Last-Modified), the total length when known and
+    the byte ranges already written, as sorted [start, end) pairs.
+
+    Args:
+        path (str): The journal file
+        url (str): The url being downloaded
+
+    Attributes:
+        length (int): Total size of the enclosure, None until known
+        etag (str): ETag of the enclosure
+        last_modified (str): Last-Modified of the enclosure
+        ranges (list): Written [start, end) byte ranges
+        ranges_ok (bool): The server answered a range request with 206
+    """
+
+    def __init__(self, path, url):
+        self.path = path
+        self.url = url
+        self.length = None
+        self.etag = None
+        self.last_modified = None
+        self.ranges = []
+        self.ranges_ok = False
+        self.lock = threading.Lock()
+        self.unsaved = 0
+
+    @classmethod
+    def load(cls, path, url=None):
+        """Return the journal at path if it belongs to url, or None."""
+        try:
+            with open(path) as journal_file:
+                state = json.load(journal_file)
+        except (OSError, ValueError):
+            return None
+        if url is not None and state.get("url") != url:
+            return None
+        journal = cls(path, state.get("url"))
+        journal.length = state.get("length")
+        journal.etag = state.get("etag")
+        journal.last_modified = state.get("last_modified")
+        journal.ranges = [list(pair) for pair in state.get("ranges", [])]
+        journal.ranges_ok = state.get("ranges_ok", False)
+        return journal
+
+    def save(self):
+        state = {
+            "url": self.url,
+            "length": self.length,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "ranges": self.ranges,
+            "ranges_ok": self.ranges_ok,
+        }
+        with open(self.path + ".tmp", "w") as journal_file:
+            json.dump(state, journal_file)
+        os.replace(self.path + ".tmp", self.path)
+        self.unsaved = 0
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def validator(self):
+        """Value for If-Range, None when the server gave no strong one."""
+        if self.etag and not self.etag.startswith("W/"):
+            return self.etag
+        return self.last_modified
+
+    def learn(self, response, total=None):
+        """Take validator and length from the headers of a response."""
+        self.etag = response.headers.get("ETag") or self.etag
+        self.last_modified = (
+            response.headers.get("Last-Modified") or self.last_modified
+        )
+        if total is not None:
+            self.length = total
+
+    def add(self, start, end):
+        """Record that bytes start to end (exclusive) are written."""
+        with self.lock:
+            merged = []
+            for pair in sorted(self.ranges + [[start, end]]):
+                if merged and pair[0] <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], pair[1])
+                else:
+                    merged.append(list(pair))
+            self.ranges = merged
+            self.unsaved += end - start
+            if self.unsaved >= SAVE_EVERY:
+                self.save()
+
+    def done(self):
+        """Number of bytes written."""
+        return sum(end - start for start, end in self.ranges)
+
+    def missing(self):
+        """The [start, end) ranges still to download, end None if unknown."""
+        gaps = []
+        position = 0
+        for start, end in self.ranges:
+            if start > position:
+                gaps.append((position, start))
+            position = max(position, end)
+        if self.length is None:
+            gaps.append((position, None))
+        elif position < self.length:
+            gaps.append((position, self.length))
+        return gaps
+
+    def complete(self):
+        return self.length is not None and not self.missing()
+
+    def written_until(self, position):
+        """End of the written range holding position, None if unwritten."""
+        for start, end in self.ranges:
+            if start <= position < end:
+                return end
+        return None
+
+    def next_written(self, position):
+        """Start of the first written range after position, or None."""
+        for start, end in self.ranges:
+            if start > position:
+                return start
+        return None
+
+
+def content_range(response):
+    """Return (start, total) of a Content-Range, None for what is unknown."""
+    match = re.match(
+        r"bytes (?:(\d+)-\d+|\*)/(\d+|\*)", response.headers.get("Content-Range", "")
+    )
+    if match is None:
+        return None, None
+    start = None if match.group(1) is None else int(match.group(1))
+    total = None if match.group(2) == "*" else int(match.group(2))
+    return start, total
+
+
+def content_length(response):
+    try:
+        return int(response.headers.get("Content-Length"))
+    except (TypeError, ValueError):
+        return None
+
+
+def split_gaps(gaps, segments):
+    """Split the largest gaps until there are about segments of them."""
+    gaps = list(gaps)
+    while len(gaps) < segments:
+        gaps.sort(key=lambda gap: gap[1] - gap[0])
+        start, end = gaps[-1]
+        if end - start < 2 * BLOCK_SIZE:
+            break
+        middle = (start + end) // 2
+        gaps[-1:] = [(start, middle), (middle, end)]
+    return sorted(gaps)
+
+
+def probe(session, url, headers, timeout=30):
+    """Ask for the first byte of url.
+
+    Returns:
+        The response of the probe, closed, and the total size when the
+        server serves byte ranges, otherwise None.
+    """
+    request_headers = dict(headers, Range="bytes=0-0")
+    with session.get(
+        url, headers=request_headers, stream=True, timeout=timeout
+    ) as response:
+        pass
+    if response.status_code != 206:
+        return response, None
+    return response, content_range(response)[1]
+
+
+def remote_headers(session, url, headers, timeout=30):
+    """Length, validators and Content-MD5 of url, without its body.
+
+    Asks with HEAD, or for the first byte when the server does not answer
+    HEAD, over the connections kept by session.
+
+    Raises:
+        DownloadError: The server could not be asked or refused.
+    """
+    import requests
+
+    try:
+        response = session.head(
+            url, headers=headers, timeout=timeout, allow_redirects=True
+        )
+        length = content_length(response)
+        if response.status_code >= 400:
+            response, length = probe(session, url, headers, timeout)
+            if response.status_code == 200:
+                length = content_length(response)
+    except requests.exceptions.RequestException as err:
+        raise DownloadError(str(err)) from err
+    if response.status_code >= 400:
+        raise DownloadError(f"{url} answered {response.status_code}")
+    return {
+        "length": length,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "md5": response.headers.get("Content-MD5"),
+    }
+
+
+def fetch_gap(session, url, headers, fd, journal, gap, progress, timeout):
+    """Download the gap (start, end) of url into fd and record it.
+
+    The range is only honoured by the server if the enclosure still has
+    the validator of the journal, otherwise Restart is raised.
+    """
+    start, end = gap
+    request_headers = dict(headers)
+    if start or end is not None:
+        last = "" if end is None else end - 1
+        request_headers["Range"] = f"bytes={start}-{last}"
+        if journal.validator():
+            request_headers["If-Range"] = journal.validator()
+    with session.get(
+        url, headers=request_headers, stream=True, timeout=timeout
+    ) as response:
+        if response.status_code == 206:
+            first, total = content_range(response)
+            if first != start:
+                raise Restart
+            journal.ranges_ok = True
+            journal.learn(response, total)
+        elif response.status_code == 200:
+            if start:
+                # the validator did not match, or ranges are not served
+                raise Restart
+            journal.learn(response, content_length(response))
+        elif response.status_code == 416 and end is None:
+            # nothing after start, done if the enclosure ends right there
+            if content_range(response)[1] != start:
+                raise Restart
+            journal.length = start
+            return
+        else:
+            raise DownloadError(f"{url} answered {response.status_code}")
+        position = start
+        for data in response.iter_content(BLOCK_SIZE):
+            if end is not None:
+                data = data[: end - position]
+            os.pwrite(fd, data, position)
+            journal.add(position, position + len(data))
+            position += len(data)
+            progress(len(data))
+            if end is not None and position >= end:
+                break
+    if end is not None and position < end:
+        raise DownloadError(f"{url} ended at byte {position} of {end}")
+    if end is None and journal.length is None:
+        journal.length = position
+
+
+def download(
+    url,
+    newfilename,
+    headers,
+    segments=1,
+    session=None,
+    timeout=30,
+    min_size=8 * 2 ** 20,
+    rate_limit=None,
+    quiet=False,
+):
+    """Download url to newfilename, resuming whatever was fetched before.
+
+    Bytes go to newfilename + ".part" with a journal next to it, which is
+    renamed to newfilename once every byte is there. A later call resumes
+    the missing ranges with If-Range, so nothing fetched before is fetched
+    again unless the enclosure changed in between.
+
+    With segments above 1 the missing ranges of enclosures of at least
+    min_size are fetched over that many connections at once. Progress of
+    all of them goes to one tqdm bar, unless quiet. Every byte is taken
+    from rate_limit, a RateLimit, when there is one.
+
+    Returns:
+        The Journal of the finished download, with the length and
+        validators of the enclosure.
+
+    Raises:
+        DownloadError: The download stopped, calling again resumes it.
+    """
+    import requests
+
+    if session is None:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(segments, 1))
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+    partname = newfilename + ".part"
+    journal = None
+    if os.path.isfile(partname):
+        journal = Journal.load(partname + ".json", url)
+    try:
+        for _ in range(2):
+            if journal is None:
+                journal = Journal(partname + ".json", url)
+                open(partname, "wb").close()
+                if segments > 1:
+                    response, total = probe(session, url, headers, timeout)
+                    if total and total >= min_size:
+                        journal.learn(response, total)
+                        journal.ranges_ok = True
+            try:
+                fetch_missing(
+                    session,
+                    url,
+                    headers,
+                    partname,
+                    journal,
+                    segments,
+                    timeout,
+                    rate_limit,
+                    quiet,
+                )
+                break
+            except Restart:
+                if not quiet:
+                    print("Enclosure changed since the download started, restarting")
+                journal.remove()
+                journal = None
+        else:
+            raise DownloadError(f"{url} keeps changing")
+        if not journal.complete():
+            # the server closed the connection early without an error
+            raise DownloadError(
+                f"{url} ended at byte {journal.done()} of {journal.length}"
+            )
+    except requests.exceptions.RequestException as err:
+        raise DownloadError(str(err)) from err
+    finally:
+        if journal is not None and not journal.complete():
+            if journal.ranges:
+                journal.save()
+            else:
+                journal.remove()
+                os.remove(partname)
+
+    journal.remove()
+    os.replace(partname, newfilename)
+    return journal
+
+
+def fetch_missing(
+    session,
+    url,
+    headers,
+    partname,
+    journal,
+    segments,
+    timeout,
+    rate_limit=None,
+    quiet=False,
+):
+    """Fetch every gap of the journal into partname."""
+    import tqdm
+
+    gaps = journal.missing()
+    if journal.ranges_ok and journal.length and segments > 1:
+        gaps = split_gaps(gaps, segments)
+    fd = os.open(partname, os.O_RDWR | os.O_CREAT, 0o644)
+    lock = threading.Lock()
+    try:
+        if journal.length:
+            os.ftruncate(fd, journal.length)
+        with tqdm.tqdm(
+            total=journal.length,
+            initial=journal.done(),
+            unit="iB",
+            unit_scale=True,
+            disable=quiet,
+        ) as bar:
+
+            def progress(count):
+                with lock:
+                    bar.update(count)
+                if rate_limit is not None:
+                    rate_limit.take(count)
+
+            if len(gaps) == 1:
+                fetch_gap(
+                    session, url, headers, fd, journal, gaps[0], progress, timeout
+                )
+                return
+            with concurrent.futures.ThreadPoolExecutor(max_workers=segments) as pool:
+                futures = [
+                    pool.submit(
+                        fetch_gap,
+                        session,
+                        url,
+                        headers,
+                        fd,
+                        journal,
+                        gap,
+                        progress,
+                        timeout,
+                    )
+                    for gap in gaps
+                ]
+                for future in futures:
+                    future.result()
+    finally:
+        os.close(fd)
+
+
+def prefetch(url, newfilename, headers, nbytes, session=None, timeout=30):
+    """Download the first nbytes of url into the .part file of newfilename.
+
+    Only kept when the server answers with a range, so that download()
+    resumes from there later.
+    """
+    import requests
+
+    partname = newfilename + ".part"
+    if os.path.exists(newfilename) or os.path.exists(partname):
+        return
+    session = session or requests.Session()
+    request_headers = dict(headers, Range=f"bytes=0-{nbytes - 1}")
+    try:
+        with session.get(
+            url, headers=request_headers, stream=True, timeout=timeout
+        ) as response:
+            if response.status_code != 206:
+                return
+            journal = Journal(partname + ".json", url)
+            journal.learn(response, content_range(response)[1])
+            journal.ranges_ok = True
+            position = 0
+            with open(partname, "wb") as out_file:
+                for data in response.iter_content(BLOCK_SIZE):
+                    out_file.write(data)
+                    position += len(data)
+            journal.ranges = [[0, position]] if position else []
+            journal.save()
+    except (requests.exceptions.RequestException, OSError):
+        return
+
+
+def adopt(newfilename, url):
+    """Turn a partial newfilename left by older versions into a .part file.
+
+    Older versions appended to newfilename directly and kept no journal,
+    so the bytes are resumed without a validator.
+    """
+    partname = newfilename + ".part"
+    if not os.path.isfile(newfilename) or os.path.exists(partname):
+        return
+    size = os.path.getsize(newfilename)
+    os.replace(newfilename, partname)
+    journal = Journal(partname + ".json", url)
+    journal.ranges = [[0, size]] if size else []
+    journal.save()
+
+
+def partial_size(newfilename):
+    """Bytes of newfilename downloaded so far."""
+    if os.path.isfile(newfilename):
+        return os.path.getsize(newfilename)
+    journal = Journal.load(newfilename + ".part.json")
+    return journal.done() if journal else 0
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""Downloaded episodes."""
+import collections
+import json
+import os
+import time
+
+SKIPPED = (".part", ".json", ".err", ".tmp")
+
+
+class DownloadCache(object):
+    """Keep the download directory under a size budget.
+
+    An index maps every downloaded file, by its path below directory, to
+    its size, the last time it was played, its podcast and its title. The
+    index is kept up to date as files are added and played, so the
+    directory is only walked when the index does not exist yet. Past the
+    budget the least recently played files are removed first. Files
+    linked to one another, like episodes sharing a file of the content
+    store, count once.
+
+    Args:
+        directory (str): The download directory
+        index_path (str): The json index, created when needed
+        max_bytes (int): Size budget, 0 for none
+        history (History): Play times of files found by walking
+    """
+
+    def __init__(self, directory, index_path, max_bytes, history=None):
+        self.directory = directory
+        self.index_path = index_path
+        self.max_bytes = max_bytes
+        self.history = history
+        self.entries = None
+
+    def load(self):
+        """Return the index, walking the directory if there is none."""
+        if self.entries is None:
+            try:
+                with open(self.index_path) as index_file:
+                    self.entries = json.load(index_file)
+            except (OSError, ValueError):
+                self.entries = self.scan()
+                self.save()
+        return self.entries
+
+    def scan(self):
+        """Index every file below directory."""
+        played = {}
+        if self.history is not None:
+            played = {(pod, title): when for pod, title, when in self.history.plays()}
+        entries = {}
+        for root, dirs, files in os.walk(self.directory):
+            # the content store and other hidden directories are not episodes
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            for name in files:
+                if name.endswith(SKIPPED):
+                    continue
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, self.directory)
+                pod = relative.split(os.sep)[0] if os.sep in relative else ""
+                # named {title}_{date}{ext} by episode_filename
+                title = os.path.splitext(name)[0].rpartition("_")[0] or name
+                size = os.path.getsize(path)
+                entries[relative] = [size, played.get((pod, title), 0), pod, title]
+        return entries
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        with open(self.index_path + ".tmp", "w") as index_file:
+            json.dump(self.entries, index_file, separators=(",", ":"))
+        os.replace(self.index_path + ".tmp", self.index_path)
+
+    def add(self, path, pod, title):
+        """Index a finished download and make room for it."""
+        relative = os.path.relpath(path, self.directory)
+        self.load()[relative] = [os.path.getsize(path), time.time(), pod, title]
+        self.save()
+        return self.evict(keep=(relative,))
+
+    def played(self, pod, title, when=None):
+        """Mark the files of title of pod as played."""
+        when = time.time() if when is None else when
+        changed = False
+        for entry in self.load().values():
+            if entry[2] == pod and entry[3] == title:
+                entry[1] = when
+                changed = True
+        if changed:
+            self.save()
+
+    def files(self):
+        """The file of every entry, the same for links to one file."""
+        files = {}
+        for relative in self.load():
+            try:
+                stat = os.stat(os.path.join(self.directory, relative))
+                files[relative] = (stat.st_dev, stat.st_ino)
+            except OSError:
+                files[relative] = relative
+        return files
+
+    def size(self, files=None):
+        """Bytes of the files indexed, counting links to one file once."""
+        files = self.files() if files is None else files
+        sizes = {files[relative]: entry[0] for relative, entry in self.load().items()}
+        return sum(sizes.values())
+
+    def evict(self, keep=()):
+        """Remove least recently played files until within the budget.
+
+        Episodes linked to one file of the content store take its space
+        once, and only give it back when the last of them is removed.
+
+        Returns:
+            The paths removed.
+        """
+        removed = []
+        if not self.max_bytes:
+            return removed
+        entries = self.load()
+        files = self.files()
+        links = collections.Counter(files.values())
+        total = self.size(files)
+        for relative in sorted(entries, key=lambda relative: entries[relative][1]):
+            if total <= self.max_bytes:
+                break
+            if relative in keep:
+                continue
+            path = os.path.join(self.directory, relative)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size = entries.pop(relative)[0]
+            links[files[relative]] -= 1
+            if not links[files[relative]]:
+                total -= size
+            removed.append(path)
+        if removed:
+            self.save()
+        return removed
+
+    def stats(self):
+        """Files and bytes of every podcast, and the oldest play."""
+        podcasts = collections.defaultdict(lambda: [0, 0])
+        for size, _, pod, _ in self.load().values():
+            podcasts[pod][0] += 1
+            podcasts[pod][1] += size
+        played = [entry[1] for entry in self.entries.values() if entry[1]]
+        return {
+            "files": len(self.entries),
+            "bytes": self.size(),
+            "max_bytes": self.max_bytes,
+            "oldest_played": min(played) if played else None,
+            "podcasts": dict(podcasts),
+        }
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""On disk feed cache."""
+import hashlib
+import json
+import os
+import pickle
+import time
+
+from Podcast import Podcast
+
+
+class FeedCache(object):
+    """Keep fetched feeds on disk between runs.
+
+    Every feed is stored as three files named after the sha1 of its url:
+    the raw bytes (.xml), the parsed Podcast (.pickle) and the metadata
+    (.json) needed for conditional requests and eviction. When the pickle
+    cannot be written or read the Podcast is parsed again from the raw
+    bytes.
+
+    Args:
+        directory (str): Where the cache lives, created when needed
+        max_bytes (int): Size of the cache before the least recently used
+            feeds are evicted
+
+    Attributes:
+        directory (str): Where the cache lives
+        max_bytes (int): Size budget of the cache
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, url, ext):
+        """Path of the file with extension ext for url."""
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key + ext)
+
+    def load(self, url):
+        """Return the metadata of the cached url, or None."""
+        try:
+            with open(self.path(url, ".json")) as meta_file:
+                meta = json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url or not os.path.isfile(self.path(url, ".xml")):
+            return None
+        return meta
+
+    def is_fresh(self, meta):
+        """Is the cached feed still within the ttl the feed asked for."""
+        try:
+            ttl = int(meta.get("ttl") or 0) * 60
+        except ValueError:
+            return False
+        return time.time() - meta["fetched"] < ttl
+
+    def request_headers(self, meta):
+        """Headers that make the request conditional on the cached copy."""
+        headers = {}
+        if meta is None:
+            return headers
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def podcast(self, meta, engine="soup"):
+        """Return the cached Podcast and mark it as used."""
+        url = meta["url"]
+        try:
+            with open(self.path(url, ".pickle"), "rb") as pickle_file:
+                podcast = pickle.load(pickle_file)
+        except (OSError, pickle.UnpicklingError, AttributeError, EOFError):
+            with open(self.path(url, ".xml"), "rb") as xml_file:
+                podcast = Podcast(xml_file.read(), engine=engine)
+        meta["used"] = time.time()
+        self.write_meta(meta)
+        return podcast
+
+    def revalidated(self, meta):
+        """The server answered 304, the cached copy is fresh again."""
+        meta["fetched"] = time.time()
+        self.write_meta(meta)
+
+    def store(self, url, raw, podcast, etag=None, last_modified=None):
+        """Store a freshly fetched feed and evict old ones if needed."""
+        os.makedirs(self.directory, exist_ok=True)
+        self.write(self.path(url, ".xml"), raw)
+        try:
+            parsed = pickle.dumps(podcast, pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, RecursionError, TypeError, AttributeError):
+            # deep soups do not pickle, they are parsed again from .xml
+            parsed = b""
+        if parsed:
+            self.write(self.path(url, ".pickle"), parsed)
+        elif os.path.isfile(self.path(url, ".pickle")):
+            os.remove(self.path(url, ".pickle"))
+        now = time.time()
+        meta = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "ttl": podcast.ttl,
+            "fetched": now,
+            "used": now,
+            "size": len(raw) + len(parsed),
+        }
+        self.write_meta(meta)
+        self.evict()
+        return meta
+
+    def write_meta(self, meta):
+        self.write(self.path(meta["url"], ".json"), json.dumps(meta).encode())
+
+    def write(self, path, data):
+        """Write data to path atomically."""
+        temp = path + ".tmp"
+        with open(temp, "wb") as out_file:
+            out_file.write(data)
+        os.replace(temp, path)
+
+    def entries(self):
+        """Metadata of every cached feed."""
+        if not os.path.isdir(self.directory):
+            return []
+        metas = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as meta_file:
+                    metas.append(json.load(meta_file))
+            except (OSError, ValueError):
+                continue
+        return metas
+
+    def remove(self, url):
+        for ext in (".json", ".xml", ".pickle"):
+            try:
+                os.remove(self.path(url, ext))
+            except FileNotFoundError:
+                pass
+
+    def evict(self):
+        """Remove least recently used feeds until the cache fits max_bytes."""
+        metas = sorted(self.entries(), key=lambda meta: meta.get("used", 0))
+        total = sum(meta.get("size", 0) for meta in metas)
+        for meta in metas:
+            if total <= self.max_bytes:
+                break
+            self.remove(meta["url"])
+            total -= meta.get("size", 0)
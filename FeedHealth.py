@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Failures of feeds and their hosts."""
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+
+
+def host_of(url):
+    return urllib.parse.urlsplit(url).netloc.lower()
+
+
+class FeedHealth(object):
+    """Failing feeds and hosts, kept on disk between runs.
+
+    A feed that fails is left alone for a backoff that doubles with every
+    failure in a row, up to max_backoff. A feed answering 4xx is left alone
+    for negative_ttl instead, it will not get better by asking sooner.
+
+    Failures without a usable answer, connection errors, timeouts and 5xx,
+    also count against the host. After threshold of them in a row the
+    circuit of the host opens and none of its feeds are fetched until its
+    own backoff has passed. Then one feed is let through, closing the
+    circuit when it succeeds or opening it for twice as long when not, and
+    the others wait for what it finds.
+
+    Args:
+        path (str): The json file, created when needed
+        backoff (float): Seconds a feed is left alone after one failure
+        max_backoff (float): Longest backoff in seconds
+        negative_ttl (float): Seconds a feed answering 4xx is left alone
+        threshold (int): Failures of a host in a row opening its circuit
+    """
+
+    def __init__(
+        self, path, backoff=60, max_backoff=6 * 3600, negative_ttl=1800, threshold=3
+    ):
+        self.path = path
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.negative_ttl = negative_ttl
+        self.threshold = threshold
+        self.entries = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        if self.entries is None:
+            try:
+                with open(self.path) as health_file:
+                    self.entries = json.load(health_file)
+            except (OSError, ValueError):
+                self.entries = {"feeds": {}, "hosts": {}}
+        return self.entries
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", "w") as health_file:
+            json.dump(self.entries, health_file, separators=(",", ":"))
+        os.replace(self.path + ".tmp", self.path)
+
+    def delay(self, failures):
+        """Backoff after failures in a row, give or take a tenth."""
+        delay = min(self.backoff * 2 ** (failures - 1), self.max_backoff)
+        return delay * random.uniform(0.9, 1.1)
+
+    def blocked(self, url, now=None):
+        """Why url should not be fetched now, None if it can be.
+
+        Once the circuit of a host has been open for its backoff, the first
+        caller is let through as a trial and the other feeds of the host
+        stay blocked until it succeeds or fails, or for backoff seconds
+        should it never say.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            entries = self.load()
+            feed = entries["feeds"].get(url)
+            if feed and feed["retry"] > now:
+                return (
+                    f"Failed {feed['failures']} times, next try in"
+                    f" {feed['retry'] - now:.0f}s: {feed['error']}"
+                )
+            host = entries["hosts"].get(host_of(url))
+            if not host or host["failures"] < self.threshold:
+                return None
+            if host["retry"] > now:
+                return (
+                    f"{host_of(url)} is down, next try in {host['retry'] - now:.0f}s"
+                )
+            if host.get("probing", 0) > now:
+                return f"{host_of(url)} is down, another feed is trying it"
+            host["probing"] = now + self.backoff
+        return None
+
+    def failure(self, url, error, status=None, now=None):
+        """Record that url failed, status being what the server answered."""
+        now = time.time() if now is None else now
+        with self.lock:
+            entries = self.load()
+            feed = entries["feeds"].setdefault(url, {"failures": 0, "since": now})
+            feed["failures"] += 1
+            feed["error"] = str(error)
+            feed["status"] = status
+            if status is not None and 400 <= status < 500:
+                feed["retry"] = now + self.negative_ttl
+            else:
+                feed["retry"] = now + self.delay(feed["failures"])
+            host = entries["hosts"].get(host_of(url))
+            if host is not None:
+                # whatever the trial said, the next one may go
+                host.pop("probing", None)
+            if status is None or status >= 500:
+                host = entries["hosts"].setdefault(
+                    host_of(url), {"failures": 0, "retry": 0}
+                )
+                host["failures"] += 1
+                if host["failures"] >= self.threshold:
+                    opened = host["failures"] - self.threshold + 1
+                    host["retry"] = now + self.delay(opened)
+            self.save()
+
+    def success(self, url):
+        """Forget the failures of url and its host."""
+        with self.lock:
+            entries = self.load()
+            feed = entries["feeds"].pop(url, None)
+            host = entries["hosts"].pop(host_of(url), None)
+            if feed is not None or host is not None:
+                self.save()
@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""Streaming Podcast Parser."""
+import collections
+import itertools
+import random
+import re
+import xml.parsers.expat
+
+# Elements whose every occurrence is collected, not just the first one.
+LIST_TEXT_TAGS = ("category",)
+LIST_ATTR_TAGS = ("itunes:category", "atom:link")
+
+# Marks the stack entry of an item.
+ITEM = "item"
+
+# Marks where a CDATA section starts or ends in the text of an element.
+CDATA = None
+
+# Start tag of an item, as counted without parsing.
+ITEM_TAG = re.compile(rb"<item[\s/>]")
+
+
+class FeedParser(object):
+    """Parse an xml rss feed in a single pass over an expat event stream.
+
+    The parser can be fed the whole document at once or chunk by chunk as it
+    arrives from the network. Element names are lower cased to match what
+    the html.parser soups in Podcast.py see.
+
+    Fields are recorded the way ``soup.find(tag).string`` sees them: the
+    first element with a given name wins and only elements without child
+    elements carry text, unless it is split into text and CDATA sections.
+    Attributes of that element are kept under
+    ``"@" + tag``, the elements in LIST_TEXT_TAGS and LIST_ATTR_TAGS are
+    kept as lists under ``"*" + tag`` and the children of the channel's
+    itunes:owner are kept under ``"itunes:owner>" + tag``.
+
+    With ``bounds`` set the fields of items are not collected at all.
+    Instead every item is reported as the byte offsets of its start tag and
+    of its end tag, so it can be parsed later with parse_item.
+
+    Args:
+        on_item (callable): Called with the fields of every finished item.
+            Defaults to appending them to ``items``.
+        encoding (str): Override the encoding declared by the document.
+        bounds (bool): Report items as (start, end tag) byte offsets
+
+    Attributes:
+        channel (dict): Fields of the channel, items and image excluded
+        image (dict): Fields of the first channel image
+        items (list): Fields of every item, unless on_item is given
+        item_count (int): Number of items seen so far
+        enclosure_types (set): Lower cased types of every item enclosure
+        encoding (str): Encoding of the document
+    """
+
+    def __init__(self, on_item=None, encoding=None, bounds=False):
+        self.channel = {}
+        self.image = {}
+        self.items = []
+        self.item_count = 0
+        self.enclosure_types = set()
+        self.encoding = encoding
+        self.bounds = bounds
+        self.on_item = on_item or self.items.append
+
+        # One entry per open element: [tag, scope, prefix, captures, text, nested]
+        self._stack = []
+        self._seen_image = False
+        self._item_start = 0
+
+        self.parser = xml.parsers.expat.ParserCreate(encoding)
+        self.parser.buffer_text = True
+        self.parser.XmlDeclHandler = self.xml_decl
+        self.parser.StartElementHandler = self.start_element
+        self.parser.EndElementHandler = self.end_element
+        self.parser.CharacterDataHandler = self.character_data
+        self.parser.StartCdataSectionHandler = self.cdata_section
+        self.parser.EndCdataSectionHandler = self.cdata_section
+
+    def feed(self, data, final=False):
+        """Feed a chunk of the document to the parser."""
+        self.parser.Parse(data, final)
+
+    def close(self):
+        """Tell the parser the document is complete."""
+        self.parser.Parse(b"", True)
+
+    def xml_decl(self, version, encoding, standalone):
+        if self.encoding is None:
+            self.encoding = encoding
+
+    def start_element(self, name, attrs):
+        tag = name.lower()
+        if self._stack:
+            parent = self._stack[-1]
+            parent[5] = True
+            scope, prefix = parent[1], parent[2]
+        else:
+            scope, prefix = self.channel, ""
+
+        if scope is None:
+            # Inside an item that is only located, not parsed.
+            if tag == "enclosure":
+                self.enclosure_types.add(attrs.get("type", "").lower())
+            self._stack.append([tag, None, "", None, None, False])
+            return
+        if tag == "item" and scope is self.channel:
+            if self.bounds:
+                self._item_start = self.parser.CurrentByteIndex
+                self._stack.append([tag, None, "", ITEM, None, False])
+            else:
+                self._stack.append([tag, {}, "", ITEM, None, False])
+            return
+        if tag == "image" and scope is self.channel:
+            # Only the first channel image is kept, like soup.find("image").
+            image = {} if self._seen_image else self.image
+            self._seen_image = True
+            self._stack.append([tag, image, "", None, None, False])
+            return
+
+        if tag == "enclosure" and scope is not self.channel:
+            self.enclosure_types.add(attrs.get("type", "").lower())
+        captures = []
+        if tag not in scope:
+            scope[tag] = None
+            captures.append((scope, tag))
+            if attrs:
+                scope["@" + tag] = attrs
+        if prefix and prefix + tag not in scope:
+            scope[prefix + tag] = None
+            captures.append((scope, prefix + tag))
+        if tag in LIST_TEXT_TAGS:
+            values = scope.setdefault("*" + tag, [])
+            values.append(None)
+            captures.append((values, len(values) - 1))
+        elif tag in LIST_ATTR_TAGS:
+            scope.setdefault("*" + tag, []).append(attrs)
+
+        if tag == "itunes:owner" and scope is self.channel:
+            prefix = "itunes:owner>"
+        text = [] if captures else None
+        self._stack.append([tag, scope, prefix, captures, text, False])
+
+    def end_element(self, name):
+        tag, scope, prefix, captures, text, nested = self._stack.pop()
+        if captures is ITEM:
+            self.item_count += 1
+            if self.bounds:
+                self.on_item((self._item_start, self.parser.CurrentByteIndex))
+            else:
+                self.on_item(scope)
+            return
+        if text and not nested:
+            if CDATA in text:
+                # soup keeps every text and CDATA section as a string of its own
+                sections = [
+                    "".join(group)
+                    for is_text, group in itertools.groupby(
+                        text, lambda data: data is not CDATA
+                    )
+                    if is_text
+                ]
+                sections = [section for section in sections if section]
+                if len(sections) != 1:
+                    return
+                text = sections
+            value = "".join(text)
+            for container, key in captures:
+                container[key] = value
+
+    def character_data(self, data):
+        text = self._stack[-1][4] if self._stack else None
+        if text is not None:
+            text.append(data)
+
+    def cdata_section(self):
+        text = self._stack[-1][4] if self._stack else None
+        if text is not None:
+            text.append(CDATA)
+
+
+def item_slice(data, bounds):
+    """Cut the item located by FeedParser with ``bounds`` out of data."""
+    start, end_tag = bounds
+    return data[start : data.index(b">", end_tag) + 1]
+
+
+def parse_item(data, encoding=None):
+    """Parse the xml of a single item and return its fields."""
+    parser = FeedParser(encoding=encoding or "utf-8")
+    parser.feed(data, final=True)
+    return parser.items[0]
+
+
+class StopFeed(Exception):
+    """Raised from on_item when the rest of the feed is not needed."""
+
+    pass
+
+
+class ReservoirSampler(object):
+    """Keep one random item of ``items[firstcount:lastcount]`` from a stream.
+
+    Items are offered one by one in document order without knowing how many
+    there will be. Python slice semantics are kept for negative counts by
+    holding back only as many items as the negative count asks for, so
+    memory stays constant however long the feed is. With a non negative
+    lastcount the rest of the feed is skipped by raising StopFeed.
+
+    Args:
+        firstcount (int): Start of the slice, or None
+        lastcount (int): End of the slice, or None
+        rng (random.Random): Source of randomness
+
+    Attributes:
+        count (int): Number of items offered
+        choice (dict): The item kept so far
+    """
+
+    def __init__(self, firstcount=None, lastcount=None, rng=random):
+        self.firstcount = firstcount
+        self.lastcount = lastcount
+        self.rng = rng
+        self.count = 0
+        self.eligible = 0
+        self.choice = None
+        self.tail = None
+        self.held = None
+        if firstcount is not None and firstcount < 0:
+            self.tail = collections.deque(maxlen=-firstcount)
+        elif lastcount is not None and lastcount < 0:
+            self.held = collections.deque()
+
+    def offer(self, item):
+        """Offer the next item of the feed."""
+        index = self.count
+        self.count += 1
+        if self.tail is not None:
+            self.tail.append(item)
+            return
+        if self.held is not None:
+            # Only items followed by -lastcount others are in the slice.
+            self.held.append((index, item))
+            if len(self.held) <= -self.lastcount:
+                return
+            index, item = self.held.popleft()
+        elif self.lastcount is not None and index >= self.lastcount:
+            raise StopFeed
+        if index < (self.firstcount or 0):
+            return
+        self.eligible += 1
+        if self.rng.randrange(self.eligible) == 0:
+            self.choice = item
+
+    def result(self):
+        """Return the chosen item, or None if the slice is empty."""
+        if self.tail is None:
+            return self.choice
+        indices = range(self.count)[self.firstcount : self.lastcount]
+        if not indices:
+            return None
+        index = self.rng.choice(indices)
+        return self.tail[index - (self.count - len(self.tail))]
+
+
+def sample_feed(stream, firstcount=None, lastcount=None, chunk_size=64 * 1024):
+    """Stream a feed from a file like object and pick one random item.
+
+    Returns:
+        The FeedParser holding the channel fields, and the fields of the
+        chosen item or None.
+    """
+    sampler = ReservoirSampler(firstcount, lastcount)
+    parser = FeedParser(on_item=sampler.offer)
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            parser.feed(chunk)
+        parser.close()
+    except StopFeed:
+        pass
+    return parser, sampler.result()
+
+
+def count_items(data, stream, chunk_size=64 * 1024):
+    """Count the item start tags in data and the rest of stream.
+
+    The tags are only searched for, not parsed, so this is much faster
+    than parsing, at the price of counting an item tag inside a CDATA
+    section too.
+    """
+    count = 0
+    overlap = 5  # a tag cut at the end of data is counted with what follows
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return count + len(ITEM_TAG.findall(data))
+        data += chunk
+        cut = len(data) - overlap
+        count += sum(1 for match in ITEM_TAG.finditer(data) if match.start() < cut)
+        data = data[cut:]
+
+
+def read_new_items(stream, known, incremental=None, chunk_size=64 * 1024):
+    """Stream a feed from a file like object up to its first known item.
+
+    For a feed ordered newest first every item after one that was seen
+    before is old, so the rest of the feed is not parsed, its items are
+    only counted. When the first item ends incremental is called with the
+    channel fields, if it returns False the feed is read to its end
+    instead.
+
+    Args:
+        stream: File like object of the feed
+        known (callable): Called with the fields of an item, True if the
+            item was seen before
+        incremental (callable): Decides from the channel whether stopping
+            at a known item can be trusted
+
+    Returns:
+        The FeedParser holding the channel fields, the fields of the items
+        before the first known one, every item if the feed was read to its
+        end, whether the reading stopped at a known item, and the number of
+        items in the feed.
+    """
+    items = []
+    trusted = []
+
+    def offer(fields):
+        if not trusted:
+            trusted.append(incremental is None or incremental(parser.channel))
+        if trusted[0] and known(fields):
+            raise StopFeed
+        items.append(fields)
+
+    parser = FeedParser(on_item=offer)
+    # the last two chunks, so the end of the known item is still at hand
+    window = b""
+    read = 0
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            window = window[-chunk_size:] + chunk
+            read += len(chunk)
+            parser.feed(chunk)
+        parser.close()
+    except StopFeed:
+        # the parser is at the end tag of the known item, which is counted
+        rest = window[max(parser.parser.CurrentByteIndex - (read - len(window)), 0) :]
+        count = parser.item_count + count_items(rest, stream, chunk_size)
+        return parser, items, True, count
+    return parser, items, False, parser.item_count
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Play history."""
+import collections
+import csv
+import json
+import os
+import threading
+import time
+
+
+def tail_lines(path, count, block_size=64 * 1024):
+    """Return the last count lines of a file without reading all of it."""
+    with open(path, "rb") as log_file:
+        log_file.seek(0, os.SEEK_END)
+        position = log_file.tell()
+        data = b""
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(block_size, position)
+            position -= step
+            log_file.seek(position)
+            data = log_file.read(step) + data
+    lines = data.splitlines()
+    return lines[-count:] if count else []
+
+
+class History(object):
+    """Append only log of played episodes.
+
+    Every play is one json line of podcast, title and time played. Only
+    the last histcount plays are loaded, from the end of the log, and kept
+    in a hash index, so recording a play and checking one are O(1) however
+    long the history grows. The index is shared with the thread choosing
+    the next episode, so it is only used under a lock.
+
+    Args:
+        path (str): The log file, created when needed
+        histcount (int): How many recent plays count as recently played
+
+    Attributes:
+        recent (collections.deque): (podcast, title, played) of the last
+            histcount plays, oldest first
+    """
+
+    def __init__(self, path, histcount):
+        self.path = path
+        self.histcount = histcount
+        self.recent = collections.deque()
+        self.index = collections.defaultdict(collections.Counter)
+        self.lock = threading.Lock()
+        if os.path.isfile(path):
+            for line in tail_lines(path, histcount):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self.remember(entry["podcast"], entry["title"], entry.get("played"))
+
+    def remember(self, pod, title, played):
+        """Add a play to the index, forgetting the oldest one if needed."""
+        with self.lock:
+            self.recent.append((pod, title, played))
+            self.index[pod][title] += 1
+            if len(self.recent) > self.histcount:
+                old_pod, old_title, _ = self.recent.popleft()
+                titles = self.index[old_pod]
+                titles[old_title] -= 1
+                if not titles[old_title]:
+                    del titles[old_title]
+                    if not titles:
+                        del self.index[old_pod]
+
+    def append(self, pod, title, played=None):
+        """Record that title of pod was played."""
+        played = time.time() if played is None else played
+        line = json.dumps({"podcast": pod, "title": title, "played": played})
+        with open(self.path, "a", encoding="utf-8") as log_file:
+            log_file.write(line + "\n")
+        self.remember(pod, title, played)
+
+    def __contains__(self, entry):
+        pod, title = entry
+        with self.lock:
+            return title in self.index.get(pod, ())
+
+    def titles(self, pod):
+        """Titles of pod that were played recently."""
+        with self.lock:
+            return set(self.index.get(pod, ()))
+
+    def plays(self):
+        """(podcast, title, played) of the recent plays, oldest first."""
+        with self.lock:
+            return list(self.recent)
+
+    def migrate_csv(self, csv_path):
+        """Copy the plays of the old pandas csv history into the log.
+
+        Only done while the log does not exist yet, so it happens once.
+        """
+        if os.path.exists(self.path) or not os.path.isfile(csv_path):
+            return 0
+        with open(csv_path, newline="", encoding="utf-8") as csv_file:
+            rows = [(row["Podcast"], row["Title"]) for row in csv.DictReader(csv_file)]
+        # the csv has no times, keep the order with times from the epoch
+        with open(self.path + ".tmp", "w", encoding="utf-8") as log_file:
+            for played, (pod, title) in enumerate(rows):
+                entry = {"podcast": pod, "title": title, "played": played}
+                log_file.write(json.dumps(entry) + "\n")
+        os.replace(self.path + ".tmp", self.path)
+        first = max(len(rows) - self.histcount, 0)
+        for played, (pod, title) in enumerate(rows[first:], start=first):
+            self.remember(pod, title, played)
+        return len(rows)
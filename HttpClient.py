@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Shared HTTP client."""
+
+CHUNK_SIZE = 64 * 1024
+
+
+class HttpError(IOError):
+    """A request failed or the server answered with an error.
+
+    Attributes:
+        status (int): Status the server answered with, None if it did not
+    """
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class Body(object):
+    """File like view of a streamed, decompressed response body."""
+
+    def __init__(self, response):
+        self.response = response
+        self.chunks = response.iter_content(CHUNK_SIZE)
+
+    def read(self, size=-1):
+        """Return the next chunk of the body, b"" once it is all read."""
+        import requests
+
+        try:
+            if size is None or size < 0:
+                return b"".join(self.chunks)
+            return next(self.chunks, b"")
+        except requests.exceptions.RequestException as err:
+            raise HttpError(str(err)) from err
+
+
+class HttpClient(object):
+    """Every request of the podcaster goes through one pool of connections.
+
+    Connections are kept alive per host, so the feeds, validations and
+    downloads that hit the same CDN reuse them instead of connecting and
+    negotiating TLS again. requests is only imported with the first
+    request.
+
+    Args:
+        headers (dict): Sent with every request
+        timeout (float): Seconds to wait for a connection or for data
+        pool_size (int): Connections kept alive per host
+
+    Attributes:
+        headers (dict): Sent with every request
+        timeout (float): Default timeout of every request
+    """
+
+    def __init__(self, headers, timeout=30, pool_size=8):
+        self.headers = dict(headers)
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._session = None
+
+    @property
+    def session(self):
+        """The requests.Session holding the connections."""
+        if self._session is None:
+            import requests
+
+            session = requests.Session()
+            session.headers.update(self.headers)
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=32, pool_maxsize=self.pool_size
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._session = session
+        return self._session
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request("HEAD", url, **kwargs)
+
+    def feed(self, url, headers=None):
+        """Request a feed, compressed, with its body streamed.
+
+        Returns:
+            The response, a 304 included. Its body is read through
+            Body(response).
+
+        Raises:
+            HttpError: The feed could not be fetched.
+        """
+        import requests
+
+        request_headers = {"Accept-Encoding": "gzip, deflate"}
+        request_headers.update(headers or {})
+        try:
+            response = self.get(url, headers=request_headers, stream=True)
+        except requests.exceptions.RequestException as err:
+            raise HttpError(str(err)) from err
+        if response.status_code >= 400:
+            response.close()
+            raise HttpError(
+                f"{url} answered {response.status_code}", response.status_code
+            )
+        return response
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
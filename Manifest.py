@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""What is known about enclosures."""
+import json
+import os
+import threading
+
+
+class Manifest(object):
+    """Length and validators of enclosures kept on disk between runs.
+
+    Maps every enclosure url to what its server said about it, length,
+    ETag and Last-Modified, and to the size of the file last validated
+    against it. A file of that size is valid without asking the server
+    again.
+
+    Args:
+        path (str): The json file, created when needed
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        if self.entries is None:
+            try:
+                with open(self.path) as manifest_file:
+                    self.entries = json.load(manifest_file)
+            except (OSError, ValueError):
+                self.entries = {}
+        return self.entries
+
+    def get(self, url):
+        """What is known about url, an empty dict if nothing."""
+        with self.lock:
+            return dict(self.load().get(url, {}))
+
+    def update(self, url, **fields):
+        """Record fields of url, those that are None are left as they were."""
+        with self.lock:
+            entry = self.load().setdefault(url, {})
+            entry.update(
+                (key, value) for key, value in fields.items() if value is not None
+            )
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".tmp", "w") as manifest_file:
+                json.dump(self.entries, manifest_file)
+            os.replace(self.path + ".tmp", self.path)
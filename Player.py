@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""Persistent mpv player."""
+import json
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+MPV_OPTIONS = [
+    "--no-video",
+    "--term-osd-bar",
+    "--term-osd-bar-chars=[##-]",
+    "--msg-level=all=error,statusline=status",
+]
+
+
+class PlayerError(Exception):
+    """mpv could not be started or did not answer."""
+
+    pass
+
+
+class Player(object):
+    """One long lived mpv driven over its JSON IPC socket.
+
+    mpv is started idle the first time something is played and kept
+    running between episodes, so audio output is only set up once and the
+    next file starts as soon as the previous one ends. Should mpv quit, for
+    example because q was pressed, it is started again on the next play.
+
+    Args:
+        command (str): The mpv executable
+        options (list): Extra mpv command line options
+        timeout (float): Seconds to wait for mpv to answer a command
+
+    Attributes:
+        position (float): Playback position of the current file in seconds
+        on_event (list): Callables called with every event mpv sends
+    """
+
+    def __init__(self, command="mpv", options=MPV_OPTIONS, timeout=10):
+        self.command_line = [command] + list(options)
+        self.timeout = timeout
+        self.position = None
+        self.on_event = []
+
+        self.process = None
+        self.sock = None
+        self.directory = None
+        self.lock = threading.Lock()
+        self.request_id = 0
+        self.replies = {}
+        self.events = queue.Queue()
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """Start mpv idle and connect to its IPC socket."""
+        self.close()
+        self.directory = tempfile.mkdtemp(prefix="podcaster-")
+        path = os.path.join(self.directory, "mpv.sock")
+        try:
+            self.process = subprocess.Popen(
+                self.command_line
+                + [
+                    "--idle=yes",
+                    "--input-terminal=no",
+                    f"--input-ipc-server={path}",
+                ],
+            )
+        except OSError as err:
+            raise PlayerError(f"Cannot start {self.command_line[0]}: {err}")
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.sock.connect(path)
+                break
+            except OSError:
+                self.sock.close()
+                if not self.alive() or time.monotonic() > deadline:
+                    raise PlayerError("mpv did not open its IPC socket")
+                time.sleep(0.05)
+        self.events = queue.Queue()
+        reader = threading.Thread(target=self.read, args=(self.sock,), daemon=True)
+        reader.start()
+        self.command("observe_property", 1, "time-pos")
+
+    def read(self, sock):
+        """Dispatch replies and events until mpv closes the socket."""
+        with sock.makefile("rb") as stream:
+            for line in stream:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                if "request_id" in message and "event" not in message:
+                    reply = self.replies.get(message["request_id"])
+                    if reply is not None:
+                        reply.append(message)
+                        reply[0].set()
+                    continue
+                if message.get("event") == "property-change":
+                    if message.get("name") == "time-pos":
+                        self.position = message.get("data")
+                for callback in self.on_event:
+                    callback(message)
+                self.events.put(message)
+        self.events.put({"event": "end-file", "reason": "quit"})
+        for reply in list(self.replies.values()):
+            reply[0].set()
+
+    def command(self, *args):
+        """Send a command and return the data of mpv's reply."""
+        with self.lock:
+            self.request_id += 1
+            request_id = self.request_id
+            reply = [threading.Event()]
+            self.replies[request_id] = reply
+            message = {"command": list(args), "request_id": request_id}
+            try:
+                self.sock.sendall(json.dumps(message).encode() + b"\n")
+            except OSError as err:
+                del self.replies[request_id]
+                raise PlayerError(f"mpv is gone: {err}")
+        answered = reply[0].wait(self.timeout)
+        del self.replies[request_id]
+        if not answered or len(reply) < 2:
+            raise PlayerError(f"mpv did not answer {args[0]}")
+        if reply[1].get("error") != "success":
+            raise PlayerError(f"mpv {args[0]}: {reply[1].get('error')}")
+        return reply[1].get("data")
+
+    def loadfile(self, target, mode="replace"):
+        """Load target, replacing the current file or appending it."""
+        if not self.alive():
+            self.start()
+        self.command("loadfile", target, mode)
+
+    def append(self, target):
+        """Queue target to play right after the current file."""
+        self.loadfile(target, "append-play")
+
+    def wait(self):
+        """Wait until the next file ends and return why it ended."""
+        started = False
+        while True:
+            event = self.events.get()
+            if event.get("event") == "start-file":
+                started = True
+            elif event.get("event") == "end-file":
+                if started or event.get("reason") == "quit":
+                    return event.get("reason")
+
+    def play(self, target):
+        """Play target and block until it ends."""
+        if not self.alive():
+            self.start()
+        self.events = queue.Queue()
+        self.position = None
+        self.loadfile(target)
+        self.set_terminal(True)
+        try:
+            return self.wait()
+        finally:
+            self.set_terminal(False)
+
+    def set_terminal(self, enabled):
+        """Let mpv read keys only while it is playing."""
+        if not self.alive():
+            return
+        try:
+            self.command("set_property", "input-terminal", enabled)
+        except PlayerError:
+            pass
+
+    def close(self):
+        """Quit mpv."""
+        if self.alive():
+            try:
+                self.command("quit")
+            except PlayerError:
+                pass
+            try:
+                self.process.wait(self.timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+        self.process = None
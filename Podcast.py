@@ -1,8 +1,30 @@
 # -*- coding: utf-8 -*-
 """Podcast Parser."""
-from bs4 import BeautifulSoup
+from collections.abc import Sequence
 from datetime import datetime
 import email.utils
+import xml.parsers.expat
+from FeedParser import FeedParser, item_slice, parse_item
+
+
+def lower(value):
+    """Lower case a value that may be None."""
+    if value is None:
+        return None
+    return value.lower()
+
+
+def feed_soup(content):
+    """BeautifulSoup of a feed that keeps the text of link and image.
+
+    html.parser treats them as html void elements and drops their content.
+    """
+    from bs4 import BeautifulSoup
+    from bs4.builder import HTMLParserTreeBuilder
+
+    builder = HTMLParserTreeBuilder()
+    builder.empty_element_tags = set()
+    return BeautifulSoup(content, builder=builder)
 
 
 class Item(object):
@@ -13,6 +35,8 @@ class Item(object):
 
     Args:
         soup (bs4.BeautifulSoup): BeautifulSoup object representing a rss item
+        fields (dict): Fields of the item collected by FeedParser, used
+            instead of soup
 
     Note:
         All attributes with empty or nonexistent element will have a value of None
@@ -41,12 +65,15 @@ class Item(object):
         date_time (datetime): When published
     """
 
-    def __init__(self, soup):
+    def __init__(self, soup=None, fields=None):
         # super(Item, self).__init__()
 
         self.soup = soup
-        self.set_rss_element()
-        self.set_itunes_element()
+        if fields is None:
+            self.set_rss_element()
+            self.set_itunes_element()
+        else:
+            self.set_fields(fields)
 
         self.set_time_published()
         self.set_dates_published()
@@ -96,6 +123,32 @@ class Item(object):
         item["title"] = self.title
         return item
 
+    def set_fields(self, fields):
+        """Set every element from the fields collected by FeedParser."""
+        self.author = fields.get("author")
+        self.categories = fields.get("*category", [])
+        self.comments = fields.get("comments")
+        self.creative_commons = fields.get("creativecommons:license")
+        self.description = fields.get("description")
+        enclosure = fields.get("@enclosure", {})
+        self.enclosure_url = enclosure.get("url")
+        self.enclosure_type = enclosure.get("type")
+        self.enclosure_length = enclosure.get("length")
+        self.guid = fields.get("guid")
+        self.link = fields.get("link")
+        self.published_date = fields.get("pubdate")
+        self.title = fields.get("title")
+
+        self.itunes_author_name = fields.get("itunes:author")
+        self.itunes_block = (fields.get("itunes:block") or "").lower() == "yes"
+        self.itunes_closed_captioned = lower(fields.get("itunes:isclosedcaptioned"))
+        self.itunes_duration = fields.get("itunes:duration")
+        self.itunes_explicit = lower(fields.get("itunes:explicit"))
+        self.itune_image = fields.get("@itunes:image", {}).get("href")
+        self.itunes_order = lower(fields.get("itunes:order"))
+        self.itunes_subtitle = fields.get("itunes:subtitle")
+        self.itunes_summary = fields.get("itunes:summary")
+
     def set_rss_element(self):
         """Set each of the basic rss elements."""
         self.set_author()
@@ -273,6 +326,44 @@ class Item(object):
             self.itunes_summary = None
 
 
+class ItemList(Sequence):
+    """A list of Items that are only built when they are accessed.
+
+    Parsing only records where each item is, as a soup Tag or as the byte
+    offsets of the item in the feed. Indexing, slicing and iterating build
+    the Item from there and keep it, so every item is built at most once.
+    Slices share the built Items with the list they were cut from.
+
+    Args:
+        sources (list): One source per item, as recorded by the parser
+        build (callable): Turns a source into an Item
+    """
+
+    def __init__(self, sources, build, indices=None, built=None):
+        self.sources = sources
+        self.build = build
+        self.indices = range(len(sources)) if indices is None else indices
+        self.built = [None] * len(sources) if built is None else built
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ItemList(
+                self.sources, self.build, self.indices[index], self.built
+            )
+        position = self.indices[index]
+        item = self.built[position]
+        if item is None:
+            item = self.build(self.sources[position])
+            self.built[position] = item
+        return item
+
+    def __repr__(self):
+        return f"<ItemList of {len(self)} items>"
+
+
 class Podcast:
     """Parses an xml rss feed
 
@@ -287,6 +378,9 @@ class Podcast:
 
     Args:
         feed_content (str): An rss string
+        engine (str): "soup" parses with BeautifulSoup, "expat" parses in a
+            single pass with FeedParser and falls back to "soup" when the
+            feed is not well formed xml
 
     Note:
         All attributes with empty or nonexistent element will have a value of None
@@ -295,13 +389,15 @@ class Podcast:
 
     Attributes:
         feed_content (str): The actual xml of the feed
+        engine (str): The engine that parsed the feed
+        encoding (str): Encoding of feed_content, for the expat engine
         soup (bs4.BeautifulSoup): A soup of the xml with items and image removed
         image_soup (bs4.BeautifulSoup): soup of image
         full_soup (bs4.BeautifulSoup): A soup of the xml with items
         categories (list): List for strings representing the feed categories
         copyright (str): The feed's copyright
         creative_commons (str): The feed's creative commons license
-        items (item): Item objects
+        items (ItemList): Item objects, built when accessed
         description (str): The feed's description
         generator (str): The feed's generator
         image_title (str): Feed image title
@@ -334,21 +430,50 @@ class Podcast:
         date_time (datetime): When published
     """
 
-    def __init__(self, feed_content):
+    def __init__(self, feed_content, engine="soup"):
         # super(Podcast, self).__init__()
         self.feed_content = feed_content
-        self.set_soup()
-        self.set_full_soup()
-
-        self.set_extended_elements()
-        self.set_itunes()
-        self.set_optional_elements()
-        self.set_required_elements()
+        self.engine = engine
+        if engine == "expat":
+            try:
+                self.set_stream()
+            except xml.parsers.expat.ExpatError:
+                self.engine = "soup"
+        if self.engine == "soup":
+            self.set_soup()
+            self.set_full_soup()
+
+            self.set_extended_elements()
+            self.set_itunes()
+            self.set_optional_elements()
+            self.set_required_elements()
 
         self.set_validity()
         self.set_time_published()
         self.set_dates_published()
 
+    @classmethod
+    def from_stream(cls, parser, items):
+        """Builds a Podcast from a FeedParser that was fed the whole feed
+
+        Used when the feed was streamed instead of read, so feed_content
+        is None and only the given item fields end up in items.
+        """
+        podcast = cls.__new__(cls)
+        podcast.feed_content = None
+        podcast.engine = "stream"
+        podcast.soup = None
+        podcast.full_soup = None
+        podcast.encoding = parser.encoding
+        podcast.enclosure_types = parser.enclosure_types
+        podcast.set_stream_elements(parser)
+        podcast.items = ItemList(items, lambda fields: Item(fields=fields))
+
+        podcast.set_validity()
+        podcast.set_time_published()
+        podcast.set_dates_published()
+        return podcast
+
     def set_time_published(self):
         if self.published_date is None:
             self.time_published = None
@@ -376,12 +501,12 @@ class Podcast:
             self.is_valid_rss = False
 
     def set_is_valid_podcast(self):
-        for item in self.items:
-            if item.enclosure_type:
-                if item.enclosure_type.lower() == "audio/mpeg":
-                    self.is_valid_podcast = True
-                    return
-        self.is_valid_podcast = False
+        if self.engine == "soup":
+            enclosures = self.full_soup.findAll("enclosure")
+            types = [(enclosure.get("type") or "").lower() for enclosure in enclosures]
+        else:
+            types = self.enclosure_types
+        self.is_valid_podcast = "audio/mpeg" in types
 
     def to_dict(self):
         podcast_dict = {}
@@ -462,9 +587,80 @@ class Podcast:
         self.set_link()
         self.set_description()
 
+    def set_stream(self):
+        """Parses the feed in one pass, sets every element and locates items"""
+        if isinstance(self.feed_content, str):
+            self.feed_content = self.feed_content.encode("utf-8")
+            parser = FeedParser(encoding="utf-8", bounds=True)
+        else:
+            parser = FeedParser(bounds=True)
+        parser.feed(self.feed_content, final=True)
+        self.soup = None
+        self.full_soup = None
+        self.encoding = parser.encoding
+        self.enclosure_types = parser.enclosure_types
+        self.set_stream_elements(parser)
+        self.items = ItemList(parser.items, self.build_stream_item)
+
+    def build_stream_item(self, bounds):
+        """Parses the item located at bounds in feed_content"""
+        data = item_slice(self.feed_content, bounds)
+        return Item(fields=parse_item(data, self.encoding))
+
+    def set_stream_elements(self, parser):
+        """Sets the channel elements collected by FeedParser"""
+        channel = parser.channel
+        image = parser.image
+
+        self.creative_commons = channel.get("creativecommons:license")
+        self.owner_name = channel.get("itunes:owner>itunes:name")
+        self.owner_email = channel.get("itunes:owner>itunes:email")
+        self.subtitle = channel.get("itunes:subtitle")
+        self.summary = channel.get("itunes:summary")
+
+        self.itunes_author_name = channel.get("itunes:author")
+        self.itunes_block = (channel.get("itunes:block") or "").lower() == "yes"
+        self.itunes_complete = lower(channel.get("itunes:complete"))
+        self.itunes_explicit = lower(channel.get("itunes:explicit"))
+        self.itune_image = channel.get("@itunes:image", {}).get("href")
+        keywords = channel.get("itunes:keywords")
+        if keywords is None:
+            self.itunes_keywords = []
+        else:
+            self.itunes_keywords = list(
+                set(keyword.strip() for keyword in keywords.split(","))
+            )
+        self.itunes_new_feed_url = channel.get("itunes:new-feed-url")
+        self.itunes_categories = [
+            category.get("text") for category in channel.get("*itunes:category", [])
+        ]
+
+        self.categories = channel.get("*category", [])
+        self.copyright = channel.get("copyright")
+        self.generator = channel.get("generator")
+        self.image_title = image.get("title")
+        self.image_url = image.get("url")
+        self.image_link = image.get("link")
+        self.image_width = image.get("width")
+        self.image_height = image.get("height")
+        self.language = channel.get("language")
+        self.last_build_date = channel.get("lastbuilddate")
+        self.managing_editor = channel.get("managingeditor")
+        self.published_date = channel.get("pubdate")
+        self.pubsubhubbub = None
+        for atom_link in channel.get("*atom:link", []):
+            if atom_link.get("rel") == "hub":
+                self.pubsubhubbub = atom_link.get("href")
+        self.ttl = channel.get("ttl")
+        self.web_master = channel.get("webmaster")
+
+        self.title = channel.get("title")
+        self.link = channel.get("link")
+        self.description = channel.get("description")
+
     def set_soup(self):
         """Sets soup and strips items"""
-        self.soup = BeautifulSoup(self.feed_content, 'html.parser')
+        self.soup = feed_soup(self.feed_content)
         for item in self.soup.findAll("item"):
             item.decompose()
         for image in self.soup.findAll("image"):
@@ -472,15 +668,11 @@ class Podcast:
 
     def set_full_soup(self):
         """Sets soup and keeps items"""
-        self.full_soup = BeautifulSoup(self.feed_content, 'html.parser')
+        self.full_soup = feed_soup(self.feed_content)
 
     def set_items(self):
-        self.items = []
-        full_soup_items = self.full_soup.findAll("item")
-        for full_soup_item in full_soup_items:
-            item = Item(full_soup_item)
-            if item:
-                self.items.append(item)
+        """Locates items, they are parsed when accessed"""
+        self.items = ItemList(self.full_soup.findAll("item"), Item)
 
     def set_categories(self):
         """Parses and set feed categories"""
@@ -492,6 +684,8 @@ class Podcast:
 
     def count_items(self):
         """Counts Items in full_soup and soup. For debugging"""
+        if self.engine != "soup":
+            return 0, len(self.items)
         soup_items = self.soup.findAll("item")
         full_soup_items = self.full_soup.findAll("item")
         return len(soup_items), len(full_soup_items)
@@ -526,10 +720,12 @@ class Podcast:
 
     def set_image(self):
         """Parses image element and set values"""
-        temp_soup = self.full_soup
-        for item in temp_soup.findAll("item"):
-            item.decompose()
-        image = temp_soup.find("image")
+        # items stay in full_soup as ItemList builds them from there
+        image = None
+        for temp_image in self.full_soup.findAll("image"):
+            if temp_image.find_parent("item") is None:
+                image = temp_image
+                break
         try:
             self.image_title = image.find("title").string
         except AttributeError:
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Podcast file index."""
+import configparser
+import os
+import random
+import threading
+
+from Sampler import AliasTable
+
+
+def is_true(value):
+    return str(value or "").upper() == "TRUE"
+
+
+class Podfile(object):
+    """The sections of a podcast file, compiled once.
+
+    The file is only parsed again when its mtime or size changes, and the
+    sections every mode chooses from are listed while compiling, so
+    choosing a section is one stat and one draw. Sections are drawn in
+    proportion to their weight key, 1 by default.
+
+    Args:
+        path (str): The podcast file
+
+    Attributes:
+        sections (list): Every section as a dict, defaults included
+        candidates (dict): Sections to choose from by mode: "all",
+            "songs" for --songs, and "feeds" for the http feeds --refresh
+            fetches
+        tables (dict): AliasTable of the weights of the candidates by mode
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.stamp = None
+        self.sections = None
+        self.candidates = None
+        self.tables = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Compile the file again if it changed since it was compiled."""
+        try:
+            stat = os.stat(self.path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamp = None
+        with self.lock:
+            if self.sections is None or stamp != self.stamp:
+                self.compile()
+                self.stamp = stamp
+        return self
+
+    def compile(self):
+        podlist = configparser.ConfigParser()
+        podlist.read(self.path)
+        sections = [dict(podlist[name]) for name in podlist.sections()]
+        self.sections = sections
+        self.candidates = {
+            "all": sections,
+            "songs": [
+                section for section in sections if is_true(section.get("songs"))
+            ],
+            "feeds": [
+                section
+                for section in sections
+                if section.get("url", "")[:4] == "http"
+                and not is_true(section.get("youtubelink"))
+            ],
+        }
+        self.tables = {}
+        for mode, candidates in self.candidates.items():
+            weights = [float(section.get("weight", 1)) for section in candidates]
+            # a weight of 0 keeps a section out of the draw
+            if sum(weights) > 0:
+                self.tables[mode] = AliasTable(weights)
+
+    def choices(self, mode="all"):
+        """The sections mode chooses from, up to date with the file."""
+        return self.load().candidates[mode]
+
+    def draw(self, mode="all", rng=random):
+        """A section of mode drawn by weight, None if there is none."""
+        self.load()
+        with self.lock:
+            sections, table = self.candidates[mode], self.tables.get(mode)
+        if table is None:
+            return None
+        return sections[table.draw(rng)]
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""Timing of the phases of a pick."""
+import contextlib
+import io
+import json
+import os
+import threading
+import time
+
+
+class Span(object):
+    """Time a block and add it to a Record as it ends."""
+
+    __slots__ = ("record", "name", "depth", "start")
+
+    def __init__(self, record, name):
+        self.record = record
+        self.name = name
+
+    def __enter__(self):
+        self.depth = self.record.depth
+        self.record.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        self.record.depth -= 1
+        self.record.add(self.name, self.start, end, self.depth)
+        return False
+
+
+class NullSpan(object):
+    """What span() returns when nothing is timed."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+def ignore():
+    pass
+
+
+class Record(object):
+    """The spans of one pick, from choosing the episode to playing it.
+
+    Attributes:
+        began (float): perf_counter when the pick began
+        spans (list): (name, depth, start, seconds) of every span, start
+            relative to began, in the order they ended
+    """
+
+    def __init__(self):
+        self.began = time.perf_counter()
+        self.time = time.time()
+        self.spans = []
+        self.depth = 0
+        self.lock = threading.Lock()
+
+    def add(self, name, start, end, depth=None):
+        """Add a span from start to end, perf_counter values."""
+        with self.lock:
+            depth = self.depth if depth is None else depth
+            self.spans.append((name, depth, start - self.began, end - start))
+
+    def ordered(self):
+        return sorted(self.spans, key=lambda span: (span[2], span[1]))
+
+
+class Profiler(object):
+    """Named spans around the phases of every pick.
+
+    While disabled span() returns one shared no-op context manager, so the
+    phases cost a method call each. Enabled, the spans of a pick gather in
+    a Record, first on the thread that chooses the episode, then on the
+    one that plays it, and are printed and appended to a jsonl log once it
+    has been played.
+
+    Attributes:
+        enabled (bool): Whether spans are recorded
+        log_path (str): The jsonl log, None for none
+        cprofile_path (str): Where cProfile stats of the first selection
+            are dumped, None for no cProfile
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.log_path = None
+        self.cprofile_path = None
+        self.cprofile_report = None
+        self.cprofiled = False
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def enable(self, log_path=None, cprofile_path=None):
+        self.enabled = True
+        self.log_path = log_path
+        self.cprofile_path = cprofile_path
+
+    def current(self):
+        """The Record of this thread, or None."""
+        return getattr(self.local, "record", None)
+
+    def span(self, name):
+        """Context manager timing a phase of the current pick."""
+        if not self.enabled:
+            return NULL_SPAN
+        record = getattr(self.local, "record", None)
+        if record is None:
+            return NULL_SPAN
+        return Span(record, name)
+
+    def start(self, name):
+        """Start a span, return the function ending it.
+
+        For phases that end on another thread, like mpv loading a file.
+        Calls after the first are ignored.
+        """
+        record = self.current() if self.enabled else None
+        if record is None:
+            return ignore
+        start = time.perf_counter()
+        depth = record.depth
+        ended = []
+
+        def stop():
+            if not ended:
+                ended.append(True)
+                record.add(name, start, time.perf_counter(), depth)
+
+        return stop
+
+    @contextlib.contextmanager
+    def record(self, record=None):
+        """Gather the spans of this thread in record, a new one by default."""
+        if not self.enabled:
+            yield None
+            return
+        previous = self.current()
+        self.local.record = record if record is not None else Record()
+        try:
+            yield self.local.record
+        finally:
+            self.local.record = previous
+
+    @contextlib.contextmanager
+    def cprofile(self):
+        """Run the block under cProfile, the first time only."""
+        with self.lock:
+            run = self.enabled and self.cprofile_path and not self.cprofiled
+            self.cprofiled = self.cprofiled or bool(run)
+        if not run:
+            yield
+            return
+        import cProfile
+        import pstats
+
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(self.cprofile_path)
+            text = io.StringIO()
+            stats = pstats.Stats(profile, stream=text)
+            stats.sort_stats("cumulative").print_stats(15)
+            self.cprofile_report = text.getvalue()
+
+    def report(self, record, **fields):
+        """Print the spans of a pick and append them to the log."""
+        if record is None:
+            return
+        spans = record.ordered()
+        print(f"Profile: {fields.get('podcast')} : {fields.get('title')}")
+        for name, depth, start, seconds in spans:
+            indent = "  " * depth
+            print(f"{start * 1000:>9.1f} ms {seconds * 1000:>9.1f} ms  {indent}{name}")
+        if self.cprofile_report is not None:
+            print(f"cProfile of the first selection, saved to {self.cprofile_path}:")
+            print(self.cprofile_report)
+            self.cprofile_report = None
+        if not self.log_path:
+            return
+        entry = dict(fields, time=record.time)
+        entry["spans"] = [
+            {"name": name, "depth": depth, "start": start, "seconds": seconds}
+            for name, depth, start, seconds in spans
+        ]
+        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+        with open(self.log_path, "a", encoding="utf-8") as log_file:
+            log_file.write(json.dumps(entry) + "\n")
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""Weighted random draws."""
+import random
+
+DAY = 24 * 3600
+MIN_WEIGHT = 1e-6
+MAX_REJECTS = 8
+WEIGHTINGS = ("uniform", "recent")
+
+
+class AliasTable(object):
+    """Draw index i with probability weights[i] / sum(weights).
+
+    Vose's alias method: building the table is O(n), every draw after
+    that is O(1), one random index and one biased coin.
+
+    Args:
+        weights (list): Non negative weights, not all 0
+    """
+
+    def __init__(self, weights):
+        count = len(weights)
+        total = float(sum(weights))
+        if not count or total <= 0:
+            raise ValueError("no weight to draw from")
+        scaled = [weight * count / total for weight in weights]
+        self.probability = [1.0] * count
+        self.alias = list(range(count))
+        small = [index for index, weight in enumerate(scaled) if weight < 1]
+        large = [index for index, weight in enumerate(scaled) if weight >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+        # what is left is 1 up to rounding and keeps probability 1
+
+    def __len__(self):
+        return len(self.alias)
+
+    def draw(self, rng=random):
+        index = int(rng.random() * len(self.alias))
+        if rng.random() < self.probability[index]:
+            return index
+        return self.alias[index]
+
+
+def episode_weights(published, weighting="uniform", half_life=90):
+    """Weight of every episode from the time it was published.
+
+    "uniform" weighs every episode the same and returns None. "recent"
+    halves the weight with every half_life days an episode is older than
+    the newest one, down to MIN_WEIGHT so the oldest episodes can still be
+    drawn. Undated episodes count as the oldest.
+    """
+    if weighting not in WEIGHTINGS:
+        raise ValueError(f"Unknown weighting {weighting!r}, not in {WEIGHTINGS}")
+    if weighting == "uniform":
+        return None
+    published = list(published)
+    dated = [when for when in published if when]
+    if not dated:
+        return None
+    newest = max(dated)
+    half_life = float(half_life) * DAY
+    return [
+        max(0.5 ** ((newest - when) / half_life), MIN_WEIGHT) if when else MIN_WEIGHT
+        for when in published
+    ]
+
+
+class EpisodeSampler(object):
+    """Weighted draws of episodes that never return an excluded one.
+
+    Draws come from one alias table over every episode, and an episode
+    whose key is excluded, like a recently played title, is drawn again.
+    Once draws keep meeting excluded episodes a table without them is
+    built for that exclude set, so a draw stays O(1) however much of a
+    show was played. It is only used while exclude stays the same, the
+    table over every episode is kept, so an episode that leaves exclude
+    can be drawn again. Until then keys are only asked for the episodes
+    drawn.
+
+    Args:
+        count (int): Number of episodes
+        key (callable): Key of the episode at an index, what exclude holds
+        weights (list): Weight of every episode, None for the same weight
+    """
+
+    def __init__(self, count, key, weights=None):
+        self.count = count
+        self.key = key
+        self.weights = weights
+        self.table = None
+        if weights is not None and count:
+            self.table = AliasTable(weights)
+        # (exclude, indices, table) of the episodes left by the last exclude
+        # set that needed them
+        self.filtered = None
+
+    def build(self, exclude):
+        exclude = frozenset(exclude)
+        indices = [
+            index for index in range(self.count) if self.key(index) not in exclude
+        ]
+        table = None
+        if self.weights is not None and indices:
+            table = AliasTable([self.weights[index] for index in indices])
+        self.filtered = (exclude, indices, table)
+        return indices, table
+
+    def pick(self, indices, table, rng):
+        if table is not None:
+            return indices[table.draw(rng)]
+        return indices[int(rng.random() * len(indices))]
+
+    def draw(self, exclude=(), rng=random):
+        """Index of a drawn episode, or None if every one is excluded."""
+        filtered = self.filtered
+        if filtered is not None and filtered[0] == exclude:
+            indices, table = filtered[1:]
+        else:
+            indices, table = range(self.count), self.table
+            if indices:
+                for _ in range(MAX_REJECTS):
+                    index = self.pick(indices, table, rng)
+                    if self.key(index) not in exclude:
+                        return index
+            indices, table = self.build(exclude)
+        if not indices:
+            return None
+        return self.pick(indices, table, rng)
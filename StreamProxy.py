@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""Caching stream proxy."""
+import hashlib
+import http.server
+import os
+import re
+import threading
+
+from Download import BLOCK_SIZE, DownloadError, Journal, content_range, probe
+
+
+class Tee(object):
+    """An enclosure cached into its .part file while it is streamed.
+
+    Byte ranges already in the .part file, as its Journal records, are
+    read from disk. The others are fetched upstream with If-Range and
+    written to the .part file on their way to the player. Once every byte
+    is there the .part file is renamed to newfilename, like a finished
+    download.
+
+    Args:
+        session: Makes the upstream requests, like HttpClient
+        url (str): The enclosure
+        newfilename (str): Where the enclosure is downloaded to
+        content_type (str): Type of the enclosure
+        headers (dict): Headers of upstream requests
+        timeout (float): Timeout of upstream requests
+    """
+
+    def __init__(self, session, url, newfilename, content_type, headers, timeout):
+        self.session = session
+        self.url = url
+        self.newfilename = newfilename
+        self.partname = newfilename + ".part"
+        self.content_type = content_type or "application/octet-stream"
+        self.headers = headers
+        self.timeout = timeout
+        self.journal = None
+        self.fd = None
+        self.finished = False
+        self.lock = threading.Lock()
+
+    def open(self):
+        """Open the .part file and return the length of the enclosure.
+
+        Returns:
+            None when upstream does not serve byte ranges.
+        """
+        with self.lock:
+            if self.journal is not None:
+                return self.journal.length
+            journal = None
+            if os.path.isfile(self.partname):
+                journal = Journal.load(self.partname + ".json", self.url)
+            if journal is None or not (journal.length and journal.ranges_ok):
+                response, total = probe(
+                    self.session, self.url, self.headers, self.timeout
+                )
+                if not total:
+                    return None
+                fresh = Journal(self.partname + ".json", self.url)
+                fresh.learn(response, total)
+                if journal is not None and journal.validator() != fresh.validator():
+                    journal = None
+                if journal is None:
+                    journal = Journal(self.partname + ".json", self.url)
+                    open(self.partname, "wb").close()
+                journal.learn(response, total)
+                journal.ranges_ok = True
+            if self.fd is None:
+                self.fd = os.open(self.partname, os.O_RDWR | os.O_CREAT, 0o644)
+            os.ftruncate(self.fd, journal.length)
+            self.journal = journal
+            return journal.length
+
+    def current(self):
+        """The journal, which is gone once the enclosure changed upstream."""
+        journal = self.journal
+        if journal is None:
+            # the player asks again and open() probes the new enclosure
+            raise DownloadError(f"{self.url} changed while streaming")
+        return journal
+
+    def copy(self, start, end, out):
+        """Write bytes start to end (exclusive) of the enclosure to out."""
+        position = start
+        try:
+            while position < end:
+                with self.lock:
+                    journal = self.current()
+                    written = journal.written_until(position)
+                    following = journal.next_written(position)
+                if written is not None:
+                    stop = min(written, end)
+                    while position < stop:
+                        data = os.pread(
+                            self.fd, min(BLOCK_SIZE, stop - position), position
+                        )
+                        out.write(data)
+                        position += len(data)
+                else:
+                    stop = min(following or end, end)
+                    position = self.fetch(journal, position, stop, out)
+        finally:
+            self.finish()
+
+    def fetch(self, journal, start, stop, out):
+        """Fetch bytes start to stop upstream into the .part file and out."""
+        request_headers = dict(self.headers, Range=f"bytes={start}-{stop - 1}")
+        if journal.validator():
+            request_headers["If-Range"] = journal.validator()
+        with self.session.get(
+            self.url, headers=request_headers, stream=True, timeout=self.timeout
+        ) as response:
+            if response.status_code != 206 or content_range(response)[0] != start:
+                # the enclosure changed, cache it again from the start
+                with self.lock:
+                    if self.journal is journal:
+                        journal.ranges = []
+                        journal.remove()
+                        self.journal = None
+                raise DownloadError(f"{self.url} changed while streaming")
+            position = start
+            for data in response.iter_content(BLOCK_SIZE):
+                data = data[: stop - position]
+                with self.lock:
+                    if self.current() is not journal:
+                        raise DownloadError(f"{self.url} changed while streaming")
+                    os.pwrite(self.fd, data, position)
+                    journal.add(position, position + len(data))
+                position += len(data)
+                out.write(data)
+                if position >= stop:
+                    break
+        if position < stop:
+            raise DownloadError(f"{self.url} ended at byte {position} of {stop}")
+        return position
+
+    def finish(self):
+        """Record progress, rename the .part file once it is complete."""
+        with self.lock:
+            journal = self.journal
+            if journal is None or self.finished:
+                return
+            if not journal.complete():
+                journal.save()
+                return
+            journal.remove()
+            os.replace(self.partname, self.newfilename)
+            self.finished = True
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class ProxyHandler(http.server.BaseHTTPRequestHandler):
+    """Serve the ranges the player asks for through the Tee of the path."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.respond(head=True)
+
+    def do_GET(self):
+        self.respond()
+
+    def respond(self, head=False):
+        tee = self.server.tees.get(os.path.splitext(self.path.strip("/"))[0])
+        if tee is None:
+            self.send_error(404)
+            return
+        try:
+            length = tee.open()
+        except (DownloadError, OSError) as err:
+            self.send_error(502, str(err))
+            return
+        if length is None:
+            # nothing to cache without ranges, let the player go upstream
+            self.send_response(302)
+            self.send_header("Location", tee.url)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end = 0, length
+        match = re.match(r"bytes=(\d*)-(\d*)$", self.headers.get("Range", ""))
+        if match and (match.group(1) or match.group(2)):
+            if not match.group(1):
+                start = max(length - int(match.group(2)), 0)
+            else:
+                start = int(match.group(1))
+                if match.group(2):
+                    end = min(int(match.group(2)) + 1, length)
+            if start >= length:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{length}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{length}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", tee.content_type)
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        if head:
+            return
+        try:
+            tee.copy(start, end, self.wfile)
+        except (DownloadError, OSError):
+            # the player went away or upstream failed, drop the connection
+            self.close_connection = True
+
+
+class StreamProxy(http.server.ThreadingHTTPServer):
+    """Localhost server the player streams enclosures from.
+
+    Every byte fetched for the player is kept in the download directory,
+    so seeking back, playing again or downloading the episode later never
+    fetches it twice, and an episode streamed to its end is downloaded.
+
+    Args:
+        session: Makes the upstream requests, like HttpClient
+        headers (dict): Headers of upstream requests
+        timeout (float): Timeout of upstream requests
+
+    Attributes:
+        tees (dict): Tee of every enclosure by the token of its url
+    """
+
+    daemon_threads = True
+
+    def __init__(self, session, headers, timeout=30):
+        super().__init__(("127.0.0.1", 0), ProxyHandler)
+        self.session = session
+        self.headers = headers
+        self.timeout = timeout
+        self.tees = {}
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def url(self, enclosure_url, newfilename, content_type=None):
+        """Local url streaming enclosure_url and caching it to newfilename."""
+        token = hashlib.sha1(newfilename.encode("utf-8")).hexdigest()[:16]
+        if token not in self.tees:
+            self.tees[token] = Tee(
+                self.session,
+                enclosure_url,
+                newfilename,
+                content_type,
+                self.headers,
+                self.timeout,
+            )
+        extension = os.path.splitext(newfilename)[1]
+        return f"http://127.0.0.1:{self.server_address[1]}/{token}{extension}"
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+        for tee in self.tees.values():
+            tee.close()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Youtube playlists."""
+import hashlib
+import json
+import os
+import subprocess
+import time
+
+YOUTUBE_DL = "youtube-dl"
+
+
+def load_youtube_dl():
+    """Return the youtube_dl module when it is installed, or None."""
+    try:
+        import youtube_dl
+    except ImportError:
+        return None
+    return youtube_dl
+
+
+def video_url(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def list_playlist(url):
+    """Return the ids of every video of a playlist."""
+    youtube_dl = load_youtube_dl()
+    if youtube_dl is None:
+        output = subprocess.check_output(
+            [YOUTUBE_DL, "--get-id", "--flat-playlist", url],
+        )
+        return output.decode().split()
+    options = {"quiet": True, "extract_flat": "in_playlist"}
+    with youtube_dl.YoutubeDL(options) as ydl:
+        info = ydl.extract_info(url, download=False)
+    return [entry["id"] for entry in info.get("entries") or [] if entry]
+
+
+def video_info(video_id):
+    """Return the metadata of a video, title and description included.
+
+    One in-process extraction when youtube_dl can be imported, otherwise
+    one youtube-dl run that dumps everything as json.
+    """
+    youtube_dl = load_youtube_dl()
+    if youtube_dl is None:
+        output = subprocess.check_output(
+            [YOUTUBE_DL, "--dump-json", "--no-playlist", video_url(video_id)],
+        )
+        return json.loads(output)
+    with youtube_dl.YoutubeDL({"quiet": True, "noplaylist": True}) as ydl:
+        return ydl.extract_info(video_url(video_id), download=False)
+
+
+class PlaylistCache(object):
+    """Video ids of youtube playlists kept on disk.
+
+    A playlist is only listed again once its ids are older than max_age,
+    so picking a video usually costs a file read instead of a crawl.
+
+    Args:
+        directory (str): Where the lists are kept, created when needed
+        max_age (float): Seconds before a playlist is listed again
+    """
+
+    def __init__(self, directory, max_age):
+        self.directory = directory
+        self.max_age = max_age
+
+    def path(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key + ".json")
+
+    def video_ids(self, url):
+        """Return the ids of the playlist, listing it if needed."""
+        try:
+            with open(self.path(url)) as list_file:
+                cached = json.load(list_file)
+            if cached["url"] == url and time.time() - cached["listed"] < self.max_age:
+                return cached["ids"]
+        except (OSError, ValueError, KeyError):
+            pass
+        ids = list_playlist(url)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path(url) + ".tmp", "w") as list_file:
+            json.dump({"url": url, "listed": time.time(), "ids": ids}, list_file)
+        os.replace(self.path(url) + ".tmp", self.path(url))
+        return ids
@@ -0,0 +1,56 @@
+#! /usr/bin/env python3
+"""Compare single stream and segmented enclosure downloads.
+
+Enclosures come from a local stand-in server that throttles every
+connection, like a CDN that limits each stream.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Download import download  # noqa: E402
+from http_server import StandInServer  # noqa: E402
+
+
+def single_stream(url, newfilename):
+    """The single connection path of downloadFile."""
+    import requests
+
+    with requests.get(url, stream=True) as response:
+        with open(newfilename, "wb") as out_file:
+            for data in response.iter_content(1024):
+                out_file.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=float, default=32)
+    parser.add_argument("--rate-mb", type=float, default=4, help="per connection")
+    parser.add_argument("--segments", type=int, nargs="+", default=[2, 4, 8])
+    args = parser.parse_args()
+
+    body = os.urandom(int(args.size_mb * 2 ** 20))
+    files = {"/episode.mp3": body}
+    with StandInServer(files, rate=int(args.rate_mb * 2 ** 20)) as server:
+        url = server.url + "/episode.mp3"
+        with tempfile.TemporaryDirectory() as directory:
+            target = os.path.join(directory, "episode.mp3")
+            start = time.perf_counter()
+            single_stream(url, target)
+            print(f"single stream  {time.perf_counter() - start:>7.2f}s")
+            for segments in args.segments:
+                os.remove(target)
+                start = time.perf_counter()
+                download(url, target, {}, segments, min_size=0)
+                elapsed = time.perf_counter() - start
+                with open(target, "rb") as downloaded:
+                    assert downloaded.read() == body
+                print(f"{segments:>2} segments    {elapsed:>7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
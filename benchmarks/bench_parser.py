@@ -0,0 +1,46 @@
+#! /usr/bin/env python3
+"""Compare the soup and expat engines of Podcast."""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Podcast import Podcast  # noqa: E402
+from synthetic import make_feed  # noqa: E402
+
+
+def measure(feed, engine):
+    """Return seconds and peak bytes needed to parse feed with engine."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    podcast = Podcast(feed, engine=engine)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, podcast
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-n", "--items", type=int, nargs="+", default=[10, 500, 5000],
+    )
+    parser.add_argument("--no-itunes", action="store_true")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    print(f"{'items':>7} {'engine':>6} {'seconds':>9} {'peak MiB':>9}")
+    for count in args.items:
+        feed = make_feed(count, itunes=not args.no_itunes)
+        for engine in ("soup", "expat"):
+            elapsed, peak, podcast = measure(feed, engine)
+            assert len(podcast.items) == count
+            print(f"{count:>7} {engine:>6} {elapsed:>9.3f} {peak / 2**20:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
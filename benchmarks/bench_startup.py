@@ -0,0 +1,67 @@
+#! /usr/bin/env python3
+"""Measure the import time of getpodcast.py with -X importtime.
+
+Exits with status 1 when the import takes longer than the budget or when a
+module that should only load on demand is imported at startup.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only loaded on the code paths that need them.
+DEFERRED = ("pandas", "bs4", "prompt_toolkit", "requests", "tqdm", "sqlite3")
+
+
+def import_times(module):
+    """Return {module: (self us, cumulative us)} of one fresh import."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="getpodcast")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    total_ms = statistics.median(run[args.module][1] for run in runs) / 1000
+    last = runs[-1]
+
+    print(f"Slowest modules importing {args.module}:")
+    slowest = sorted(last.items(), key=lambda entry: entry[1][0], reverse=True)
+    for name, (self_us, cumulative_us) in slowest[: args.top]:
+        print(f"{self_us / 1000:>8.2f} ms self {cumulative_us / 1000:>8.2f} ms  {name}")
+
+    failed = False
+    loaded = [name for name in DEFERRED if name in last]
+    if loaded:
+        print(f"FAIL: imported at startup: {', '.join(loaded)}")
+        failed = True
+    print(f"import {args.module}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if total_ms > args.budget_ms:
+        print("FAIL: over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+#! /usr/bin/env python3
+"""Time the fetch, parse, select and play pipeline on synthetic data.
+
+Feeds of 10 to 50000 items, with and without itunes tags, and dummy
+enclosures are served by a local stand-in server. mpv and youtube-dl are
+replaced by fake_mpv.py and fake_youtube_dl.py, and podcaster runs from a
+throwaway config, so nothing outside a temporary directory is touched.
+
+Results are written to json with the commit they were measured on. Pass
+an earlier file to --compare to see what a change did.
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import getpodcast  # noqa: E402
+import YouTube  # noqa: E402
+from Catalog import Catalog  # noqa: E402
+from FeedCache import FeedCache  # noqa: E402
+from History import History  # noqa: E402
+from Player import Player  # noqa: E402
+from Podcast import Podcast  # noqa: E402
+from http_server import StandInServer  # noqa: E402
+from synthetic import make_feed  # noqa: E402
+
+RC = """[default]
+podfile = {directory}/podcasts.ini
+downloaddir = {directory}/downloads
+cachedir = {directory}/cache
+timeout = 1
+mpv = {mpv}
+player = ipc
+prefetch = FALSE
+feedcache = FALSE
+parser = expat
+
+[betterrandom]
+master = TRUE
+histcount = 100
+file = {directory}/history.csv
+"""
+
+
+@contextlib.contextmanager
+def quiet():
+    """Drop what podcaster prints while it is timed."""
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            with contextlib.redirect_stderr(devnull):
+                yield
+
+
+def timed(function, repeat):
+    """Best and median seconds of repeat calls of function."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with quiet():
+            function()
+        times.append(time.perf_counter() - start)
+    return {"best": min(times), "median": statistics.median(times), "runs": repeat}
+
+
+def result(benchmark, case, timing, **extra):
+    entry = {"benchmark": benchmark, "case": case}
+    entry.update(timing)
+    entry.update(extra)
+    print(f"{benchmark:<9} {case:<36} {entry['best']:>12.6f}s", flush=True)
+    return entry
+
+
+def bench_parse(sizes, soup_max, repeat):
+    """Podcast construction with both engines."""
+    results = []
+    for count in sizes:
+        for itunes in (True, False):
+            feed = make_feed(count, itunes=itunes)
+            for engine in ("soup", "expat"):
+                if engine == "soup" and count > soup_max:
+                    continue
+                timing = timed(lambda: Podcast(feed, engine=engine), repeat)
+                case = f"{engine} {count} items{'' if itunes else ' no itunes'}"
+                results.append(result("parse", case, timing, items=count))
+    return results
+
+
+def bench_select(sizes, server, files, directory, repeat):
+    """Fetching a feed and drawing an episode, with every select mode."""
+    results = []
+    for count in sizes:
+        path = f"/feed{count}.xml"
+        files[path] = make_feed(count, base=server.url, ttl=0)
+        section = {"title": f"Feed {count}", "url": server.url + path}
+        modes = {
+            "full": dict(SELECT="full"),
+            "reservoir": dict(SELECT="reservoir"),
+            "feedcache": dict(
+                SELECT="full",
+                FEEDCACHE=FeedCache(os.path.join(directory, "feeds"), 2 ** 30),
+            ),
+            "catalog": dict(
+                CATALOG=Catalog(
+                    os.path.join(directory, f"catalog{count}.sqlite"),
+                    getpodcast.historyTitle,
+                )
+            ),
+        }
+        for mode, settings in modes.items():
+            saved = {name: getattr(getpodcast, name) for name in settings}
+            for name, value in settings.items():
+                setattr(getpodcast, name, value)
+            try:
+                # the first pick fills caches, only later ones are timed
+                with quiet():
+                    pick = getpodcast.pick_podcast(section)
+                assert pick.kind == "item", pick.message
+                timing = timed(lambda: getpodcast.pick_podcast(section), repeat)
+            finally:
+                for name, value in saved.items():
+                    setattr(getpodcast, name, value)
+            results.append(result("select", f"{mode} {count} items", timing))
+    return results
+
+
+def bench_history(sizes, directory, calls):
+    """Loading the history, then write_history and check_history."""
+    results = []
+    for count in sizes:
+        path = os.path.join(directory, f"history{count}.log")
+        with open(path, "w") as log_file:
+            for n in range(count):
+                entry = {"podcast": f"Pod {n % 50}", "title": f"Title {n}"}
+                log_file.write(json.dumps(dict(entry, played=n)) + "\n")
+        timing = timed(lambda: History(path, count), 3)
+        results.append(result("history", f"load {count}", timing))
+
+        getpodcast.HISTORY = History(path, count)
+        start = time.perf_counter()
+        for n in range(calls):
+            getpodcast.write_history(f"Pod {n % 50}", f"New {n}")
+        per_call = (time.perf_counter() - start) / calls
+        timing = {"best": per_call, "median": per_call, "runs": calls}
+        results.append(result("history", f"write_history {count}", timing))
+
+        start = time.perf_counter()
+        for n in range(calls):
+            getpodcast.check_history(f"Pod {n % 50}", f"Title {n * 7 % count}")
+        per_call = (time.perf_counter() - start) / calls
+        timing = {"best": per_call, "median": per_call, "runs": calls}
+        results.append(result("history", f"check_history {count}", timing))
+    return results
+
+
+def bench_download(server, files, directory, size_mb, segments, repeat):
+    """downloadFile throughput."""
+    results = []
+    size = int(size_mb * 2 ** 20)
+    files["/episode.mp3"] = os.urandom(size)
+    target = os.path.join(directory, "downloads", "bench", "episode.mp3")
+    saved = getpodcast.SEGMENTS
+    for count in segments:
+        getpodcast.SEGMENTS = count
+
+        def download():
+            if os.path.exists(target):
+                os.remove(target)
+            getpodcast.downloadFile(target, server.url + "/episode.mp3")
+
+        try:
+            timing = timed(download, repeat)
+        finally:
+            getpodcast.SEGMENTS = saved
+        mib_per_second = size / 2 ** 20 / timing["best"]
+        case = f"{size_mb:g} MiB, {count} segments"
+        results.append(
+            result("download", case, timing, mib_per_second=mib_per_second)
+        )
+    return results
+
+
+def bench_play(server, directory, episodes):
+    """Starting episodes in fake players, and picking youtube videos."""
+    results = []
+    os.environ["FAKE_MPV_SECONDS"] = "0"
+    target = server.url + "/episode.mp3"
+
+    player = Player(getpodcast.MPV)
+    try:
+        with quiet():
+            player.play(target)
+        timing = timed(lambda: player.play(target), episodes)
+    finally:
+        player.close()
+    results.append(result("play", "ipc player", timing))
+
+    saved = getpodcast.PLAYER
+    getpodcast.PLAYER = None
+    try:
+        timing = timed(lambda: getpodcast.play(target), episodes)
+    finally:
+        getpodcast.PLAYER = saved
+    results.append(result("play", "process per episode", timing))
+
+    YouTube.YOUTUBE_DL = os.path.join(HERE, "fake_youtube_dl.py")
+    YouTube.load_youtube_dl = lambda: None
+    section = {
+        "title": "Videos",
+        "url": "https://www.youtube.com/playlist?list=bench",
+        "youtubelink": "TRUE",
+    }
+
+    def listed_pick():
+        shutil.rmtree(getpodcast.PLAYLISTS.directory, ignore_errors=True)
+        getpodcast.pick_podcast(section)
+
+    timing = timed(listed_pick, 3)
+    results.append(result("play", "youtube pick, playlist listed", timing))
+    timing = timed(lambda: getpodcast.pick_podcast(section), episodes)
+    results.append(result("play", "youtube pick, playlist cached", timing))
+    return results
+
+
+def commit():
+    try:
+        output = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(HERE),
+            stderr=subprocess.DEVNULL,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode().strip()
+
+
+def compare(results, path):
+    """Print how every result changed against an earlier run."""
+    with open(path) as old_file:
+        old = json.load(old_file)
+    before = {
+        (entry["benchmark"], entry["case"]): entry for entry in old["results"]
+    }
+    print(f"\nAgainst {old.get('commit')} of {old.get('date')}:")
+    for entry in results:
+        previous = before.get((entry["benchmark"], entry["case"]))
+        if previous is None:
+            continue
+        ratio = entry["best"] / previous["best"] if previous["best"] else 0.0
+        print(
+            f"{entry['benchmark']:<9} {entry['case']:<36}"
+            f" {previous['best']:>12.6f}s -> {entry['best']:>12.6f}s  x{ratio:.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-n", "--items", type=int, nargs="+", default=[10, 1000, 10000, 50000],
+    )
+    parser.add_argument(
+        "--soup-max", type=int, default=10000, help="largest feed parsed with soup",
+    )
+    parser.add_argument(
+        "--history", type=int, nargs="+", default=[100, 1000, 10000, 100000],
+    )
+    parser.add_argument("--download-mb", type=float, default=32)
+    parser.add_argument("--segments", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=["parse", "select", "history", "download", "play"],
+        default=["parse", "select", "history", "download", "play"],
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="small sizes only, for a first look",
+    )
+    parser.add_argument("-o", "--output", default="benchmark.json")
+    parser.add_argument("--compare", help="json of an earlier run")
+    args = parser.parse_args()
+    if args.quick:
+        args.items = [n for n in args.items if n <= 1000]
+        args.history = [n for n in args.history if n <= 10000]
+        args.download_mb = min(args.download_mb, 8)
+    warnings.simplefilter("ignore")
+
+    results = []
+    files = {}
+    with StandInServer(files) as server, tempfile.TemporaryDirectory() as directory:
+        rcfile = os.path.join(directory, "podcasterrc")
+        with open(rcfile, "w") as rc:
+            mpv = os.path.join(HERE, "fake_mpv.py")
+            rc.write(RC.format(directory=directory, mpv=mpv))
+        getpodcast.configure(rcfile)
+        try:
+            if "parse" in args.only:
+                results += bench_parse(args.items, args.soup_max, args.repeat)
+            if "select" in args.only:
+                results += bench_select(
+                    args.items, server, files, directory, args.repeat
+                )
+            if "history" in args.only:
+                results += bench_history(args.history, directory, 1000)
+            if "download" in args.only:
+                results += bench_download(
+                    server,
+                    files,
+                    directory,
+                    args.download_mb,
+                    args.segments,
+                    args.repeat,
+                )
+            if "play" in args.only:
+                files.setdefault("/episode.mp3", b"\0" * 1024)
+                results += bench_play(server, directory, 10)
+        finally:
+            if getpodcast.PLAYER is not None:
+                getpodcast.PLAYER.close()
+
+    run = {
+        "commit": commit(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w") as output:
+        json.dump(run, output, indent=1)
+    print(f"Wrote {len(results)} results to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#! /usr/bin/env python3
+"""Stand in for mpv that speaks its JSON IPC protocol.
+
+Point the mpv option of ~/.podcasterrc at this script to run podcaster
+without playing anything. Every loaded file "plays" for FAKE_MPV_SECONDS
+(default 0.2) and the files are logged to FAKE_MPV_LOG if it is set.
+"""
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+SECONDS = float(os.environ.get("FAKE_MPV_SECONDS", "0.2"))
+LOG = os.environ.get("FAKE_MPV_LOG")
+
+
+class FakeMpv(object):
+    """Accept IPC clients and pretend to play what they load."""
+
+    def __init__(self, path):
+        self.path = path
+        self.clients = []
+        self.lock = threading.Lock()
+        self.playlist = []
+        self.generation = 0
+        self.entry_id = 0
+        self.playing = False
+        self.running = True
+
+    def send(self, message):
+        data = json.dumps(message).encode() + b"\n"
+        with self.lock:
+            for client in list(self.clients):
+                try:
+                    client.sendall(data)
+                except OSError:
+                    self.clients.remove(client)
+
+    def end_file(self, reason, entry):
+        self.send({"event": "end-file", "reason": reason, "playlist_entry_id": entry})
+
+    def play_next(self, generation):
+        """Play the playlist from its head until it is empty or replaced."""
+        self.playing = True
+        while self.running and generation == self.generation and self.playlist:
+            target = self.playlist.pop(0)
+            self.entry_id += 1
+            entry = self.entry_id
+            if LOG:
+                with open(LOG, "a") as log_file:
+                    log_file.write(target + "\n")
+            self.send({"event": "start-file", "playlist_entry_id": entry})
+            self.send({"event": "file-loaded"})
+            steps = 4
+            for step in range(steps):
+                if generation != self.generation or not self.running:
+                    self.end_file("stop", entry)
+                    return
+                self.send(
+                    {
+                        "event": "property-change",
+                        "id": 1,
+                        "name": "time-pos",
+                        "data": SECONDS * step / steps,
+                    }
+                )
+                time.sleep(SECONDS / steps)
+            self.end_file("eof", entry)
+        if generation == self.generation:
+            self.playing = False
+            self.send({"event": "idle"})
+
+    def handle(self, message):
+        command = message.get("command", [])
+        reply = {"error": "success", "request_id": message.get("request_id", 0)}
+        name = command[0] if command else None
+        if name == "loadfile":
+            mode = command[2] if len(command) > 2 else "replace"
+            if mode == "replace":
+                self.generation += 1
+                self.playlist = [command[1]]
+                threading.Thread(target=self.play_next, args=(self.generation,)).start()
+            else:
+                idle = not self.playing
+                self.playlist.append(command[1])
+                if idle and mode == "append-play":
+                    self.generation += 1
+                    threading.Thread(
+                        target=self.play_next, args=(self.generation,)
+                    ).start()
+        elif name == "quit":
+            self.running = False
+            self.generation += 1
+        elif name not in ("observe_property", "set_property", "get_property"):
+            reply["error"] = "invalid parameter"
+        return reply
+
+    def serve_client(self, client):
+        with client.makefile("rb") as stream:
+            for line in stream:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                reply = self.handle(message)
+                with self.lock:
+                    client.sendall(json.dumps(reply).encode() + b"\n")
+                if not self.running:
+                    os._exit(0)
+
+    def serve(self):
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen()
+        while self.running:
+            client, _ = server.accept()
+            with self.lock:
+                self.clients.append(client)
+            threading.Thread(target=self.serve_client, args=(client,)).start()
+
+
+def main():
+    for arg in sys.argv[1:]:
+        if arg.startswith("--input-ipc-server="):
+            FakeMpv(arg.split("=", 1)[1]).serve()
+            return
+    # played without IPC, like the one process per episode path
+    time.sleep(SECONDS)
+
+
+if __name__ == "__main__":
+    main()
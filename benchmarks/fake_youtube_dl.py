@@ -0,0 +1,39 @@
+#! /usr/bin/env python3
+"""Stand in for youtube-dl that answers without touching the network.
+
+Lists FAKE_YOUTUBE_DL_COUNT (default 200) video ids for any playlist and
+dumps a small json document for any video. Every call is logged to
+FAKE_YOUTUBE_DL_LOG if it is set.
+"""
+import json
+import os
+import sys
+
+COUNT = int(os.environ.get("FAKE_YOUTUBE_DL_COUNT", "200"))
+LOG = os.environ.get("FAKE_YOUTUBE_DL_LOG")
+
+
+def main():
+    args = sys.argv[1:]
+    if LOG:
+        with open(LOG, "a") as log_file:
+            log_file.write(" ".join(args) + "\n")
+    url = args[-1]
+    if "--flat-playlist" in args:
+        for n in range(COUNT):
+            print(f"video{n:07d}")
+    elif "--dump-json" in args:
+        video_id = url.rsplit("=", 1)[-1]
+        info = {
+            "id": video_id,
+            "title": f"Video {video_id}",
+            "description": f"Description of {video_id}",
+            "duration": 600,
+        }
+        print(json.dumps(info))
+    else:
+        sys.exit(f"fake youtube-dl does not know {args}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Local HTTP stand-in for feed and enclosure servers."""
+import email.utils
+import hashlib
+import http.server
+import re
+import threading
+import time
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """Serve the server's files with ranges, If-Range and throttling."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.respond(head=True)
+
+    def do_GET(self):
+        self.respond()
+
+    def respond(self, head=False):
+        self.server.requests += 1
+        path = self.path.split("?")[0]
+        data = self.server.files.get(path)
+        if data is None:
+            self.send_error(404)
+            return
+        etag = '"' + hashlib.md5(data).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        last_modified = email.utils.formatdate(0, usegmt=True)
+        start, end = 0, len(data) - 1
+        match = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+        if self.headers.get("If-Range", etag) not in (etag, last_modified):
+            match = None
+        if match and self.server.ranges and int(match.group(1)) >= len(data):
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(data)}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if match and self.server.ranges:
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(int(match.group(2)), end)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(end + 1 - start))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        if self.server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        if not head:
+            self.send_body(data[start : end + 1])
+
+    def send_body(self, body):
+        """Write body no faster than the per connection rate."""
+        rate = self.server.rate
+        chunk = 64 * 1024 if not rate else max(rate // 20, 1024)
+        began = time.monotonic()
+        for offset in range(0, len(body), chunk):
+            self.wfile.write(body[offset : offset + chunk])
+            if rate:
+                ahead = (offset + chunk) / rate - (time.monotonic() - began)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+
+class StandInServer(http.server.ThreadingHTTPServer):
+    """Serve in memory files on 127.0.0.1 from a background thread.
+
+    Args:
+        files (dict): Body of every path, like {"/feed.xml": b"..."}
+        rate (int): Bytes per second of every connection, 0 for no limit
+        ranges (bool): Whether byte ranges are served
+
+    Attributes:
+        url (str): Base url of the server
+        requests (int): Number of requests served
+    """
+
+    daemon_threads = True
+
+    def __init__(self, files, rate=0, ranges=True):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.files = files
+        self.rate = rate
+        self.ranges = ranges
+        self.requests = 0
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,78 @@
+"""Synthetic RSS feeds for the benchmarks."""
+import email.utils
+
+ITEM = """  <item>
+    <title>Episode {n}: A &amp; B</title>
+    <link>https://example.com/episodes/{n}</link>
+    <description><![CDATA[<p>Show notes for episode {n}.</p>{notes}]]></description>
+    <guid isPermaLink="false">example-{n}</guid>
+    <pubDate>{date}</pubDate>
+    <category>Technology</category>
+    <enclosure url="{base}/episodes/{n}.mp3" length="{length}" type="audio/mpeg"/>
+{itunes}  </item>
+"""
+
+ITEM_ITUNES = """    <itunes:author>Example Author</itunes:author>
+    <itunes:duration>01:02:{sec:02d}</itunes:duration>
+    <itunes:explicit>No</itunes:explicit>
+    <itunes:image href="{base}/episodes/{n}.jpg"/>
+    <itunes:subtitle>Subtitle {n}</itunes:subtitle>
+    <itunes:summary>Summary of episode {n}</itunes:summary>
+"""
+
+CHANNEL = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd"
+     xmlns:atom="http://www.w3.org/2005/Atom">
+<channel>
+  <title>Synthetic Podcast</title>
+  <link>https://example.com/</link>
+  <description>A feed with {count} items</description>
+  <language>en</language>
+  <ttl>{ttl}</ttl>
+  <lastBuildDate>{date}</lastBuildDate>
+  <atom:link rel="hub" href="https://pubsubhubbub.example.com/"/>
+  <image>
+    <title>Synthetic Podcast</title>
+    <url>{base}/cover.jpg</url>
+    <link>https://example.com/</link>
+  </image>
+{itunes}{items}</channel>
+</rss>
+"""
+
+CHANNEL_ITUNES = """  <itunes:author>Example Author</itunes:author>
+  <itunes:owner>
+    <itunes:name>Example Owner</itunes:name>
+    <itunes:email>owner@example.com</itunes:email>
+  </itunes:owner>
+  <itunes:category text="Technology"/>
+  <itunes:keywords>synthetic, benchmark</itunes:keywords>
+"""
+
+
+def make_item(n, itunes=True, base="https://cdn.example.com", notes_size=200):
+    """Return the xml of item number n."""
+    date = email.utils.formatdate(1600000000 - n * 86400, usegmt=True)
+    return ITEM.format(
+        n=n,
+        date=date,
+        base=base,
+        length=1000000 + n,
+        notes="x" * notes_size,
+        itunes=ITEM_ITUNES.format(n=n, base=base, sec=n % 60) if itunes else "",
+    )
+
+
+def make_feed(count, itunes=True, base="https://cdn.example.com", ttl=60, first=0):
+    """Return a feed with count items, newest first, as bytes."""
+    items = "".join(
+        make_item(n, itunes=itunes, base=base) for n in range(first, first + count)
+    )
+    return CHANNEL.format(
+        count=count,
+        ttl=ttl,
+        base=base,
+        date=email.utils.formatdate(1600000000, usegmt=True),
+        itunes=CHANNEL_ITUNES if itunes else "",
+        items=items,
+    ).encode("utf-8")
@@ -2,66 +2,221 @@
 """My Podcaster."""
 import datetime
 import email.utils
-from subprocess import call, check_output
+from subprocess import call
 import mimetypes
 import os
 import re
-import shutil
-import socket
-import urllib.error
-import urllib.request
-import requests
-import tqdm
+import urllib.parse
 import random
 import signal
-from Podcast import Podcast
+import xml.parsers.expat
+from ContentStore import ContentStore
+from DownloadCache import DownloadCache
+from Download import (
+    DownloadError,
+    RateLimit,
+    adopt,
+    download,
+    partial_size,
+    prefetch,
+    remote_headers,
+)
+from FeedCache import FeedCache
+from FeedHealth import FeedHealth
+from FeedParser import read_new_items, sample_feed
+from History import History
+from HttpClient import Body, HttpClient, HttpError
+from Manifest import Manifest
+from Player import MPV_OPTIONS, Player, PlayerError
+from Podcast import Item, Podcast
+from Podfile import Podfile
+from Profiler import Profiler
+from Sampler import EpisodeSampler, episode_weights
+from YouTube import PlaylistCache, video_info, video_url
 import configparser
-from prompt_toolkit import print_formatted_text, HTML
-import bs4
-import pandas
+import functools
+import json
+import sys
+import threading
+import time
+import collections
+
+# pandas, bs4, prompt_toolkit, requests and tqdm are imported where they are
+# used so that starting up and fetching the first feed stays fast.
 
 random.seed(os.urandom(128))
 
-mimetypes.init()
 headers = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; WOW64; Trident/7.0) like Gecko",
 }
 
-podconfig = configparser.ConfigParser()
-podconfig.read(os.path.abspath(os.path.expanduser("~/.podcasterrc")))
-PODFILE = podconfig["default"]["podfile"]
-BETTERRANDOM = str(podconfig["betterrandom"]["master"]).upper()
-BETTERRANDOM_HISTCOUNT = int(podconfig["betterrandom"]["histcount"])
-BETTERRANDOM_HIST = os.path.abspath(
-    os.path.expanduser(podconfig["betterrandom"]["file"]),
-)
-TIMEOUT = int(podconfig["default"]["timeout"])
-DOWNLOADDIR = os.path.abspath(os.path.expanduser(podconfig["default"]["downloaddir"]))
+# Set from ~/.podcasterrc by configure()
+PODFILE = None
+BETTERRANDOM = None
+BETTERRANDOM_HISTCOUNT = None
+BETTERRANDOM_HIST = None
+BETTERRANDOM_LOG = None
+HISTORY = None
+TIMEOUT = None
+DOWNLOADDIR = None
+PARSER = "soup"
+SELECT = "full"
+WEIGHTING = "uniform"
+HALF_LIFE = 90.0
+CACHEDIR = None
+FEEDCACHE = None
+CATALOG = None
+PLAYLISTS = None
+MPV = "mpv"
+PLAYER = None
+PREFETCH = True
+PREFETCH_BYTES = 0
+SEGMENTS = 1
+MANIFEST = None
+DOWNLOADS = None
+STORE = None
+STREAM_CACHE = True
+PROXY = None
+RATE_LIMIT = None
+HEALTH = None
+PODFILES = {}
+HTTP = HttpClient(headers)
+PROFILER = Profiler()
+
+
+def configure(rcfile: str = "~/.podcasterrc") -> None:
+    """Read the config file and open history and caches."""
+    global PODFILE, BETTERRANDOM, BETTERRANDOM_HISTCOUNT, BETTERRANDOM_HIST
+    global BETTERRANDOM_LOG, HISTORY, TIMEOUT, DOWNLOADDIR, PARSER, SELECT
+    global CACHEDIR, FEEDCACHE, CATALOG, PLAYLISTS, MPV, PLAYER
+    global PREFETCH, PREFETCH_BYTES, SEGMENTS, MANIFEST, HTTP, DOWNLOADS, STORE
+    global STREAM_CACHE, WEIGHTING, HALF_LIFE, RATE_LIMIT, HEALTH
+
+    mimetypes.init()
+    podconfig = configparser.ConfigParser()
+    podconfig.read(os.path.abspath(os.path.expanduser(rcfile)))
+    PODFILE = podconfig["default"]["podfile"]
+    BETTERRANDOM = str(podconfig["betterrandom"]["master"]).upper()
+    BETTERRANDOM_HISTCOUNT = int(podconfig["betterrandom"]["histcount"])
+    BETTERRANDOM_HIST = os.path.abspath(
+        os.path.expanduser(podconfig["betterrandom"]["file"]),
+    )
+    BETTERRANDOM_LOG = os.path.abspath(
+        os.path.expanduser(
+            podconfig["betterrandom"].get(
+                "log", os.path.splitext(BETTERRANDOM_HIST)[0] + ".log",
+            ),
+        ),
+    )
+    HISTORY = History(BETTERRANDOM_LOG, BETTERRANDOM_HISTCOUNT)
+    HISTORY.migrate_csv(BETTERRANDOM_HIST)
+    TIMEOUT = int(podconfig["default"]["timeout"])
+    DOWNLOADDIR = os.path.abspath(
+        os.path.expanduser(podconfig["default"]["downloaddir"]),
+    )
+    PARSER = podconfig["default"].get("parser", "soup")
+    SELECT = podconfig["default"].get("select", "full")
+    WEIGHTING = podconfig["default"].get("weighting", "uniform")
+    HALF_LIFE = float(podconfig["default"].get("half_life", "90"))
+    CACHEDIR = os.path.abspath(
+        os.path.expanduser(podconfig["default"].get("cachedir", "~/.podcaster")),
+    )
+    FEEDCACHE = None
+    if podconfig["default"].get("feedcache", "TRUE").upper() == "TRUE":
+        FEEDCACHE = FeedCache(
+            os.path.join(CACHEDIR, "feeds"),
+            int(podconfig["default"].get("feedcache_size", "256")) * 1024 * 1024,
+        )
+    PLAYLISTS = PlaylistCache(
+        os.path.join(CACHEDIR, "youtube"),
+        float(podconfig["default"].get("youtube_refresh", "24")) * 3600,
+    )
+    MPV = podconfig["default"].get("mpv", "mpv")
+    PLAYER = None
+    if podconfig["default"].get("player", "call") == "ipc":
+        PLAYER = Player(MPV)
+    PREFETCH = podconfig["default"].get("prefetch", "TRUE").upper() == "TRUE"
+    PREFETCH_BYTES = int(float(podconfig["default"].get("prefetch_mb", "0")) * 2 ** 20)
+    SEGMENTS = int(podconfig["default"].get("segments", "1"))
+    max_rate = float(podconfig["default"].get("max_rate_mb", "0")) * 2 ** 20
+    RATE_LIMIT = RateLimit(max_rate) if max_rate else None
+    STREAM_CACHE = podconfig["default"].get("stream_cache", "TRUE").upper() == "TRUE"
+    MANIFEST = Manifest(os.path.join(CACHEDIR, "manifest.json"))
+    DOWNLOADS = DownloadCache(
+        DOWNLOADDIR,
+        os.path.join(CACHEDIR, "downloads.json"),
+        int(podconfig["default"].get("downloads_size", "0")) * 1024 * 1024,
+        HISTORY,
+    )
+    STORE = None
+    if podconfig["default"].get("dedup", "TRUE").upper() == "TRUE":
+        STORE = ContentStore(
+            os.path.join(DOWNLOADDIR, ".store"), os.path.join(CACHEDIR, "store.json")
+        )
+    HEALTH = FeedHealth(
+        os.path.join(CACHEDIR, "health.json"),
+        float(podconfig["default"].get("feed_backoff", "60")),
+        float(podconfig["default"].get("feed_backoff_max", "21600")),
+        float(podconfig["default"].get("feed_negative_ttl", "1800")),
+        int(podconfig["default"].get("host_failures", "3")),
+    )
+    HTTP = HttpClient(
+        headers,
+        float(podconfig["default"].get("http_timeout", "30")),
+        max(int(podconfig["default"].get("http_pool", "8")), SEGMENTS),
+    )
+    CATALOG = None
+    if podconfig["default"].get("catalog", "FALSE").upper() == "TRUE":
+        from Catalog import Catalog
+
+        os.makedirs(CACHEDIR, exist_ok=True)
+        CATALOG = Catalog(os.path.join(CACHEDIR, "catalog.sqlite"), historyTitle)
+
+
+def play(target: str, options: list = ()) -> None:
+    """Play a file or url with mpv."""
+    with PROFILER.span("play"):
+        if PLAYER is not None:
+            started = PROFILER.start("player start")
+
+            def loaded(event):
+                if event.get("event") == "file-loaded":
+                    started()
+
+            PLAYER.on_event.append(loaded)
+            try:
+                PLAYER.play(target)
+                return
+            except PlayerError as err:
+                print(f"Player error: {err}")
+            finally:
+                PLAYER.on_event.remove(loaded)
+        call([MPV] + MPV_OPTIONS + list(options) + [target])
+
+
+def recent_titles(pod):
+    """Titles of pod in recent history."""
+    return HISTORY.titles(pod)
 
 
 def write_history(pod, title):
     """Append history to a file."""
-    try:
-        PLAYED = pandas.read_csv(BETTERRANDOM_HIST, index_col=0)
-    except FileNotFoundError:
-        PLAYED = pandas.DataFrame(columns=["Podcast", "Title"])
-    PLAYED = PLAYED.append({"Podcast": pod, "Title": title}, ignore_index=True)
-    PLAYED.to_csv(BETTERRANDOM_HIST)
+    with PROFILER.span("write history"):
+        played = time.time()
+        HISTORY.append(pod, title, played)
+        DOWNLOADS.played(pod, title, played)
 
 
 def check_history(pod, title):
     """See if Pod was already played from recent history."""
-    try:
-        PLAYED = pandas.read_csv(BETTERRANDOM_HIST, index_col=0)
-    except FileNotFoundError:
-        PLAYED = pandas.DataFrame(columns=["Podcast", "Title"])
-    return any(PLAYED[-BETTERRANDOM_HISTCOUNT:].isin([pod, title]).all(axis="columns"))
+    with PROFILER.span("check history"):
+        return (pod, title) in HISTORY
 
 
-def TimedInput(prompt="", default=None, timeout=TIMEOUT):
+def TimedInput(prompt="", default=None, timeout=None):
     """Input with timeout."""
-    import threading
-    import time
+    if timeout is None:
+        timeout = TIMEOUT
 
     def print_countdown():
         t = threading.current_thread()
@@ -98,129 +253,762 @@ def TimedInput(prompt="", default=None, timeout=TIMEOUT):
     return default
 
 
-def getpodcast(podcastfile: str, songs:bool) -> None:
+def print_cache_stats() -> None:
+    """Print the files and bytes DOWNLOADS holds for every podcast."""
+    stats = DOWNLOADS.stats()
+    print(f"{'files':>6}  {'MiB':>9}  podcast")
+    for pod, (count, size) in sorted(stats["podcasts"].items()):
+        print(f"{count:>6}  {size / 2 ** 20:>9.1f}  {pod}")
+    budget = f"{stats['max_bytes'] / 2 ** 20:.1f} MiB" if stats["max_bytes"] else "none"
+    print(
+        f"{stats['files']} files, {stats['bytes'] / 2 ** 20:.1f} MiB"
+        f" in {DOWNLOADDIR}, budget {budget}"
+    )
+    if stats["oldest_played"]:
+        oldest = datetime.datetime.fromtimestamp(stats["oldest_played"])
+        print(f"Least recently played file was played {oldest:%Y-%m-%d %H:%M}")
+    if STORE:
+        stats = STORE.stats()
+        print(
+            f"Store: {stats['objects']} enclosures, {stats['bytes'] / 2 ** 20:.1f} MiB"
+            f" linked from {stats['links']} files,"
+            f" {stats['saved_downloads']} downloads avoided,"
+            f" {stats['saved_bytes'] / 2 ** 20:.1f} MiB saved"
+        )
+
+
+def getpodcast(podcastfile: str, songs: bool) -> None:
     """Get Podcast."""
     # print list of podcasts
     print(f"Reading from File: {podcastfile}")
+    upcoming = Prefetch(podcastfile, songs) if PREFETCH else None
     get = True
     while get:
-        podlist = configparser.ConfigParser()
-        podlist.read(podcastfile)
-        podchoice = random.choice(list(podlist))
-        if podchoice == "DEFAULT":
-            continue
-        if songs:
-            if ("songs" in podlist[podchoice].keys()) \
-                and (str(podlist[podchoice]['songs']).upper()== 'TRUE'):
-                get = process_podcast(podlist[podchoice])
-            else:
-                continue
-        get = process_podcast(podlist[podchoice])
+        if upcoming:
+            waited = time.perf_counter()
+            pick = upcoming.result()
+            if pick.profile is not None:
+                pick.profile.add("wait for prefetch", waited, time.perf_counter())
+            # choose the next episode while this one plays
+            upcoming = Prefetch(podcastfile, songs, {(pick.pod, pick.title)})
+        else:
+            pick = choose_next(podcastfile, songs)
+        with PROFILER.record(pick.profile):
+            get = play_pick(pick)
+        PROFILER.report(pick.profile, podcast=pick.pod, title=pick.title)
+
+
+def choose_next(podcastfile: str, songs: bool, exclude=(), tries: int = 20):
+    """Choose a section of the podcast file and an episode to play from it.
+
+    Sections whose episode was played recently, or whose feed is failing,
+    are replaced by another draw, up to tries times. When every draw was
+    a failing feed the pick is "stop".
+    """
+    with PROFILER.record() as record, PROFILER.cprofile():
+        index = podfile(podcastfile)
+        mode = "songs" if songs else "all"
+        reached = False
+        for _ in range(tries):
+            with PROFILER.span("draw section"):
+                section = index.draw(mode)
+            if section is None:
+                print(f"No podcasts to choose from in {podcastfile}")
+                exit()
+            with PROFILER.span("pick"):
+                pick = pick_podcast(section, exclude)
+            reached = reached or pick.kind != "down"
+            if pick.kind not in ("skip", "down"):
+                break
+        if not reached:
+            pick.kind = "stop"
+    pick.profile = record
+    return pick
+
+
+def podfile(podcastfile: str) -> Podfile:
+    """The index of a podcast file, kept between picks."""
+    if podcastfile not in PODFILES:
+        PODFILES.setdefault(podcastfile, Podfile(podcastfile))
+    return PODFILES[podcastfile]
+
+
+class Prefetch(threading.Thread):
+    """Choose the next episode on a background thread.
+
+    Fetching and parsing the feed, drawing the episode, checking history
+    and, with prefetch_mb set, downloading the start of the enclosure all
+    happen while the current episode plays.
+    """
+
+    def __init__(self, podcastfile: str, songs: bool, exclude=()):
+        super().__init__(daemon=True)
+        self.args = (podcastfile, songs, exclude)
+        self.pick = None
+        self.error = None
+        self.start()
+
+    def run(self):
+        try:
+            self.pick = choose_next(*self.args)
+        except BaseException as err:
+            self.error = err
+
+    def result(self):
+        """Wait for the pick and return it."""
+        self.join()
+        if self.error is not None:
+            raise self.error
+        return self.pick
+
+
+def refresh_podcasts(podcastfile: str, workers: int, per_host: int) -> None:
+    """Fetch every feed of the podcast file into FEEDCACHE concurrently."""
+    if not (FEEDCACHE or CATALOG):
+        print("Feed cache is disabled, nothing to refresh")
+        return
+    sections = podfile(podcastfile).choices("feeds")
+    host_limits = collections.defaultdict(lambda: threading.Semaphore(per_host))
+    host_lock = threading.Lock()
+
+    def refresh(section):
+        title = section["title"]
+        host = urllib.parse.urlsplit(section["url"]).netloc
+        with host_lock:
+            limit = host_limits[host]
+        with limit:
+            start = time.perf_counter()
+            if HEALTH.blocked(section["url"]):
+                return 0.0, "backing off", 0
+            try:
+                if CATALOG:
+                    status = update_catalog(title, section["url"])
+                    count = CATALOG.count(title)
+                else:
+                    status, podcast = get_podcast(section["url"])
+                    count = len(podcast.items)
+                HEALTH.success(section["url"])
+            except (HttpError, xml.parsers.expat.ExpatError) as err:
+                feed_failed(section["url"], err)
+                status, count = f"error: {err}", 0
+            except OSError as err:
+                status, count = f"error: {err}", 0
+            except Exception as err:
+                # one feed that does not parse is its row, not the end of it
+                feed_failed(section["url"], err)
+                status, count = f"error: {type(err).__name__}: {err}", 0
+            return time.perf_counter() - start, status, count
+
+    import concurrent.futures
+
+    print(f"Refreshing {len(sections)} feeds with {workers} workers")
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(refresh, sections))
+    print(f"{'seconds':>8}  {'items':>6}  {'status':<14}  podcast")
+    for section, (elapsed, status, count) in zip(sections, results):
+        print(f"{elapsed:>8.2f}  {count:>6}  {status:<14}  {section['title']}")
+    print(f"Refreshed {len(sections)} feeds in {time.perf_counter() - start:.2f}s")
+
+
+def sync_podcasts(
+    podcastfile: str,
+    count: int,
+    order: str,
+    workers: int,
+    jobs: int,
+    summary_path: str = None,
+) -> dict:
+    """Download episodes of every feed of the podcast file without asking.
+
+    Every http feed gives its latest count episodes, or count random ones
+    of its firstcount:lastcount window that were not played recently. A
+    section can change both with its sync and sync_order keys, sync = 0
+    leaves it out. Feeds are fetched by workers threads, then jobs threads
+    download the episodes through downloadFile and validateFile, within
+    RATE_LIMIT together. A feed or an episode failing for any reason is
+    recorded in the summary as an error or as failed, and the rest go on.
+
+    Returns the summary, which is also written as json to summary_path,
+    or to stdout when there is none.
+    """
+    import concurrent.futures
+
+    started = time.time()
+    sections = podfile(podcastfile).choices("feeds")
+    log = functools.partial(print, file=sys.stderr, flush=True)
+
+    def choose(section):
+        # one bad section, like an unknown sync_order or a feed that does not
+        # parse, is an error of that feed and not the end of the sync
+        try:
+            return choose_feed(section)
+        except Exception as err:
+            error = f"error: {type(err).__name__}: {err}"
+            return {"podcast": section.get("title"), "status": error}, []
+
+    def choose_feed(section):
+        n = int(section.get("sync", count))
+        rule = section.get("sync_order", order)
+        if not n:
+            return {"podcast": section["title"], "status": "skipped"}, []
+        blocked = HEALTH.blocked(section["url"])
+        if blocked:
+            feed = {"podcast": section["title"], "status": f"backing off: {blocked}"}
+            return feed, []
+        try:
+            status, podcast = get_podcast(section["url"])
+            HEALTH.success(section["url"])
+        except (HttpError, xml.parsers.expat.ExpatError) as err:
+            feed_failed(section["url"], err)
+            return {"podcast": section["title"], "status": f"error: {err}"}, []
+        except OSError as err:
+            return {"podcast": section["title"], "status": f"error: {err}"}, []
+        except Exception as err:
+            feed_failed(section["url"], err)
+            error = f"error: {type(err).__name__}: {err}"
+            return {"podcast": section["title"], "status": error}, []
+        firstcount, lastcount = section.get("firstcount"), section.get("lastcount")
+        window = slice(
+            None if firstcount is None else int(firstcount),
+            None if lastcount is None else int(lastcount),
+        )
+        items = [item for item in podcast.items[window] if item.enclosure_url]
+        chosen = sync_choice(section, items, n, rule)
+        feed = {"podcast": section["title"], "status": status, "episodes": len(chosen)}
+        return feed, [(section["title"], item) for item in chosen]
+
+    log(f"Choosing episodes of {len(sections)} feeds with {workers} workers")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        chosen = list(pool.map(choose, sections))
+    feeds = [feed for feed, _ in chosen]
+    episodes = [episode for _, picked in chosen for episode in picked]
+
+    log(f"Syncing {len(episodes)} episodes with {jobs} downloads at once")
+    lock = threading.Lock()
+
+    def sync(episode):
+        pod, item = episode
+        try:
+            result = sync_item(pod, item, lock)
+        except Exception as err:
+            result = {
+                "podcast": pod,
+                "title": item.title,
+                "url": item.enclosure_url,
+                "bytes": 0,
+                "status": "failed",
+                "error": f"{type(err).__name__}: {err}",
+            }
+        log(f"{result['status']:<10}  {result['podcast']} : {result['title']}")
+        return result
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+        results = list(pool.map(sync, episodes))
+
+    totals = collections.Counter(result["status"] for result in results)
+    summary = {
+        "started": datetime.datetime.fromtimestamp(started).isoformat(
+            timespec="seconds"
+        ),
+        "seconds": round(time.time() - started, 3),
+        "count": count,
+        "order": order,
+        "max_rate": RATE_LIMIT.rate if RATE_LIMIT else None,
+        "totals": dict(
+            totals,
+            episodes=len(results),
+            bytes=sum(result["bytes"] for result in results),
+            feed_errors=sum(feed["status"].startswith("error") for feed in feeds),
+            feeds_backing_off=sum(
+                feed["status"].startswith("backing off") for feed in feeds
+            ),
+        ),
+        "feeds": feeds,
+        "episodes": results,
+    }
+    if summary_path:
+        with open(summary_path + ".tmp", "w") as summary_file:
+            json.dump(summary, summary_file, indent=1)
+        os.replace(summary_path + ".tmp", summary_path)
+    else:
+        json.dump(summary, sys.stdout, indent=1)
+        print()
+    return summary
+
+
+def sync_choice(section, items: list, count: int, order: str) -> list:
+    """The count items of a feed section that sync downloads."""
+    if order == "latest":
+        # undated items have no time_published and come last
+        return sorted(
+            items,
+            key=lambda item: getattr(item, "time_published", None) or 0,
+            reverse=True,
+        )[:count]
+    if order != "random":
+        raise ValueError(f"Unknown sync order {order!r}, not latest or random")
+    pod = section["title"]
+    played = recent_titles(pod) if BETTERRANDOM == "TRUE" else set()
+    chosen = []
+    for _ in range(min(count, len(items))):
+        item = draw_episode(
+            items,
+            played,
+            section.get("weighting", WEIGHTING),
+            float(section.get("half_life", HALF_LIFE)),
+        )
+        if item is None:
+            break
+        chosen.append(item)
+        played.add(historyTitle(item.title or ""))
+    return chosen
+
+
+def sync_item(pod: str, item, lock) -> dict:
+    """Download and validate one episode for sync, return how it went.
+
+    The status is "present" for a valid file already there, "linked"
+    from STORE, "downloaded", "unvalidated" when the download does not
+    match what the server said, or "failed". lock guards DOWNLOADS and
+    STORE, which are shared by every download.
+    """
+    data, newfilename = episode_filename(pod, item)
+    result = {
+        "podcast": pod,
+        "title": data["title"],
+        "url": item.enclosure_url,
+        "file": newfilename,
+        "bytes": 0,
+    }
+    start = time.perf_counter()
+    keys = store_keys(item)
+    published = getattr(item, "time_published", None)
+    try:
+        if os.path.isfile(newfilename):
+            if validateFile(
+                newfilename,
+                published,
+                item.enclosure_length,
+                item.enclosure_url,
+            ):
+                return dict(result, status="present", seconds=0.0)
+            adopt(newfilename, item.enclosure_url)
+        with lock:
+            linked = bool(STORE) and STORE.link(newfilename, keys)
+        if linked:
+            status = "linked"
+        else:
+            done = partial_size(newfilename)
+            error = try_download_item(newfilename, item, quiet=True)
+            if error:
+                return dict(
+                    result,
+                    status="failed",
+                    error=error,
+                    bytes=partial_size(newfilename) - done,
+                    seconds=round(time.perf_counter() - start, 3),
+                )
+            result["bytes"] = os.path.getsize(newfilename) - done
+            status = "downloaded"
+        with lock:
+            removed = DOWNLOADS.add(newfilename, pod, data["title"])
+            if STORE and removed:
+                STORE.collect()
+        if removed:
+            result["removed"] = removed
+        if validateFile(newfilename, 0, item.enclosure_length, item.enclosure_url):
+            if published:
+                os.utime(newfilename, (published, published))
+            with lock:
+                if STORE:
+                    STORE.ingest(newfilename, keys)
+        else:
+            status = "unvalidated"
+    except (DownloadError, OSError) as err:
+        status, result["error"] = "failed", str(err)
+    return dict(result, status=status, seconds=round(time.perf_counter() - start, 3))
+
+
+class Pick(object):
+    """An episode chosen from a podfile section, ready to be played.
+
+    Attributes:
+        pod (str): Title of the podcast
+        url (str): Url of the section
+        kind (str): "youtube", "file" or "item" to play, "skip" to choose
+            again, "down" to choose again because the feed is failing,
+            "stop" to stop playing or "weird" for an unknown url
+        target (str): What mpv plays for youtube and file picks
+        title (str): The title as it is written to history
+        description (str): Description of a youtube video
+        item (Item): The episode of an item pick
+        message (str): Why the pick is skipped or stopped
+        profile (Record): Spans of the pick when profiling, otherwise None
+    """
+
+    def __init__(self, pod, url, kind, target=None, title=None, **kwargs):
+        self.pod = pod
+        self.url = url
+        self.kind = kind
+        self.target = target
+        self.title = title
+        self.description = kwargs.get("description")
+        self.item = kwargs.get("item")
+        self.message = kwargs.get("message")
+        self.profile = None
 
 
 def process_podcast(podchoice):
     """Process Podcast."""
-    # if --podcast is used we will only process a matching name
+    return play_pick(pick_podcast(podchoice))
+
+
+def pick_podcast(podchoice, exclude=()) -> Pick:
+    """Choose the episode of a section to play, without playing it."""
     pod = podchoice["title"]
     url = podchoice["url"]
     lastcount = None
     firstcount = None
     youtubelink = False
-    print(pod, url)
     if "lastcount" in podchoice.keys():
         lastcount = int(podchoice["lastcount"])
     if "firstcount" in podchoice.keys():
         firstcount = int(podchoice["firstcount"])
     if "youtubelink" in podchoice.keys():
         youtubelink = str(podchoice['youtubelink']).upper()
+    weighting = podchoice.get("weighting", WEIGHTING)
+    half_life = float(podchoice.get("half_life", HALF_LIFE))
 
     if youtubelink == 'TRUE':
-        print("Youtube Playlist: ", pod)
-        ytvideolist = check_output(
-            ["youtube-dl", "--get-id", "--flat-playlist", url],
-        ).split()
+        with PROFILER.span("youtube playlist"):
+            ytvideolist = PLAYLISTS.video_ids(url)
         ytvideo = random.choice(ytvideolist[firstcount:lastcount])
-        title = check_output(
-            [
-                "youtube-dl",
-                "--get-title",
-                f"https://www.youtube.com/watch?v={ytvideo.decode()}",
-            ],
-        )
-        description = check_output(
-            [
-                "youtube-dl",
-                "--get-description",
-                f"https://www.youtube.com/watch?v={ytvideo.decode()}",
-            ],
+        with PROFILER.span("youtube info"):
+            info = video_info(ytvideo)
+        pick = Pick(
+            pod,
+            url,
+            "youtube",
+            target=video_url(ytvideo),
+            title=info.get("title") or ytvideo,
+            description=info.get("description") or "",
         )
-        print("Video Title: ", title.decode())
-        print("Video Description: ", description.decode())
-        if check_history(pod, title.decode()):
-            print("Skipping Because Played Recently")
-            return True
-        call(
-            [
-                "mpv",
-                "--no-video",
-                "--term-osd-bar",
-                "--term-osd-bar-chars=[##-]",
-                "--msg-level=all=error,statusline=status",
-                "--ytdl",
-                f"https://www.youtube.com/watch?v={ytvideo.decode()}",
-            ],
-        )
-        write_history(pod, title.decode())
-
+    elif url[:4] == "file":
+        pick = Pick(pod, url, "file", target=url[6:], title="Local File")
+    elif url[:4] == "http":
+        blocked = HEALTH.blocked(url)
+        if blocked:
+            return Pick(pod, url, "down", message=blocked)
+        played = recent_titles(pod) if BETTERRANDOM == "TRUE" else set()
+        played.update(title for other, title in exclude if other == pod)
+        try:
+            if CATALOG:
+                items = catalog_podcast(
+                    pod, url, firstcount, lastcount, played, weighting, half_life
+                )
+            else:
+                items = fetch_podcast(url, firstcount, lastcount)
+        except HttpError as err:
+            feed_failed(url, err)
+            return Pick(pod, url, "down", message=f"Connection error: {err}")
+        except xml.parsers.expat.ExpatError as err:
+            feed_failed(url, err)
+            return Pick(pod, url, "skip", message=f"Feed is not valid xml: {err}")
+        except Exception as err:
+            # like a pubDate that does not parse, the feed is as good as down
+            feed_failed(url, err)
+            message = f"Feed could not be read: {type(err).__name__}: {err}"
+            return Pick(pod, url, "skip", message=message)
+        HEALTH.success(url)
+
+        if not items:
+            message = f"No episodes of {pod} between {firstcount} and {lastcount}"
+            return Pick(pod, url, "skip", message=message)
+        with PROFILER.span("draw episode"):
+            item = draw_episode(items, played, weighting, half_life)
+        if item is None:
+            message = f"Every episode of {pod} left to draw was played recently"
+            return Pick(pod, url, "skip", message=message)
+        if not item.enclosure_type:
+            message = f"{item.title} : {item.link}\nNot Playing, No links available"
+            return Pick(pod, url, "skip", message=message)
+        pick = Pick(pod, url, "item", title=historyTitle(item.title), item=item)
+    else:
+        return Pick(pod, url, "weird")
+
+    if check_history(pod, pick.title) or (pod, pick.title) in exclude:
+        pick.kind = "skip"
+        pick.message = "Skipping Because Played Recently"
+    elif pick.kind == "item" and PREFETCH_BYTES:
+        with PROFILER.span("prefetch enclosure"):
+            prefetch_enclosure(pod, pick.item)
+    return pick
+
+
+def play_pick(pick: Pick):
+    """Show a pick, ask what to do and play it."""
+    print(pick.pod, pick.url)
+    if pick.kind == "stop":
+        print(f"Podcast: {pick.pod}")
+        print(pick.message)
+        return  # continue
+    if pick.kind in ("skip", "down"):
+        print(pick.message)
         return True
-    if url[:4] == "file":
-        newfilename = url[6:]
-        if check_history(pod, "Local File"):
-            print("Skipping Because Played Recently")
-            return True
+    if pick.kind == "youtube":
+        print("Youtube Playlist: ", pick.pod)
+        print("Video Title: ", pick.title)
+        print("Video Description: ", pick.description)
+        play(pick.target, ["--ytdl"])
+        write_history(pick.pod, pick.title)
+        return True
+    if pick.kind == "file":
         ans = TimedInput(prompt="Play local copy ? (Y/n) Defaulting in:", default="Y")
         if not ans == "n":
-            call(
-                [
-                    "mpv",
-                    "--no-video",
-                    "--term-osd-bar",
-                    "--term-osd-bar-chars=[##-]",
-                    "--msg-level=all=error,statusline=status",
-                    newfilename,
-                ],
-            )
+            play(pick.target)
 
-        write_history(pod, "Local File")
+        write_history(pick.pod, pick.title)
         return True
-
-    if url[:4] == "http":
+    if pick.kind == "item":
         try:
-            request = urllib.request.Request(url, headers=headers)
-            content = urllib.request.urlopen(request)
-            podcast = Podcast(content.read())
-        except (urllib.error.HTTPError, urllib.error.URLError) as err:
-            print(f"Podcast: {pod}")
-            print(f"Connection error: {err}")
-            return  # continue
-
-        while True:
-            item = random.choice(podcast.items[firstcount:lastcount])
-            if not item.enclosure_type:
-                print(item.title, ":", item.link)
-                print("Not Playing, No links available")
-                return True
-            try:
-                finish_playing = process_podcast_item(pod, item)
-                if finish_playing:
-                    return True
-                return False
-            except SkipPodcast:
+            finish_playing = process_podcast_item(pick.pod, pick.item)
+            if finish_playing:
                 return True
-    print("Weird URL in File", url)
+            return False
+        except SkipPodcast:
+            return True
+    print("Weird URL in File", pick.url)
     exit()
 
 
+def episode_filename(pod: str, item) -> tuple:
+    """Return the fields naming the download of item and its path."""
+    data = {
+        "podcast": pod,
+        "date": item.date_time.strftime("%d.%m.%Y"),
+        "title": historyTitle(item.title),  # scrub title
+        "year": str(item.date_time.year),
+        "ext": parseFileExtensionFromUrl(item.enclosure_url)
+        or mimetypes.guess_extension(item.enclosure_type),
+    }
+    newfilename = os.path.join(
+        DOWNLOADDIR, pod, f"{data['title']}_{data['date']}{data['ext']}",
+    )
+    return data, newfilename
+
+
+def prefetch_enclosure(pod: str, item) -> None:
+    """Download the first PREFETCH_BYTES of item to the .part of its path.
+
+    Only done when the server answers with a range, so that choosing to
+    download the episode later resumes from there.
+    """
+    data, newfilename = episode_filename(pod, item)
+    os.makedirs(os.path.dirname(newfilename), exist_ok=True)
+    prefetch(
+        item.enclosure_url, newfilename, headers, PREFETCH_BYTES, HTTP, HTTP.timeout
+    )
+
+
+def fetch_podcast(url: str, firstcount: int, lastcount: int):
+    """Fetch and parse a feed, return the items to pick an episode from."""
+    if SELECT == "reservoir":
+        sampler = stream_sampler(firstcount, lastcount)
+        status, podcast = get_podcast(url, stream=sampler)
+        if status == "streamed":
+            return podcast.items
+    else:
+        status, podcast = get_podcast(url)
+    return podcast.items[firstcount:lastcount]
+
+
+def feed_failed(url: str, err: Exception) -> None:
+    """Count a failed fetch of url in HEALTH."""
+    # a feed that is not valid xml was still answered, with a 200
+    status = err.status if isinstance(err, HttpError) else 200
+    HEALTH.failure(url, err, status)
+
+
+def draw_episode(items, played, weighting: str, half_life: float):
+    """Draw one of items by weight, never one whose title is in played."""
+    sampler = EpisodeSampler(
+        len(items),
+        lambda index: historyTitle(items[index].title or ""),
+        episode_weights(
+            (getattr(item, "time_published", None) for item in items),
+            weighting,
+            half_life,
+        ),
+    )
+    index = sampler.draw(played)
+    return None if index is None else items[index]
+
+
+def catalog_podcast(
+    pod: str,
+    url: str,
+    firstcount: int,
+    lastcount: int,
+    played=(),
+    weighting: str = "uniform",
+    half_life: float = 90,
+):
+    """Draw an episode from CATALOG, updating it when the feed changed."""
+    with PROFILER.span("update catalog"):
+        update_catalog(pod, url)
+    with PROFILER.span("draw from catalog"):
+        row = CATALOG.random_episode(
+            pod, firstcount, lastcount, played, weighting, half_life
+        )
+    if row is None:
+        return []
+    return [CATALOG.item(row)]
+
+
+def update_catalog(pod: str, url: str) -> str:
+    """Bring the episodes of pod in CATALOG up to date with its feed.
+
+    The feed is fetched conditionally and, when it is known to be ordered
+    newest first, only read up to the first episode already in CATALOG.
+    It is read whole and synced again when that cannot be trusted: the
+    first fetch, a changed itunes:new-feed-url, a lastBuildDate going
+    back, or no known episode met.
+
+    Returns how: "fresh" within the feed's ttl, "not modified" after a
+    304, "updated" with the new episodes or "synced" in full.
+    """
+    from Catalog import item_key
+
+    state = CATALOG.feed(pod)
+    if state is not None and state["url"] == url:
+        if time.time() - (state["checked"] or 0) < (state["ttl"] or 0) * 60:
+            return "fresh"
+    else:
+        state = None
+    request_headers = {}
+    if state is not None and state["etag"]:
+        request_headers["If-None-Match"] = state["etag"]
+    if state is not None and state["last_modified"]:
+        request_headers["If-Modified-Since"] = state["last_modified"]
+    guids = CATALOG.guids(pod) if state is not None and state["newest_first"] else ()
+
+    def incremental(channel):
+        return bool(guids) and not feed_restructured(state, channel)
+
+    def known(fields):
+        return item_key(Item(fields=fields)) in guids
+
+    with PROFILER.span("fetch"):
+        response = HTTP.feed(url, request_headers)
+    with response:
+        if response.status_code == 304 and state is not None:
+            CATALOG.set_feed(pod, checked=time.time())
+            return "not modified"
+        with PROFILER.span("read and parse"):
+            parser, items, stopped, count = read_new_items(
+                Body(response), known, incremental
+            )
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+    podcast = Podcast.from_stream(parser, items)
+    if stopped:
+        CATALOG.prepend(pod, podcast.items, count)
+        status = "updated"
+    else:
+        CATALOG.sync(pod, podcast)
+        newest_first = True
+        if len(podcast.items) > 1:
+            first, last = podcast.items[0], podcast.items[-1]
+            # undated items have no time_published
+            newest = getattr(first, "time_published", None) or 0
+            oldest = getattr(last, "time_published", None) or 0
+            newest_first = newest >= oldest
+        CATALOG.set_feed(pod, newest_first=newest_first)
+        status = "synced"
+    try:
+        ttl = int(podcast.ttl or 0)
+    except ValueError:
+        ttl = 0
+    CATALOG.set_feed(
+        pod,
+        url=url,
+        etag=etag,
+        last_modified=last_modified,
+        last_build_date=podcast.last_build_date,
+        new_feed_url=podcast.itunes_new_feed_url,
+        ttl=ttl,
+        checked=time.time(),
+    )
+    return status
+
+
+def feed_restructured(state, channel) -> bool:
+    """Does the channel suggest the feed was rebuilt since state."""
+    if channel.get("itunes:new-feed-url") != state["new_feed_url"]:
+        return True
+    built, last_built = channel.get("lastbuilddate"), state["last_build_date"]
+    if not (built and last_built):
+        return False
+    try:
+        built = email.utils.parsedate_to_datetime(built)
+        last_built = email.utils.parsedate_to_datetime(last_built)
+        return built < last_built
+    except (TypeError, ValueError):
+        return False
+
+
+def stream_sampler(firstcount: int, lastcount: int):
+    """Return a function that picks one item while streaming a response."""
+
+    def sample(content):
+        # pick while streaming, the feed is never held in memory
+        parser, fields = sample_feed(content, firstcount, lastcount)
+        return Podcast.from_stream(parser, [fields] if fields else [])
+
+    return sample
+
+
+def get_podcast(url: str, stream=None):
+    """Get the Podcast of a feed, from FEEDCACHE when it is still valid.
+
+    Returns the Podcast and how it was obtained: "fresh" from the cache
+    within the feed's ttl, "not modified" from the cache after a 304,
+    "fetched" from the network or "streamed" through the stream function,
+    in which case it is not cached.
+    """
+    meta = FEEDCACHE.load(url) if FEEDCACHE else None
+    if meta and FEEDCACHE.is_fresh(meta):
+        with PROFILER.span("load cached feed"):
+            return "fresh", FEEDCACHE.podcast(meta, PARSER)
+
+    request_headers = FEEDCACHE.request_headers(meta) if FEEDCACHE else {}
+    with PROFILER.span("fetch"):
+        response = HTTP.feed(url, request_headers)
+    with response:
+        if response.status_code == 304 and meta:
+            FEEDCACHE.revalidated(meta)
+            with PROFILER.span("load cached feed"):
+                return "not modified", FEEDCACHE.podcast(meta, PARSER)
+        content = Body(response)
+        if stream:
+            with PROFILER.span("read and sample"):
+                return "streamed", stream(content)
+        with PROFILER.span("read"):
+            raw = content.read()
+        with PROFILER.span("parse"):
+            podcast = Podcast(raw, engine=PARSER)
+        if FEEDCACHE:
+            FEEDCACHE.store(
+                url,
+                raw,
+                podcast,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+            )
+    return "fetched", podcast
+
+
 class SkipPodcast(Exception):
     """Skipping if the podcast isn't found."""
 
@@ -230,43 +1018,38 @@ class SkipPodcast(Exception):
 def process_podcast_item(pod: str, item: dict):
     """Process a single item from pod."""
     # skip if date is older then --date-from
-    data = {
-        "podcast": pod,
-        "date": item.date_time.strftime("%d.%m.%Y"),
-        "title": getSafeFilenameFromText(item.title.strip(" .")),  # scrub title
-        "year": str(item.date_time.year),
-        "ext": parseFileExtensionFromUrl(item.enclosure_url)
-        or mimetypes.guess_extension(item.enclosure_type),
-    }
+    data, newfilename = episode_filename(pod, item)
 
     newfilelength = 0
     newfilemtime = item.time_published
-    newfilename = DOWNLOADDIR + f"{pod}/{data['title']}_{data['date']}{data['ext']}"
     print(f"Podcast Series:       {pod}")
     print(f"Episode Title:        {data['title']}")
     print(f"Date:                 {data['date']}")
     if item.description:
-        print("Description:")
-        print_formatted_text(HTML(bs4.BeautifulSoup(item.description, "html.parser")))
+        with PROFILER.span("render description"):
+            import bs4
+            from prompt_toolkit import print_formatted_text, HTML
 
-    ans = TimedInput(prompt="Try Streaming ? (Y/n/[s]kip) Defaulting in:", default="Y")
+            print("Description:")
+            print_formatted_text(
+                HTML(bs4.BeautifulSoup(item.description, "html.parser"))
+            )
+
+    with PROFILER.span("prompt"):
+        ans = TimedInput(
+            prompt="Try Streaming ? (Y/n/[s]kip) Defaulting in:", default="Y"
+        )
     if ans == "s":
         return True
     if not ans == "n":
         if check_history(pod, data["title"]):
             print("Skipping Because Played Recently")
             return True
-        call(
-            [
-                "mpv",
-                "--no-video",
-                "--term-osd-bar",
-                "--term-osd-bar-chars=[##-]",
-                "--msg-level=all=error,statusline=status",
-                item.enclosure_url,
-            ],
-        )
-
+        with PROFILER.span("stream target"):
+            target = stream_target(item, newfilename)
+        play(target)
+        if os.path.isfile(newfilename):
+            keep_download(pod, data["title"], newfilename, item)
         write_history(pod, data["title"])
         return True
     # if file exist we check if filesize match with content length...
@@ -274,33 +1057,49 @@ def process_podcast_item(pod: str, item: dict):
     if os.path.isfile(newfilename):
         newfilelength = os.path.getsize(newfilename)
         try:
-            validateFile(
+            if validateFile(
                 newfilename,
                 item.time_published,
                 item.enclosure_length,
                 item.enclosure_url,
-            )
-        except (urllib.error.HTTPError, urllib.error.URLError):
-            print("Connection when verifying existing file")
-            return  # continue
-        except socket.timeout:
-            print("Connection timeout when downloading file")
+            ):
+                play(newfilename)
+                write_history(pod, data["title"])
+                return True
+        except DownloadError:
+            print("Connection error when verifying existing file")
             return  # continue
+        # left partial by an older version, resume it
+        adopt(newfilename, item.enclosure_url)
 
-    # download or resume podcast. retry if timeout. cancel if error
-    cancel_validate, newfilelength = try_download_item(
-        newfilelength, newfilename, item,
-    )
+    keys = store_keys(item)
+    if STORE and STORE.link(newfilename, keys):
+        print("Linked to the same enclosure downloaded for another episode")
+    else:
+        # download or resume podcast. retry while it progresses. cancel if not
+        with PROFILER.span("download"):
+            cancel_validate = try_download_item(newfilename, item)
 
-    if cancel_validate:
-        return  # continue
+        if cancel_validate:
+            return  # continue
+    removed = DOWNLOADS.add(newfilename, pod, data["title"])
+    for path in removed:
+        print(f"Removed to stay within downloads_size: {path}")
+    if STORE and removed:
+        STORE.collect()
 
     # validate downloaded file
     try:
-        if validateFile(newfilename, 0, item.enclosure_length, item.enclosure_url):
+        with PROFILER.span("validate"):
+            validated = validateFile(
+                newfilename, 0, item.enclosure_length, item.enclosure_url
+            )
+        if validated:
             # set mtime if validated
             os.utime(newfilename, (newfilemtime, newfilemtime))
             print("File validated")
+            if STORE and STORE.ingest(newfilename, keys):
+                print("Same bytes as an earlier download, stored once")
 
         elif newfilelength:
             # did not validate. see if we got same size as last time we
@@ -309,204 +1108,177 @@ def process_podcast_item(pod: str, item: dict):
                 # ok, size is same. maybe data from response and rss is wrong.
                 os.utime(newfilename, (newfilemtime, newfilemtime))
                 print("File is assumed to be ok.")
-    except urllib.error.HTTPError:
+    except DownloadError:
         print("Connection error when verifying download")
         return  # continue
-    except socket.timeout:
-        print("Connection timeout when downloading file")
-        return  # continue
 
-    call(
-        [
-            "mpv",
-            "--no-video",
-            "--term-osd-bar",
-            "--term-osd-bar-chars=[##-]",
-            "--msg-level=all=error,statusline=status",
-            newfilename,
-        ],
-    )
+    play(newfilename)
+    write_history(pod, data["title"])
     return True
 
 
-def try_download_item(newfilelength, newfilename, item):
-    """Try downloading item."""
-    # download or resume podcast. retry if timeout. cancel if error
-    retry_downloading = True
-    while retry_downloading:
-        retry_downloading = False
-        cancel_validate = False
+def stream_target(item, newfilename: str) -> str:
+    """What to stream item from: its download, or the caching proxy."""
+    if os.path.isfile(newfilename):
+        return newfilename
+    if STORE and STORE.link(newfilename, store_keys(item)):
+        return newfilename
+    if not STREAM_CACHE:
+        return item.enclosure_url
+    global PROXY
+    if PROXY is None:
+        from StreamProxy import StreamProxy
+
+        PROXY = StreamProxy(HTTP, headers, HTTP.timeout)
+    os.makedirs(os.path.dirname(newfilename), exist_ok=True)
+    return PROXY.url(item.enclosure_url, newfilename, item.enclosure_type)
+
+
+def keep_download(pod: str, title: str, newfilename: str, item) -> None:
+    """Account for a file the proxy finished caching while it streamed."""
+    removed = DOWNLOADS.add(newfilename, pod, title)
+    for path in removed:
+        print(f"Removed to stay within downloads_size: {path}")
+    if STORE:
+        STORE.ingest(newfilename, store_keys(item))
+        if removed:
+            STORE.collect()
+
+
+def store_keys(item) -> list:
+    """Keys of the enclosure of item in STORE."""
+    keys = [f"url:{item.enclosure_url}"]
+    # short guids like "42" are only unique within one feed
+    if item.guid and len(item.guid) >= 16:
+        keys.append(f"guid:{item.guid}")
+    return keys
+
+
+def try_download_item(newfilename, item, quiet=False):
+    """Try downloading item, return why it was given up, or None."""
+    # download or resume podcast. retry while it progresses. cancel if not
+    done = partial_size(newfilename)
+    while True:
         try:
-            if newfilelength:
-                resumeDownloadFile(newfilename, item.enclosure_url)
-            else:
-                downloadFile(newfilename, item.enclosure_url)
-        except (urllib.error.HTTPError, urllib.error.URLError):
-            print("Connection error when downloading file")
-            cancel_validate = True
-        except socket.timeout:
-            if newfilelength:
-                if os.path.getsize(newfilename) > newfilelength:
-                    print("Connection timeout. File partly resumed. Retrying")
-                    retry_downloading = True
-                    newfilelength = os.path.getsize(newfilename)
-                else:
-                    print("Connection timeout when resuming file")
-                    cancel_validate = True
-            else:
-                if os.path.isfile(newfilename):
-                    newfilelength = os.path.getsize(newfilename)
-                    if newfilelength > 0:
-                        print("Connection timeout. File partly downloaded. Retrying")
-                        retry_downloading = True
-                    else:
-                        print("Connection timeout when downloading file")
-                        cancel_validate = True
-                else:
-                    print("Connection timeout when downloading file")
-                    cancel_validate = True
-
-    return cancel_validate, newfilelength
+            downloadFile(newfilename, item.enclosure_url, quiet)
+            return None
+        except DownloadError as err:
+            if partial_size(newfilename) > done:
+                if not quiet:
+                    print("Connection lost. File partly downloaded. Retrying")
+                done = partial_size(newfilename)
+                continue
+            error = f"Connection error when downloading file: {err}"
+        except OSError as err:
+            error = f"Cannot write file: {err}"
+        if not quiet:
+            print(error)
+        return error
 
 
-def downloadFile(newfilename: str, enclosure_url: str) -> None:
-    """Download File."""
+def downloadFile(newfilename: str, enclosure_url: str, quiet: bool = False) -> None:
+    """Download File, resuming what an earlier attempt left."""
     # create download dir path if it does not exist
-    if not os.path.isdir(os.path.dirname(newfilename)):
-        os.makedirs(os.path.dirname(newfilename))
-
-    # download podcast
-    print("Downloading ...")
-
-    r = requests.get(enclosure_url, stream=True)
-    # Total size in bytes.
-    total_size = int(r.headers.get("content-length", 0))
-    block_size = 1024  # 1 Kibibyte
-
-    with tqdm.tqdm(total=total_size, unit="iB", unit_scale=True) as t:
-        with open(newfilename, "wb") as out_file:
-            for data in r.iter_content(block_size):
-                t.update(len(data))
-                out_file.write(data)
-        if total_size != 0 and t.n != total_size:
-            print("ERROR, something went wrong")
-
-    """
-    request = urllib.request.Request(enclosure_url)
-    with urllib.request.urlopen(request, timeout=30) as response:
-        total_size = int(response.info()["Content-Length"])
-        block_size = 1024  # 1 Kibibyte
-        with open(newfilename, "wb") as out_file:
-            shutil.copyfileobj(response, out_file, 100 * 1024)
-    """
-
-    print("Download complete")
-
-
-def resumeDownloadFile(newfilename: str, enclosure_url: str, headers: dict) -> None:
-    """Resume file download."""
-    # find start-bye and total byte-length
-    print("Prepare resume")
-    request = urllib.request.Request(enclosure_url, headers=headers)
-    with urllib.request.urlopen(request) as response:
-        info = response.info()
-        if "Content-Length" in info:
-            contentlength = int(info["Content-Length"])
-        else:
-            contentlength = -1
-
-    if os.path.isfile(newfilename):
-        start_byte = os.path.getsize(newfilename)
-    else:
-        start_byte = 0
-
-    request = urllib.request.Request(enclosure_url, headers=headers)
-    if start_byte > 0:
-        if start_byte >= contentlength:
-            print("Resume not possible. (startbyte greater then contentlength)")
-            return
-        request.add_header("Range", "bytes={start_byte}-")
-
-    with urllib.request.urlopen(request, timeout=30) as response:
-        with open(newfilename, "ab+") as out_file:
-
-            info = response.info()
-            out_file.seek(start_byte)
-
-            if "Content-Range" in info:
-                contentrange = info["Content-Range"].split(" ")[1].split("-")[0]
-                if not int(contentrange) == start_byte:
-                    print("Resume not possible. Cannot resume from byte {start_byte}")
-                    return
-
-            if not out_file.tell() == start_byte:
-                print("Resume not possible. Cannot append data from byte {start_byte}")
-                return
-
-            print("Start resume from byte {start_byte}")
-            print("Downloading ...")
-            shutil.copyfileobj(response, out_file, 100 * 1024)
-
-    print("Resume complete")
+    os.makedirs(os.path.dirname(newfilename), exist_ok=True)
+
+    done = partial_size(newfilename)
+    if not quiet:
+        print(f"Resuming after {done} bytes ..." if done else "Downloading ...")
+    journal = download(
+        enclosure_url,
+        newfilename,
+        headers,
+        SEGMENTS,
+        HTTP,
+        HTTP.timeout,
+        rate_limit=RATE_LIMIT,
+        quiet=quiet,
+    )
+    MANIFEST.update(
+        enclosure_url,
+        length=journal.length,
+        etag=journal.etag,
+        last_modified=journal.last_modified,
+    )
+    if not quiet:
+        print("Download complete")
 
 
 def validateFile(
     newfilename: str, time_published: int, enclosure_length: int, enclosure_url: str,
 ) -> bool:
-    """Validate File."""
+    """Validate File.
+
+    What the server said about the enclosure is kept in MANIFEST, so a file
+    validated once, or downloaded in full, is confirmed from its size alone.
+    Otherwise the server is only asked for headers, never for the body.
+    """
     if os.path.isfile(newfilename + ".err"):
         return True  # skip file
 
     # try to validate size
 
     filelength = os.path.getsize(newfilename)
+    known = MANIFEST.get(enclosure_url)
+    if filelength == known.get("validated") or (
+        known.get("length") and abs(filelength - known["length"]) <= 1
+    ):
+        return True
+    try:
+        enclosure_length = int(enclosure_length or 0)
+    except (TypeError, ValueError):
+        enclosure_length = 0
     if enclosure_length:
         if abs(filelength - enclosure_length) <= 1:
+            MANIFEST.update(enclosure_url, validated=filelength)
             return True
-    else:
-        enclosure_length = 0
 
-    request = urllib.request.Request(enclosure_url)
-    with urllib.request.urlopen(request) as response:
-        info = response.info()
-        if "Content-MD5" in info:
-            print(f"Content-MD5:{info['Content-MD5']}")
+    info = remote_headers(HTTP, enclosure_url, headers, HTTP.timeout)
+    MANIFEST.update(
+        enclosure_url,
+        length=info["length"],
+        etag=info["etag"],
+        last_modified=info["last_modified"],
+    )
+    if info["md5"]:
+        print(f"Content-MD5:{info['md5']}")
 
-        if "Content-Length" in info:
-            contentlength = int(info["Content-Length"])
-            if abs(filelength - contentlength) <= 1:
-                return True
-            elif filelength > contentlength:
-                return True
+    contentlength = info["length"]
+    if contentlength is not None:
+        if abs(filelength - contentlength) <= 1 or filelength > contentlength:
+            MANIFEST.update(enclosure_url, validated=filelength)
+            return True
 
-        print(
-            "Filelength and content-length mismatch."
-            f"filelength:{filelength}"
-            f"enclosurelength:{enclosure_length}"
-            f" contentlength:{int(info.get('Content-Length', '0'))}",
-        )
+    print(
+        "Filelength and content-length mismatch."
+        f"filelength:{filelength}"
+        f"enclosurelength:{enclosure_length}"
+        f" contentlength:{contentlength or 0}",
+    )
 
-        # if size validation fail, try to validate mtime.
+    # if size validation fail, try to validate mtime.
 
-        if time_published:
-            filemtime = parseUnixTimeToDatetime(os.path.getmtime(newfilename))
-            time_published = parseUnixTimeToDatetime(time_published)
-            if time_published == filemtime:
-                return True
+    if time_published:
+        filemtime = parseUnixTimeToDatetime(os.path.getmtime(newfilename))
+        time_published = parseUnixTimeToDatetime(time_published)
+        if time_published == filemtime:
+            MANIFEST.update(enclosure_url, validated=filelength)
+            return True
 
-            if "Last-Modified" in info:
-                last_modified = parseRftTimeToDatetime(info["Last-Modified"])
-                if last_modified == filemtime:
-                    return True
-            else:
-                last_modified = ""
+        if info["last_modified"]:
+            last_modified = parseRftTimeToDatetime(info["last_modified"])
+            if last_modified == filemtime:
+                MANIFEST.update(enclosure_url, validated=filelength)
+                return True
+        else:
+            last_modified = ""
 
-            print(
-                f"Last-Modified mismatch."
-                f" file-mtime:{filemtime}"
-                f" Last-Modified:{last_modified}"
-                f" pubdate:{time_published}",
-            )
+        print(
+            f"Last-Modified mismatch."
+            f" file-mtime:{filemtime}"
+            f" Last-Modified:{last_modified}"
+            f" pubdate:{time_published}",
+        )
     return False
 
 
@@ -542,19 +1314,97 @@ def parseUnixTimeToDatetime(datetimestamp: int) -> datetime.datetime:
     return datetime.datetime.fromtimestamp(datetimestamp)
 
 
+def historyTitle(title: str) -> str:
+    """Title of an episode as it is written to history."""
+    return getSafeFilenameFromText(title.strip(" ."))
+
+
+
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="Podcaster")
     parser.add_argument(
-        "-f", "--podcastfile", type=str, help="podcast file location", default=PODFILE,
+        "-f", "--podcastfile", type=str, help="podcast file location", default=None,
     )
     parser.add_argument(
         "--songs", help="song mode", action='store_true',
     )
+    parser.add_argument(
+        "--refresh", help="fetch every feed into the cache and exit",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="feeds fetched at once by --refresh", default=16,
+    )
+    parser.add_argument(
+        "--per-host", type=int, help="feeds fetched at once from one host",
+        default=4,
+    )
+    parser.add_argument(
+        "--cache-stats", help="show what the download directory holds and exit",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--sync", action="store_true",
+        help="download episodes of every feed without asking, then exit",
+    )
+    parser.add_argument(
+        "--count", type=int, help="episodes of every feed --sync downloads",
+        default=3,
+    )
+    parser.add_argument(
+        "--order", choices=["latest", "random"], default="latest",
+        help="which episodes --sync downloads",
+    )
+    parser.add_argument(
+        "--jobs", type=int, help="episodes --sync downloads at once", default=4,
+    )
+    parser.add_argument(
+        "--max-rate", type=float, metavar="MB", default=None,
+        help="MiB per second all downloads share, max_rate_mb by default",
+    )
+    parser.add_argument(
+        "--summary", metavar="JSON", default=None,
+        help="where --sync writes its summary, stdout by default",
+    )
+    parser.add_argument(
+        "--profile", nargs="?", const="", default=None, metavar="JSONL",
+        help="print where the time of every pick went and append it to JSONL,"
+        " profile.jsonl in cachedir by default",
+    )
+    parser.add_argument(
+        "--cprofile", metavar="FILE", default=None,
+        help="save cProfile stats of the first selection to FILE",
+    )
 
     args = parser.parse_args()
-    podcastfilepath = os.path.abspath(os.path.expanduser(args.podcastfile))
+    configure()
+    if args.profile is not None or args.cprofile:
+        PROFILER.enable(
+            args.profile or os.path.join(CACHEDIR, "profile.jsonl"), args.cprofile,
+        )
+    podcastfilepath = os.path.abspath(
+        os.path.expanduser(args.podcastfile or PODFILE),
+    )
+    if args.refresh:
+        refresh_podcasts(podcastfilepath, args.workers, args.per_host)
+        exit()
+    if args.cache_stats:
+        print_cache_stats()
+        exit()
+    if args.max_rate is not None:
+        RATE_LIMIT = RateLimit(args.max_rate * 2 ** 20) if args.max_rate else None
+    if args.sync:
+        summary = sync_podcasts(
+            podcastfilepath,
+            args.count,
+            args.order,
+            args.workers,
+            args.jobs,
+            args.summary,
+        )
+        exit(1 if summary["totals"].get("failed") else 0)
     if args.songs:
         print("Executing in songs mode")
     try:
@@ -563,3 +1413,8 @@ if __name__ == "__main__":
         signal.alarm(0)
         print("\nExiting..")
         exit()
+    finally:
+        if PLAYER is not None:
+            PLAYER.close()
+        if PROXY is not None:
+            PROXY.close()
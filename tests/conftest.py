@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# the stand-in servers of the benchmarks
+sys.path.insert(1, os.path.join(ROOT, "benchmarks"))
+
+RC = """[default]
+podfile = {directory}/podcasts.ini
+downloaddir = {directory}/downloads
+cachedir = {directory}/cache
+timeout = 1
+parser = expat
+prefetch = FALSE
+{options}
+[betterrandom]
+master = TRUE
+histcount = 10
+file = {directory}/history.csv
+"""
+
+
+@pytest.fixture
+def configure(tmp_path):
+    """Configure getpodcast from a throwaway config, return its podfile.
+
+    Keyword arguments are more options of the default section.
+    """
+    import getpodcast
+
+    def configure(**options):
+        rcfile = tmp_path / "podcasterrc"
+        lines = "".join(f"{name} = {value}\n" for name, value in options.items())
+        rcfile.write_text(RC.format(directory=tmp_path, options=lines))
+        getpodcast.configure(str(rcfile))
+        return tmp_path / "podcasts.ini"
+
+    return configure
@@ -0,0 +1,123 @@
+import io
+
+import pytest
+
+from Catalog import Catalog, item_key
+from FeedParser import count_items, read_new_items
+from Podcast import Item, Podcast
+from synthetic import make_feed
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    return Catalog(str(tmp_path / "catalog.sqlite"))
+
+
+def update(catalog, feed, chunk_size=64 * 1024):
+    """What update_catalog does with a feed once it is fetched."""
+    guids = catalog.guids("Pod")
+
+    def known(fields):
+        return item_key(Item(fields=fields)) in guids
+
+    parser, items, stopped, count = read_new_items(
+        io.BytesIO(feed), known, chunk_size=chunk_size
+    )
+    podcast = Podcast.from_stream(parser, items)
+    if stopped:
+        catalog.prepend("Pod", podcast.items, count)
+    else:
+        catalog.sync("Pod", podcast)
+    return stopped, len(items), count
+
+
+def window(catalog):
+    rows = catalog.connection.execute(
+        "SELECT guid FROM episodes WHERE podcast = 'Pod' AND position IS NOT NULL"
+        " ORDER BY position"
+    )
+    return [row[0] for row in rows]
+
+
+@pytest.mark.parametrize("chunk_size", [64, 1000, 64 * 1024])
+def test_count_items_across_chunks(chunk_size):
+    feed = make_feed(37)
+    assert count_items(b"", io.BytesIO(feed), chunk_size) == 37
+    assert count_items(feed[:100], io.BytesIO(feed[100:]), chunk_size) == 37
+
+
+@pytest.mark.parametrize("chunk_size", [256, 64 * 1024])
+def test_update_retires_episodes_that_left_the_feed(catalog, chunk_size):
+    assert update(catalog, make_feed(100, first=5), chunk_size) == (False, 100, 100)
+    # two new episodes at the top, the two oldest dropped off the end
+    stopped, new, count = update(catalog, make_feed(100, first=3), chunk_size)
+    assert (stopped, new, count) == (True, 2, 100)
+    assert catalog.count("Pod") == 100
+    assert window(catalog) == [f"example-{n}" for n in range(3, 103)]
+
+
+def test_update_of_a_growing_feed_keeps_everything(catalog):
+    update(catalog, make_feed(50, first=5))
+    assert update(catalog, make_feed(55, first=0)) == (True, 5, 55)
+    assert window(catalog) == [f"example-{n}" for n in range(0, 55)]
+
+
+def test_update_without_new_episodes_of_a_shrunk_feed(catalog):
+    update(catalog, make_feed(50))
+    assert update(catalog, make_feed(40)) == (True, 0, 40)
+    assert catalog.count("Pod") == 40
+
+
+def untitled(description, date="Mon, 01 Jan 2024 00:00:00 GMT"):
+    return Item(fields={"description": description, "pubdate": date})
+
+
+def test_item_key_without_guid_url_or_title_is_stable(catalog):
+    class Feed(object):
+        items = [untitled("first"), untitled("second")]
+
+    catalog.sync("Pod", Feed)
+    keys = window(catalog)
+    Feed.items = [untitled("new")] + Feed.items
+    catalog.sync("Pod", Feed)
+    assert window(catalog)[1:] == keys
+    rows = catalog.connection.execute("SELECT count(*) FROM episodes").fetchone()
+    assert rows[0] == 3
+
+
+def test_item_of_a_row_reads_like_a_parsed_item(catalog):
+    feed = make_feed(3)
+    catalog.sync("Pod", Podcast(feed, engine="expat"))
+    row = catalog.random_episode("Pod")
+    parsed = {item.guid: item for item in Podcast(feed, engine="expat").items}
+    item = catalog.item(row)
+    assert item.enclosure_length == parsed[item.guid].enclosure_length
+    assert isinstance(item.enclosure_length, str)
+
+
+def undated(feed, which):
+    """feed without the pubDate of its first or last item."""
+    start = feed.find(b"<pubDate>") if which == "first" else feed.rfind(b"<pubDate>")
+    end = feed.index(b"</pubDate>", start) + len(b"</pubDate>")
+    return feed[:start] + feed[end:]
+
+
+@pytest.mark.parametrize("which", ["first", "last"])
+def test_update_catalog_of_a_feed_with_an_undated_item(tmp_path, monkeypatch, which):
+    import getpodcast
+    from http_server import StandInServer
+
+    monkeypatch.setattr(
+        getpodcast, "CATALOG", Catalog(str(tmp_path / "catalog.sqlite"))
+    )
+    files = {}
+    with StandInServer(files) as server:
+        files["/feed.xml"] = undated(make_feed(5, base=server.url, ttl=0), which)
+        url = server.url + "/feed.xml"
+        assert getpodcast.update_catalog("Pod", url) == "synced"
+        assert getpodcast.CATALOG.count("Pod") == 5
+        files["/feed.xml"] = undated(make_feed(6, first=-1, ttl=0), which)
+        # without the date of the newest item the order cannot be trusted
+        expected = "synced" if which == "first" else "updated"
+        assert getpodcast.update_catalog("Pod", url) == expected
+        assert getpodcast.CATALOG.count("Pod") == 6
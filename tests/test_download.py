@@ -0,0 +1,118 @@
+import hashlib
+import os
+
+import pytest
+
+from Download import DownloadError, Journal, download
+from http_server import StandInServer
+
+DATA = os.urandom(3 * 2 ** 20 + 12345)
+ETAG = '"' + hashlib.md5(DATA).hexdigest() + '"'
+
+
+@pytest.fixture
+def server():
+    with StandInServer({"/episode.mp3": DATA}) as server:
+        yield server
+
+
+@pytest.fixture
+def target(tmp_path):
+    return str(tmp_path / "episode.mp3")
+
+
+def read(path):
+    with open(path, "rb") as data_file:
+        return data_file.read()
+
+
+def started(target, url, written, etag=ETAG, marker=b"m"):
+    """A .part file of url with its first written bytes done, as marker."""
+    with open(target + ".part", "wb") as part:
+        part.write(marker * written)
+    journal = Journal(target + ".part.json", url)
+    journal.length = len(DATA)
+    journal.etag = etag
+    journal.ranges = [[0, written]]
+    journal.ranges_ok = True
+    journal.save()
+
+
+def test_download(server, target):
+    journal = download(server.url + "/episode.mp3", target, {}, quiet=True)
+    assert read(target) == DATA
+    assert journal.length == len(DATA)
+    assert journal.etag == ETAG
+    assert not os.path.exists(target + ".part")
+    assert not os.path.exists(target + ".part.json")
+
+
+@pytest.mark.parametrize("segments", [2, 4])
+def test_segmented_download(server, target, segments):
+    url = server.url + "/episode.mp3"
+    download(url, target, {}, segments=segments, min_size=0, quiet=True)
+    assert read(target) == DATA
+    # a probe and one request per segment
+    assert server.requests == 1 + segments
+
+
+def test_resume_from_the_part_file(server, target):
+    url = server.url + "/episode.mp3"
+    started(target, url, 2 ** 20)
+    download(url, target, {}, quiet=True)
+    # what the .part file held was not fetched again
+    assert read(target) == b"m" * 2 ** 20 + DATA[2 ** 20 :]
+    assert server.requests == 1
+
+
+def test_changed_enclosure_restarts(server, target):
+    url = server.url + "/episode.mp3"
+    started(target, url, 2 ** 20, etag='"old"')
+    download(url, target, {}, quiet=True)
+    assert read(target) == DATA
+
+
+def test_server_without_ranges_is_fetched_whole(target):
+    with StandInServer({"/episode.mp3": DATA}, ranges=False) as server:
+        url = server.url + "/episode.mp3"
+        download(url, target, {}, segments=4, min_size=0, quiet=True)
+        assert read(target) == DATA
+        os.remove(target)
+        started(target, url, 2 ** 20)
+        download(url, target, {}, quiet=True)
+        assert read(target) == DATA
+
+
+class Response(object):
+    """A 200 that ends before its Content-Length without an error."""
+
+    status_code = 200
+
+    def __init__(self, body, length):
+        self.body = body
+        self.headers = {"Content-Length": str(length), "ETag": ETAG}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def iter_content(self, size):
+        for start in range(0, len(self.body), size):
+            yield self.body[start : start + size]
+
+
+class Session(object):
+    def get(self, url, **kwargs):
+        return Response(DATA[:1000], len(DATA))
+
+
+def test_incomplete_transfer_is_not_renamed(target):
+    with pytest.raises(DownloadError, match="ended at byte 1000"):
+        download("http://example.com/e.mp3", target, {}, session=Session(), quiet=True)
+    assert not os.path.exists(target)
+    assert read(target + ".part")[:1000] == DATA[:1000]
+    journal = Journal.load(target + ".part.json", "http://example.com/e.mp3")
+    assert journal.ranges == [[0, 1000]]
+    assert journal.length == len(DATA)
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+from DownloadCache import DownloadCache
+
+MB = 2 ** 20
+
+
+@pytest.fixture
+def downloads(tmp_path):
+    return tmp_path / "downloads"
+
+
+def make_cache(tmp_path, downloads, max_bytes):
+    return DownloadCache(str(downloads), str(tmp_path / "downloads.json"), max_bytes)
+
+
+def write(downloads, relative, size):
+    path = downloads / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def hardlink(downloads, source, relative):
+    path = downloads / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    os.link(source, path)
+    return str(path)
+
+
+def test_least_recently_played_go_first(tmp_path, downloads):
+    cache = make_cache(tmp_path, downloads, 2 * MB)
+    old = write(downloads, "Pod/Old_01.01.2020.mp3", MB)
+    cache.add(old, "Pod", "Old")
+    new = write(downloads, "Pod/New_02.01.2020.mp3", MB)
+    cache.add(new, "Pod", "New")
+    cache.played("Pod", "Old", when=0)
+    cache.played("Pod", "New")
+    added = write(downloads, "Pod/Added_03.01.2020.mp3", MB)
+    assert cache.add(added, "Pod", "Added") == [old]
+    assert os.path.exists(new) and os.path.exists(added)
+
+
+def test_links_to_one_file_count_once(tmp_path, downloads):
+    cache = make_cache(tmp_path, downloads, 3 * MB)
+    stored = write(downloads, ".store/object", 2 * MB)
+    first = hardlink(downloads, stored, "A/Episode_01.01.2020.mp3")
+    cache.add(first, "A", "Episode")
+    second = hardlink(downloads, stored, "B/Episode_01.01.2020.mp3")
+    assert cache.add(second, "B", "Episode") == []
+    assert cache.size() == 2 * MB
+
+
+def test_removing_one_link_frees_nothing(tmp_path, downloads):
+    cache = make_cache(tmp_path, downloads, 3 * MB)
+    stored = write(downloads, ".store/object", 2 * MB)
+    first = hardlink(downloads, stored, "A/Episode_01.01.2020.mp3")
+    cache.add(first, "A", "Episode")
+    second = hardlink(downloads, stored, "B/Episode_01.01.2020.mp3")
+    cache.add(second, "B", "Episode")
+    cache.played("A", "Episode", when=1)
+    cache.played("B", "Episode", when=2)
+    # 2 MB linked twice and 2 MB new: both links must go to get within 3 MB,
+    # removing only the first one would not free anything
+    added = write(downloads, "C/New_01.01.2020.mp3", 2 * MB)
+    assert cache.add(added, "C", "New") == [first, second]
+    assert cache.size() == 2 * MB
+
+
+def test_shared_file_is_not_removed_for_nothing(tmp_path, downloads):
+    cache = make_cache(tmp_path, downloads, 4 * MB)
+    stored = write(downloads, ".store/object", 2 * MB)
+    first = hardlink(downloads, stored, "A/Episode_01.01.2020.mp3")
+    cache.add(first, "A", "Episode")
+    second = hardlink(downloads, stored, "B/Episode_01.01.2020.mp3")
+    cache.add(second, "B", "Episode")
+    added = write(downloads, "C/New_01.01.2020.mp3", 2 * MB)
+    assert cache.add(added, "C", "New") == []
+
+
+def test_index_is_rebuilt_by_walking(tmp_path, downloads):
+    write(downloads, "Pod/Title_01.01.2020.mp3", 10)
+    write(downloads, "Pod/Partial_01.01.2020.mp3.part", 10)
+    write(downloads, ".store/object", 10)
+    cache = make_cache(tmp_path, downloads, 0)
+    entries = cache.load()
+    assert list(entries) == [os.path.join("Pod", "Title_01.01.2020.mp3")]
+    assert entries[os.path.join("Pod", "Title_01.01.2020.mp3")][2:] == ["Pod", "Title"]
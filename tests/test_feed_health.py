@@ -0,0 +1,147 @@
+import json
+import threading
+
+import pytest
+
+from FeedHealth import FeedHealth, host_of
+
+FEED = "http://feeds.example.com/a.xml"
+OTHERS = [f"http://feeds.example.com/{name}.xml" for name in "bcdef"]
+
+
+@pytest.fixture
+def health(tmp_path):
+    return FeedHealth(
+        str(tmp_path / "health.json"),
+        backoff=60,
+        max_backoff=600,
+        negative_ttl=1800,
+        threshold=3,
+    )
+
+
+def retry(health, url):
+    return health.load()["feeds"][url]["retry"]
+
+
+def test_host_of():
+    assert host_of("HTTP://Feeds.Example.com:8080/x?y") == "feeds.example.com:8080"
+
+
+def test_unknown_feed_is_not_blocked(health):
+    assert health.blocked(FEED, now=0) is None
+
+
+def test_backoff_doubles_up_to_max(health):
+    delays = []
+    for _ in range(6):
+        health.failure(FEED, "timed out", now=1000)
+        delays.append(retry(health, FEED) - 1000)
+    for failures, delay in enumerate(delays[:4]):
+        assert 60 * 2 ** failures * 0.9 <= delay <= 60 * 2 ** failures * 1.1
+    assert 600 * 0.9 <= delays[-1] <= 600 * 1.1
+
+
+def test_failed_feed_is_blocked_until_retry(health):
+    health.failure(FEED, "timed out", now=1000)
+    assert "Failed 1 times" in health.blocked(FEED, now=1001)
+    assert "timed out" in health.blocked(FEED, now=1001)
+    assert health.blocked(FEED, now=1000 + 67) is None
+
+
+def test_4xx_is_left_alone_for_negative_ttl(health):
+    health.failure(FEED, "404 Not Found", status=404, now=1000)
+    assert retry(health, FEED) == 1000 + 1800
+    assert health.blocked(FEED, now=1000 + 1799) is not None
+    assert health.blocked(FEED, now=1000 + 1800) is None
+
+
+def test_4xx_does_not_count_against_the_host(health):
+    for url in [FEED] + OTHERS[:3]:
+        health.failure(url, "410 Gone", status=410, now=1000)
+    assert health.load()["hosts"] == {}
+    assert health.blocked(OTHERS[4], now=1000) is None
+
+
+def test_success_forgets_feed_and_host(health):
+    health.failure(FEED, "503", status=503, now=1000)
+    health.success(FEED)
+    assert health.load() == {"feeds": {}, "hosts": {}}
+    assert health.blocked(FEED, now=1001) is None
+
+
+def test_circuit_opens_after_threshold(health):
+    health.failure(OTHERS[0], "refused", now=1000)
+    health.failure(OTHERS[1], "503", status=503, now=1000)
+    assert health.blocked(FEED, now=1000) is None
+    health.failure(OTHERS[2], "refused", now=1000)
+    assert "is down" in health.blocked(FEED, now=1001)
+
+
+def open_circuit(health, now=1000):
+    for url in OTHERS[:3]:
+        health.failure(url, "refused", now=now)
+    return health.load()["hosts"][host_of(FEED)]["retry"]
+
+
+def test_one_trial_fetch_when_the_circuit_times_out(health):
+    reopen = open_circuit(health)
+    assert health.blocked(FEED, now=reopen - 1) is not None
+    assert health.blocked(FEED, now=reopen) is None
+    for url in OTHERS[3:]:
+        assert "another feed is trying" in health.blocked(url, now=reopen + 1)
+
+
+def test_trial_success_closes_the_circuit(health):
+    reopen = open_circuit(health)
+    assert health.blocked(FEED, now=reopen) is None
+    health.success(FEED)
+    for url in OTHERS[3:]:
+        assert health.blocked(url, now=reopen + 1) is None
+
+
+def test_trial_failure_opens_the_circuit_for_longer(health):
+    reopen = open_circuit(health)
+    assert health.blocked(FEED, now=reopen) is None
+    health.failure(FEED, "refused", now=reopen)
+    host = health.load()["hosts"][host_of(FEED)]
+    assert "probing" not in host
+    assert 120 * 0.9 <= host["retry"] - reopen <= 120 * 1.1
+    assert "is down" in health.blocked(OTHERS[4], now=reopen + 1)
+    assert health.blocked(OTHERS[4], now=host["retry"]) is None
+
+
+def test_trial_that_never_answers_lets_the_next_one_go(health):
+    reopen = open_circuit(health)
+    assert health.blocked(FEED, now=reopen) is None
+    assert health.blocked(OTHERS[3], now=reopen + 59) is not None
+    assert health.blocked(OTHERS[3], now=reopen + 60) is None
+
+
+def test_only_one_thread_gets_the_trial(health):
+    reopen = open_circuit(health)
+    barrier = threading.Barrier(8)
+    let_through = []
+
+    def fetch(url):
+        barrier.wait()
+        if health.blocked(url, now=reopen) is None:
+            let_through.append(url)
+
+    threads = [
+        threading.Thread(target=fetch, args=(f"http://feeds.example.com/{n}",))
+        for n in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(let_through) == 1
+
+
+def test_kept_on_disk(health, tmp_path):
+    health.failure(FEED, "refused", now=1000)
+    with open(tmp_path / "health.json") as health_file:
+        assert FEED in json.load(health_file)["feeds"]
+    again = FeedHealth(str(tmp_path / "health.json"))
+    assert again.blocked(FEED, now=1001) is not None
@@ -0,0 +1,156 @@
+import pytest
+
+from FeedParser import FeedParser
+from Podcast import Podcast
+from synthetic import make_feed
+
+# Nested elements, CDATA, repeated and list tags, two images and an owner:
+# where "the first element wins" and "only leaf text" could drift.
+TRICKY = b"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd"
+     xmlns:atom="http://www.w3.org/2005/Atom"
+     xmlns:creativeCommons="http://example.com/creativeCommons">
+<channel>
+  <title>Tricky &amp; Nested</title>
+  <link>https://example.com/</link>
+  <description><![CDATA[<p>Show <b>notes</b> in CDATA</p>]]></description>
+  <language>en-us</language>
+  <copyright>2024 Example</copyright>
+  <generator>Hand written</generator>
+  <pubDate>Mon, 01 Jan 2024 10:00:00 GMT</pubDate>
+  <lastBuildDate>Tue, 02 Jan 2024 10:00:00 GMT</lastBuildDate>
+  <managingEditor>editor@example.com</managingEditor>
+  <webMaster>web@example.com</webMaster>
+  <ttl>60</ttl>
+  <creativeCommons:license>https://example.com/license</creativeCommons:license>
+  <category>Technology</category>
+  <category>News</category>
+  <category><![CDATA[Arts & Crafts]]></category>
+  <atom:link rel="self" href="https://example.com/feed.xml"/>
+  <atom:link rel="hub" href="https://hub.example.com/"/>
+  <image>
+    <title>First image</title>
+    <url>https://example.com/first.jpg</url>
+    <link>https://example.com/</link>
+    <width>144</width>
+    <height>144</height>
+  </image>
+  <image>
+    <title>Second image</title>
+    <url>https://example.com/second.jpg</url>
+  </image>
+  <itunes:author>Example Author</itunes:author>
+  <itunes:subtitle>A subtitle</itunes:subtitle>
+  <itunes:summary><![CDATA[A summary with <i>markup</i>]]></itunes:summary>
+  <itunes:owner>
+    <itunes:name>Example Owner</itunes:name>
+    <itunes:email>owner@example.com</itunes:email>
+  </itunes:owner>
+  <itunes:image href="https://example.com/itunes.jpg"/>
+  <itunes:category text="Technology">
+    <itunes:category text="Podcasting"/>
+  </itunes:category>
+  <itunes:category text="News"/>
+  <itunes:explicit>No</itunes:explicit>
+  <itunes:complete>Yes</itunes:complete>
+  <itunes:keywords>one, two,three</itunes:keywords>
+  <itunes:new-feed-url>https://example.com/new.xml</itunes:new-feed-url>
+  <item>
+    <title><![CDATA[First <episode> & more]]></title>
+    <link>https://example.com/1</link>
+    <description>Text <![CDATA[and <b>CDATA</b>]]> mixed</description>
+    <author>host@example.com (Host)</author>
+    <comments>https://example.com/1#comments</comments>
+    <guid isPermaLink="false">tricky-1</guid>
+    <pubDate>Mon, 01 Jan 2024 10:00:00 GMT</pubDate>
+    <category>First</category>
+    <category>Second</category>
+    <enclosure url="https://example.com/1.mp3" length="1234" type="audio/mpeg"/>
+    <itunes:author>Item Author</itunes:author>
+    <itunes:duration>1:02:03</itunes:duration>
+    <itunes:explicit>yes</itunes:explicit>
+    <itunes:block>yes</itunes:block>
+    <itunes:isClosedCaptioned>Yes</itunes:isClosedCaptioned>
+    <itunes:order>2</itunes:order>
+    <itunes:image href="https://example.com/1.jpg"/>
+    <itunes:subtitle>First subtitle</itunes:subtitle>
+    <itunes:summary>First summary</itunes:summary>
+  </item>
+  <item>
+    <title>Second</title>
+    <description><p>nested <b>elements</b></p></description>
+    <guid>https://example.com/2</guid>
+    <enclosure url="https://example.com/2.m4a" length="5678" type="audio/x-m4a"/>
+    <enclosure url="https://example.com/2.mp3" length="9" type="audio/mpeg"/>
+    <title>A second title</title>
+  </item>
+  <item>
+    <title></title>
+    <description/>
+  </item>
+</channel>
+</rss>
+"""
+
+SKIPPED = {"soup", "full_soup", "feed_content", "engine", "items", "encoding"}
+
+
+def fields(thing, skipped=()):
+    values = {
+        name: value for name, value in vars(thing).items() if name not in skipped
+    }
+    if "itunes_keywords" in values:
+        # a set on both sides, in no particular order
+        values["itunes_keywords"] = sorted(values["itunes_keywords"])
+    return values
+
+
+@pytest.mark.parametrize(
+    "feed", [TRICKY, make_feed(5), make_feed(5, itunes=False)],
+    ids=["tricky", "itunes", "plain"],
+)
+def test_expat_agrees_with_soup(feed):
+    soup = Podcast(feed, engine="soup")
+    expat = Podcast(feed, engine="expat")
+    assert expat.engine == "expat"
+    assert fields(expat, SKIPPED | {"enclosure_types"}) == fields(soup, SKIPPED)
+    assert len(expat.items) == len(soup.items)
+    for parsed, souped in zip(expat.items, soup.items):
+        assert fields(parsed, {"soup"}) == fields(souped, {"soup"})
+
+
+def test_tricky_fields():
+    podcast = Podcast(TRICKY, engine="expat")
+    assert podcast.title == "Tricky & Nested"
+    assert podcast.description == "<p>Show <b>notes</b> in CDATA</p>"
+    assert podcast.categories == ["Technology", "News", "Arts & Crafts"]
+    assert podcast.itunes_categories == ["Technology", "Podcasting", "News"]
+    assert (podcast.owner_name, podcast.owner_email) == (
+        "Example Owner",
+        "owner@example.com",
+    )
+    assert podcast.image_title == "First image"
+    assert podcast.image_url == "https://example.com/first.jpg"
+    assert podcast.pubsubhubbub == "https://hub.example.com/"
+    first, second, empty = podcast.items
+    assert first.title == "First <episode> & more"
+    # split into text and CDATA sections, soup.find().string is None
+    assert first.description is None
+    assert first.categories == ["First", "Second"]
+    # an element with children carries no text, the first element wins
+    assert second.description is None
+    assert second.title == "Second"
+    assert second.enclosure_url == "https://example.com/2.m4a"
+    assert empty.title is None
+
+
+def test_fed_in_chunks_like_at_once():
+    whole = FeedParser()
+    whole.feed(TRICKY, final=True)
+    chunked = FeedParser()
+    for start in range(0, len(TRICKY), 7):
+        chunked.feed(TRICKY[start : start + 7])
+    chunked.close()
+    assert chunked.channel == whole.channel
+    assert chunked.image == whole.image
+    assert chunked.items == whole.items
@@ -0,0 +1,51 @@
+import json
+import threading
+
+from History import History
+
+
+def test_only_histcount_plays_are_recent(tmp_path):
+    history = History(str(tmp_path / "history.log"), 2)
+    history.append("Pod", "One", 1)
+    history.append("Pod", "Two", 2)
+    history.append("Other", "Three", 3)
+    assert ("Pod", "One") not in history
+    assert ("Pod", "Two") in history
+    assert history.titles("Pod") == {"Two"}
+    assert history.plays() == [("Pod", "Two", 2), ("Other", "Three", 3)]
+
+
+def test_loaded_from_the_end_of_the_log(tmp_path):
+    path = tmp_path / "history.log"
+    with open(path, "w") as log_file:
+        for n in range(10):
+            entry = {"podcast": "Pod", "title": f"Title {n}", "played": n}
+            log_file.write(json.dumps(entry) + "\n")
+    history = History(str(path), 3)
+    assert history.titles("Pod") == {"Title 7", "Title 8", "Title 9"}
+
+
+def test_read_while_another_thread_plays(tmp_path):
+    history = History(str(tmp_path / "history.log"), 5)
+    done = threading.Event()
+    errors = []
+
+    def read():
+        try:
+            while not done.is_set():
+                for n in range(50):
+                    history.titles(f"Pod {n}")
+                    (f"Pod {n}", "Title") in history
+                    history.plays()
+        except RuntimeError as err:
+            errors.append(err)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for n in range(3000):
+            history.remember(f"Pod {n % 50}", f"Title {n}", n)
+    finally:
+        done.set()
+        reader.join()
+    assert errors == []
@@ -0,0 +1,60 @@
+import pytest
+
+from FeedParser import FeedParser
+from Podcast import Item, Podcast
+from synthetic import make_feed
+
+FEED = make_feed(7)
+
+INDICES = [0, 3, 6, -1, -2, -7]
+SLICES = [
+    slice(None),
+    slice(1, 3),
+    slice(-3, None),
+    slice(None, -2),
+    slice(-5, -1),
+    slice(None, None, 2),
+    slice(None, None, -1),
+    slice(5, 1, -2),
+    slice(10, 20),
+]
+
+
+def eager_items():
+    parser = FeedParser()
+    parser.feed(FEED, final=True)
+    return [Item(fields=fields).to_dict() for fields in parser.items]
+
+
+@pytest.fixture(params=["expat", "soup"])
+def items(request):
+    return Podcast(FEED, engine=request.param).items
+
+
+def test_indexing_matches_eager_parsing(items):
+    eager = eager_items()
+    for index in INDICES:
+        assert items[index].to_dict() == eager[index]
+    with pytest.raises(IndexError):
+        items[7]
+    with pytest.raises(IndexError):
+        items[-8]
+
+
+@pytest.mark.parametrize("cut", SLICES, ids=str)
+def test_slicing_matches_eager_parsing(items, cut):
+    eager = eager_items()
+    assert [item.to_dict() for item in items[cut]] == eager[cut]
+    assert len(items[cut]) == len(eager[cut])
+    # a slice of a slice, indexed from either end
+    for inner in (slice(1, None), slice(None, -1), slice(None, None, -1)):
+        assert [item.to_dict() for item in items[cut][inner]] == eager[cut][inner]
+    if eager[cut]:
+        assert items[cut][-1].to_dict() == eager[cut][-1]
+
+
+def test_slices_share_built_items(items):
+    last = items[-1]
+    assert items[-3:][-1] is last
+    assert items[::-1][0] is last
+    assert items[2:][1:][0] is items[3]
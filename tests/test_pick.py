@@ -0,0 +1,41 @@
+import pytest
+
+import getpodcast
+from http_server import StandInServer
+from synthetic import make_feed
+
+
+def bad_pubdate(feed):
+    """feed with a channel pubDate that does not parse."""
+    return feed.replace(b"<channel>", b"<channel>\n  <pubDate>yesterday</pubDate>", 1)
+
+
+@pytest.fixture
+def server():
+    files = {}
+    with StandInServer(files) as server:
+        files["/good.xml"] = make_feed(3, base=server.url, ttl=0)
+        files["/bad.xml"] = bad_pubdate(make_feed(3, base=server.url, ttl=0))
+        yield server
+
+
+@pytest.mark.parametrize("catalog", ["TRUE", "FALSE"])
+def test_feed_that_fails_to_parse_is_a_failing_feed(configure, server, catalog):
+    configure(catalog=catalog)
+    section = {"title": "Bad", "url": server.url + "/bad.xml"}
+    pick = getpodcast.pick_podcast(section)
+    assert pick.kind == "skip"
+    assert "TypeError" in pick.message
+    assert getpodcast.HEALTH.load()["feeds"][section["url"]]["failures"] == 1
+    # the next run leaves it alone for its backoff
+    assert getpodcast.pick_podcast(section).kind == "down"
+
+
+def test_choose_next_goes_past_a_feed_that_fails_to_parse(configure, server):
+    podfile = configure()
+    podfile.write_text(
+        f"[bad]\ntitle = Bad\nurl = {server.url}/bad.xml\nweight = 10\n"
+        f"[good]\ntitle = Good\nurl = {server.url}/good.xml\n"
+    )
+    pick = getpodcast.choose_next(str(podfile), False, tries=1000)
+    assert (pick.kind, pick.pod) == ("item", "Good")
@@ -0,0 +1,120 @@
+import os
+import sys
+
+import pytest
+
+from Player import Player, PlayerError
+
+FAKE_MPV = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "benchmarks",
+    "fake_mpv.py",
+)
+
+
+@pytest.fixture
+def played(tmp_path, monkeypatch):
+    """The log of what the fake mpv played."""
+    log = tmp_path / "played.log"
+    monkeypatch.setenv("FAKE_MPV_SECONDS", "0.05")
+    monkeypatch.setenv("FAKE_MPV_LOG", str(log))
+    return log
+
+
+@pytest.fixture
+def player(played):
+    player = Player(sys.executable, [FAKE_MPV], timeout=5)
+    yield player
+    player.close()
+
+
+def lines(log):
+    return log.read_text().splitlines() if log.exists() else []
+
+
+def test_start_connects_and_answers_commands(player):
+    assert not player.alive()
+    player.start()
+    assert player.alive()
+    assert player.directory is not None
+    assert player.command("get_property", "volume") is None
+
+
+def test_command_error_raises(player):
+    player.start()
+    with pytest.raises(PlayerError, match="invalid parameter"):
+        player.command("no-such-command")
+
+
+def test_start_without_mpv_raises(tmp_path):
+    player = Player(str(tmp_path / "no-mpv"))
+    with pytest.raises(PlayerError, match="Cannot start"):
+        player.start()
+
+
+def test_play_blocks_until_the_file_ends(player, played):
+    assert player.play("one.mp3") == "eof"
+    assert lines(played) == ["one.mp3"]
+    assert player.position is not None
+
+
+def test_events_are_dispatched(player):
+    events = []
+    player.on_event.append(events.append)
+    player.play("one.mp3")
+    names = [event.get("event") for event in events]
+    assert names.index("start-file") < names.index("file-loaded")
+    assert names.index("file-loaded") < names.index("end-file")
+    assert "property-change" in names
+
+
+def test_loadfile_and_append_play_in_order(player, played):
+    player.loadfile("one.mp3")
+    player.append("two.mp3")
+    assert player.wait() == "eof"
+    assert player.wait() == "eof"
+    assert lines(played) == ["one.mp3", "two.mp3"]
+
+
+def test_mpv_is_kept_between_episodes(player):
+    player.play("one.mp3")
+    process = player.process
+    player.play("two.mp3")
+    assert player.process is process
+
+
+def test_play_starts_mpv_again_after_it_died(player, played):
+    player.play("one.mp3")
+    first = player.process
+    first.kill()
+    first.wait()
+    assert not player.alive()
+    assert player.play("two.mp3") == "eof"
+    assert player.process is not first
+    assert lines(played) == ["one.mp3", "two.mp3"]
+
+
+def test_wait_returns_quit_when_mpv_dies_while_playing(player, monkeypatch):
+    monkeypatch.setenv("FAKE_MPV_SECONDS", "5")
+    player.start()
+    player.loadfile("long.mp3")
+    player.process.kill()
+    assert player.wait() == "quit"
+
+
+def test_command_to_dead_mpv_raises(player):
+    player.start()
+    player.process.kill()
+    player.process.wait()
+    with pytest.raises(PlayerError):
+        player.command("get_property", "volume")
+
+
+def test_close_quits_mpv(player):
+    player.play("one.mp3")
+    process = player.process
+    directory = player.directory
+    player.close()
+    assert process.poll() is not None
+    assert not os.path.exists(directory)
+    assert player.process is None
@@ -0,0 +1,29 @@
+import pytest
+
+import getpodcast
+from http_server import StandInServer
+from synthetic import make_feed
+
+
+def bad_pubdate(feed):
+    """feed with a channel pubDate that does not parse."""
+    return feed.replace(b"<channel>", b"<channel>\n  <pubDate>yesterday</pubDate>", 1)
+
+
+@pytest.mark.parametrize("catalog", ["TRUE", "FALSE"])
+def test_one_bad_feed_gets_an_error_row(configure, capsys, catalog):
+    files = {}
+    with StandInServer(files) as server:
+        files["/good.xml"] = make_feed(3, base=server.url, ttl=0)
+        files["/bad.xml"] = bad_pubdate(make_feed(3, base=server.url, ttl=0))
+        podfile = configure(catalog=catalog)
+        podfile.write_text(
+            f"[good]\ntitle = Good\nurl = {server.url}/good.xml\n"
+            f"[bad]\ntitle = Bad\nurl = {server.url}/bad.xml\n"
+        )
+        getpodcast.refresh_podcasts(str(podfile), 2, 1)
+    out = capsys.readouterr().out
+    rows = {line.split()[-1]: line for line in out.splitlines()}
+    assert "error: TypeError" in rows["Bad"]
+    assert "error" not in rows["Good"]
+    assert "Refreshed 2 feeds" in out
@@ -0,0 +1,78 @@
+import collections
+import random
+
+from Sampler import MAX_REJECTS, AliasTable, EpisodeSampler, episode_weights
+
+
+class Zero(object):
+    """An rng that always draws the first episode."""
+
+    def random(self):
+        return 0.0
+
+
+KEYS = ["a", "b", "c", "d"]
+
+
+def test_alias_table_follows_weights():
+    table = AliasTable([1, 0, 3])
+    rng = random.Random(1)
+    drawn = collections.Counter(table.draw(rng) for _ in range(20000))
+    assert drawn[1] == 0
+    assert 2.6 < drawn[2] / drawn[0] < 3.4
+
+
+def test_uniform_weighting_has_no_weights():
+    assert episode_weights([1, 2, 3]) is None
+
+
+def test_recent_weighting_halves_per_half_life():
+    weights = episode_weights([86400 * 10, 0, 86400 * 20], "recent", half_life=10)
+    assert weights[2] == 1.0
+    assert abs(weights[0] - 0.5) < 1e-9
+    assert weights[1] < weights[0]
+
+
+def test_draw_never_returns_excluded():
+    sampler = EpisodeSampler(len(KEYS), KEYS.__getitem__)
+    rng = random.Random(2)
+    drawn = {sampler.draw({"a", "c"}, rng) for _ in range(200)}
+    assert drawn == {1, 3}
+
+
+def test_draw_none_when_everything_is_excluded():
+    sampler = EpisodeSampler(len(KEYS), KEYS.__getitem__)
+    assert sampler.draw(set(KEYS), random.Random(3)) is None
+
+
+def test_excluded_episode_comes_back_after_rebuild():
+    sampler = EpisodeSampler(len(KEYS), KEYS.__getitem__)
+    # every draw meets "a", so the table without it is built
+    assert sampler.draw({"a"}, Zero()) == 1
+    rng = random.Random(4)
+    drawn = {sampler.draw(set(), rng) for _ in range(500)}
+    assert drawn == {0, 1, 2, 3}
+
+
+def test_rebuilt_table_is_reused_for_the_same_exclude():
+    asked = []
+
+    def key(index):
+        asked.append(index)
+        return KEYS[index]
+
+    sampler = EpisodeSampler(len(KEYS), key)
+    sampler.draw({"a"}, Zero())
+    assert len(asked) == MAX_REJECTS + len(KEYS)
+    del asked[:]
+    assert sampler.draw({"a"}, Zero()) == 1
+    assert asked == []
+
+
+def test_weighted_rebuild_keeps_weights():
+    sampler = EpisodeSampler(len(KEYS), KEYS.__getitem__, [1, 1, 0, 3])
+    sampler.draw({"a"}, Zero())
+    rng = random.Random(5)
+    drawn = collections.Counter(sampler.draw({"a"}, rng) for _ in range(20000))
+    assert set(drawn) == {1, 3}
+    assert 2.6 < drawn[3] / drawn[1] < 3.4
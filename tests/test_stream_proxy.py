@@ -0,0 +1,80 @@
+import io
+import os
+import urllib.request
+
+import pytest
+
+from Download import DownloadError
+from HttpClient import HttpClient
+from StreamProxy import StreamProxy, Tee
+from http_server import StandInServer
+
+DATA = os.urandom(300000)
+
+
+@pytest.fixture
+def server():
+    files = {"/episode.mp3": DATA}
+    with StandInServer(files) as server:
+        yield server
+
+
+@pytest.fixture
+def session():
+    return HttpClient({}, timeout=5)
+
+
+def get(url, headers=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return response.status, response.read()
+
+
+def test_streamed_episode_is_downloaded(server, session, tmp_path):
+    target = str(tmp_path / "episode.mp3")
+    proxy = StreamProxy(session, {}, timeout=5)
+    try:
+        url = proxy.url(server.url + "/episode.mp3", target, "audio/mpeg")
+        assert get(url, {"Range": "bytes=1000-1999"}) == (206, DATA[1000:2000])
+        assert not os.path.exists(target)
+        assert get(url) == (200, DATA)
+    finally:
+        proxy.close()
+    with open(target, "rb") as episode:
+        assert episode.read() == DATA
+    assert not os.path.exists(target + ".part")
+
+
+def test_cached_ranges_are_not_fetched_again(server, session, tmp_path):
+    tee = Tee(
+        session, server.url + "/episode.mp3", str(tmp_path / "e.mp3"), None, {}, 5
+    )
+    assert tee.open() == len(DATA)
+    tee.copy(0, 5000, io.BytesIO())
+    requests = server.requests
+    out = io.BytesIO()
+    tee.copy(100, 4000, out)
+    assert out.getvalue() == DATA[100:4000]
+    assert server.requests == requests
+    tee.close()
+
+
+def test_copy_after_the_enclosure_changed_raises(server, session, tmp_path):
+    tee = Tee(
+        session, server.url + "/episode.mp3", str(tmp_path / "e.mp3"), None, {}, 5
+    )
+    tee.open()
+    tee.copy(0, 1000, io.BytesIO())
+    server.files["/episode.mp3"] = os.urandom(len(DATA))
+    with pytest.raises(DownloadError, match="changed"):
+        tee.copy(2000, 3000, io.BytesIO())
+    assert tee.journal is None
+    # another request for a range of the old enclosure fails the same way
+    with pytest.raises(DownloadError, match="changed"):
+        tee.copy(0, 1000, io.BytesIO())
+    # and the next open starts over with the new one
+    assert tee.open() == len(DATA)
+    out = io.BytesIO()
+    tee.copy(0, 1000, out)
+    assert out.getvalue() == server.files["/episode.mp3"][:1000]
+    tee.close()
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+import getpodcast
+from http_server import StandInServer
+from Podcast import Podcast
+from synthetic import make_feed
+
+
+def undated_last(feed):
+    """feed without the pubDate of its last item."""
+    start = feed.rfind(b"<pubDate>")
+    end = feed.index(b"</pubDate>", start) + len(b"</pubDate>")
+    return feed[:start] + feed[end:]
+
+
+@pytest.fixture
+def server():
+    files = {}
+    with StandInServer(files) as server:
+        files["/feed.xml"] = undated_last(make_feed(4, base=server.url, ttl=0))
+        for n in range(4):
+            files[f"/episodes/{n}.mp3"] = b"x" * (1000000 + n)
+        yield server
+
+
+@pytest.fixture
+def podfile(configure, server):
+    return configure()
+
+
+def test_latest_puts_undated_items_last(server):
+    items = list(Podcast(server.files["/feed.xml"], engine="expat").items)
+    assert not hasattr(items[-1], "time_published")
+    chosen = getpodcast.sync_choice({"title": "t"}, items, 3, "latest")
+    assert [item.guid for item in chosen] == ["example-0", "example-1", "example-2"]
+    chosen = getpodcast.sync_choice({"title": "t"}, items, 4, "latest")
+    assert chosen[-1] is items[-1]
+
+
+def test_sync_latest_of_a_feed_with_an_undated_item(server, podfile, tmp_path):
+    podfile.write_text(f"[a]\ntitle = A\nurl = {server.url}/feed.xml\n")
+    summary_path = tmp_path / "summary.json"
+    summary = getpodcast.sync_podcasts(
+        str(podfile), 2, "latest", 2, 2, str(summary_path)
+    )
+    assert summary["feeds"] == [{"podcast": "A", "status": "fetched", "episodes": 2}]
+    assert summary["totals"]["downloaded"] == 2
+    assert json.loads(summary_path.read_text())["totals"] == summary["totals"]
+
+
+def test_one_bad_feed_does_not_stop_the_sync(server, podfile, tmp_path):
+    podfile.write_text(
+        f"[a]\ntitle = A\nurl = {server.url}/feed.xml\n"
+        f"[b]\ntitle = B\nurl = {server.url}/feed.xml\nsync_order = bogus\n"
+    )
+    summary = getpodcast.sync_podcasts(
+        str(podfile), 1, "latest", 2, 2, str(tmp_path / "summary.json")
+    )
+    statuses = {feed["podcast"]: feed["status"] for feed in summary["feeds"]}
+    assert statuses["A"] == "fetched"
+    assert statuses["B"].startswith("error: ValueError")
+    assert summary["totals"]["downloaded"] == 1